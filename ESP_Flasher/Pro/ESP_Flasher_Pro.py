@@ -14,9 +14,32 @@ import shutil
 import glob
 import re
 import hashlib
+import argparse
+import contextlib
+import signal
+import base64
+import hmac
+import urllib.parse
 import zipfile
+import struct
+import bisect
+import heapq
+import selectors
+import socket
+import queue
+import zlib
+import binascii
+import mmap
+import csv
+import io
+import secrets
+import tempfile
+import itertools
+import concurrent.futures
+import multiprocessing
 from typing import List, Dict, Optional, Tuple
-from collections import deque
+from collections import deque, OrderedDict
+from array import array
 
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
@@ -28,24 +51,123 @@ try:
 except ImportError:
     CHARTS_AVAILABLE = False
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from esptool.loader import ESPLoader
+    from esptool.targets import CHIP_DEFS
+    from esptool.util import FatalError, UnsupportedCommandError
+    ESPTOOL_API_AVAILABLE = True
+except ImportError:
+    ESPTOOL_API_AVAILABLE = False
+
+try:
+    from esptool.cmds import attach_flash, detect_chip, detect_flash_size, run_stub
+    from esptool.loader import ERASE_WRITE_TIMEOUT_PER_MB, timeout_per_mb
+    from esptool.util import flash_size_bytes
+    ESPTOOL_STREAMING_AVAILABLE = True
+except ImportError:
+    ESPTOOL_STREAMING_AVAILABLE = False
+
 import serial
+import serial.rfc2217
 import serial.tools.list_ports
 
+if os.name == 'nt':
+    # Only needed to read WM_DEVICECHANGE out of native window messages
+    import ctypes.wintypes
+
 APP_NAME = "ESP Flasher Pro"
 VERSION = "2.0.0"
 AUTHOR = "LTX"
 COMPANY = "LTX74"
-SETTINGS_FILE = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "settings.json")
-HISTORY_FILE = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "history.json")
-BACKUP_DIR = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "backups")
-FIRMWARE_DIR = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "firmwares")
-PROJECTS_DIR = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "projects")
-TEMPLATES_DIR = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "templates")
-LOGS_DIR = os.path.join(os.getenv('APPDATA'), COMPANY, APP_NAME, "logs")
+# Headless rigs are often Linux boxes without %APPDATA%
+APP_DATA_DIR = os.path.join(os.getenv('APPDATA') or os.path.join(os.path.expanduser('~'), '.config'), COMPANY, APP_NAME)
+SETTINGS_FILE = os.path.join(APP_DATA_DIR, "settings.json")
+HISTORY_FILE = os.path.join(APP_DATA_DIR, "history.json")
+BACKUP_DIR = os.path.join(APP_DATA_DIR, "backups")
+FIRMWARE_DIR = os.path.join(APP_DATA_DIR, "firmwares")
+PROJECTS_DIR = os.path.join(APP_DATA_DIR, "projects")
+TEMPLATES_DIR = os.path.join(APP_DATA_DIR, "templates")
+MACROS_FILE = os.path.join(APP_DATA_DIR, "macros.json")
+LOGS_DIR = os.path.join(APP_DATA_DIR, "logs")
+CACHE_DIR = os.path.join(APP_DATA_DIR, "cache")
+DEVICES_FILE = os.path.join(APP_DATA_DIR, "devices.json")
+JOBS_FILE = os.path.join(APP_DATA_DIR, "jobs.json")
+PROVISIONING_FILE = os.path.join(APP_DATA_DIR, "provisioning.json")
 DEFAULT_BAUDRATE = 460800
 DEFAULT_FLASH_ADDRESS = "0x0"
-
-for directory in [BACKUP_DIR, FIRMWARE_DIR, PROJECTS_DIR, TEMPLATES_DIR, LOGS_DIR]:
+SERIAL_SESSION_MAX_BYTES = 16 * 1024 * 1024
+ELF_INDEX_CACHE_ENTRIES = 4
+HEX_DUMP_ROW_BYTES = 16
+MULTI_PORT_BUFFER_BYTES = 1024 * 1024
+FRAME_TABLE_MAX_ROWS = 50000
+PLOT_BUFFER_SAMPLES = 200000
+REPLAY_CHUNK_BYTES = 4096
+BRIDGE_BASE_PORT = 7000
+BRIDGE_CLIENT_BUFFER_BYTES = 256 * 1024
+BRIDGE_MODES = ["Raw", "RFC2217"]
+API_DEFAULT_PORT = 8470
+API_CLIENT_BUFFER_BYTES = 1024 * 1024
+API_MAX_REQUEST_BYTES = 64 * 1024
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+JOB_KINDS = ("flash", "backup", "erase", "detect", "selftest")
+JOB_ACTIVE = ("queued", "running")
+JOB_FINISHED = ("succeeded", "failed", "cancelled")
+JOB_HISTORY_KEEP = 200
+ESP_ROM_BAUDRATE = 115200
+SELF_TEST_DEFAULT_TIMEOUT_S = 15
+PRODUCTION_SETTLE_MS = 500
+PRODUCTION_REENUMERATE_MS = 5000
+PRODUCTION_UPH_WINDOW_S = 3600
+NVS_PAGE_SIZE = 4096
+NVS_DEFAULT_ADDRESS = "0x9000"
+NVS_DEFAULT_SIZE = 0x6000
+COMPRESSED_CACHE_DIR = os.path.join(CACHE_DIR, "compressed")
+COMPRESSED_CACHE_MAX_BYTES = 512 * 1024 * 1024
+COMPRESSION_WORKERS = 2
+STUB_DEFLATE_BUFFER_BYTES = 32 * 1024
+STUB_ERASE_BLOCK_BYTES = 64 * 1024
+TX_CHUNK_BYTES = 1024
+TX_WRITE_TIMEOUT_S = 5.0
+MODEM_PROTOCOLS = ["XMODEM-1K", "YMODEM"]
+MODEM_MAX_RETRIES = 10
+MODEM_TIMEOUT_S = 10.0
+MODEM_START_TIMEOUT_S = 3.0
+RECONNECT_POLL_S = 0.005
+RECONNECT_SCAN_S = 0.25
+DEVICE_SCAN_DEBOUNCE_MS = 100
+DEVICE_POLL_FALLBACK_MS = 2000
+WM_DEVICECHANGE = 0x0219
+NEGATIVE_PROBE_TTL_S = 300
+
+# USB bridges found on ESP boards, (VID, PID); a PID of None matches the whole vendor
+ESP_USB_BRIDGES = {
+    (0x303A, None): "Espressif native USB",
+    (0x10C4, 0xEA60): "CP210x", (0x10C4, 0xEA70): "CP2105", (0x10C4, 0xEA71): "CP2108",
+    (0x1A86, 0x7523): "CH340", (0x1A86, 0x7522): "CH340K", (0x1A86, 0x5523): "CH341",
+    (0x1A86, 0x55D3): "CH343", (0x1A86, 0x55D4): "CH9102",
+    (0x0403, 0x6001): "FT232R", (0x0403, 0x6010): "FT2232", (0x0403, 0x6014): "FT232H", (0x0403, 0x6015): "FT231X",
+    (0x067B, 0x2303): "PL2303",
+}
+# Vendors whose serial ports are never an ESP ROM loader; anything unlisted is still probed, just last
+NON_ESP_USB_VENDORS = {
+    0x1199: "Sierra Wireless modem", 0x2C7C: "Quectel modem", 0x12D1: "Huawei modem", 0x1BC7: "Telit modem",
+    0x1546: "u-blox GNSS/modem", 0x2E8A: "Raspberry Pi RP2040", 0x1366: "SEGGER J-Link",
+}
+CLI_COMMANDS = ("detect", "flash", "backup", "batch", "monitor", "serve", "production")
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_DEVICE = 3
+EXIT_INTERRUPTED = 130
+REPLAY_SPEEDS = {"Real time": 1.0, "2x": 2.0, "5x": 5.0, "10x": 10.0, "As fast as possible": 0.0}
+
+for directory in [BACKUP_DIR, FIRMWARE_DIR, PROJECTS_DIR, TEMPLATES_DIR, LOGS_DIR, CACHE_DIR, COMPRESSED_CACHE_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 COLOR_SCHEMES = {
@@ -321,32 +443,243 @@ QSplitter::handle:hover {{
 }}
 """
 
+def template_images(template: dict) -> list:
+    # Multi-image templates list {address, file} pairs; single-image ones only have firmware and address
+    if template.get('images'):
+        return [(image['address'], image['file']) for image in template['images']]
+    if template.get('firmware'):
+        return [(template.get('address') or DEFAULT_FLASH_ADDRESS, template['firmware'])]
+    return []
+
+
+def compress_firmware(path: str, level: int) -> str:
+    # Runs in a worker process, so it only touches files; returns the cache entry it wrote
+    image = CompressedFirmwareCache.read_image(path)
+    cache_path = CompressedFirmwareCache.path_for(image, level)
+    if not os.path.exists(cache_path):
+        CompressedFirmwareCache.store(cache_path, zlib.compress(image, level))
+    return cache_path
+
+
+class CompressedImage:
+    # One read-only copy of a cached deflate stream, shared by every worker flashing that image at the same time;
+    # workers only ever take memoryview slices of it, so 16 ports flashing one image still hold a single copy
+    def __init__(self, buffer, size: int, md5: str, cache_path=None):
+        self.buffer = buffer
+        self.data = memoryview(buffer)
+        self.size = size
+        self.md5 = md5
+        self.cache_path = cache_path
+        self.users = 0
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, image: bytes, level: int):
+        # Generated per-board data (NVS partitions) is compressed in memory and never goes near the cache
+        image += b'\xff' * (-len(image) % 4)
+        return cls(zlib.compress(image, level), len(image), hashlib.md5(image).hexdigest())
+
+    @classmethod
+    def map(cls, cache_path, size, md5):
+        with open(cache_path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, size, md5, cache_path)
+
+    def blocks(self, block_size) -> list:
+        # (compressed slice, flash offset, bytes it inflates to, MD5 of those bytes) per write block, computed
+        # once per block size (the stub and ROM loader use different ones) for all workers
+        with self._lock:
+            if block_size not in self._blocks:
+                decompressor = zlib.decompressobj()
+                blocks = []
+                offset = 0
+                for start in range(0, len(self.data), block_size):
+                    block = self.data[start:start + block_size]
+                    output = decompressor.decompress(block)
+                    blocks.append((block, offset, len(output), hashlib.md5(output).hexdigest()))
+                    offset += len(output)
+                self._blocks[block_size] = blocks
+            return self._blocks[block_size]
+
+
+class CompressedFirmwareCache:
+    # write_flash -z input deflated once per (image hash, level) instead of by esptool on every flash;
+    # prefetch() hands new firmware to a process pool so the GUI and the flash workers never wait on zlib
+    _pool = None
+    _pending = {}
+    _compressing = {}
+    _known = {}
+    _shared = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def read_image(path) -> bytes:
+        # Padded to a 4-byte boundary exactly like esptool pads it before compressing
+        with open(path, 'rb') as f:
+            image = f.read()
+        return image + b'\xff' * (-len(image) % 4)
+
+    @staticmethod
+    def path_for(image: bytes, level: int) -> str:
+        return os.path.join(COMPRESSED_CACHE_DIR, f"{hashlib.sha256(image).hexdigest()}_{level}.z")
+
+    @staticmethod
+    def store(cache_path, data):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, cache_path)
+
+    @staticmethod
+    def pending_key(path, level):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return os.path.realpath(path), stat.st_mtime_ns, stat.st_size, level
+
+    @classmethod
+    def prefetch(cls, paths, level):
+        cls.prune()
+        for path in paths:
+            key = cls.pending_key(path, level)
+            if key is None:
+                continue
+            with cls._lock:
+                if key in cls._pending:
+                    continue
+                try:
+                    if cls._pool is None:
+                        # spawn rather than fork: forking a process that runs Qt and serial threads is unsafe
+                        cls._pool = concurrent.futures.ProcessPoolExecutor(
+                            COMPRESSION_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+                    cls._pending[key] = cls._pool.submit(compress_firmware, path, level)
+                except (RuntimeError, OSError):
+                    return
+
+    @classmethod
+    def load(cls, path, level) -> CompressedImage:
+        # Pair every load() with release(); the shared buffer is dropped once its last worker is done
+        key = cls.pending_key(path, level)
+        with cls._lock:
+            compressing = cls._compressing.setdefault(key, threading.Lock())
+        # Parallel workers flashing the same image wait for whichever of them reads and compresses it first
+        with compressing:
+            with cls._lock:
+                known = cls._known.get(key)
+                shared = cls._shared.get(known[0]) if known else None
+                if shared:
+                    shared.users += 1
+                    return shared
+            if known and os.path.exists(known[0]):
+                shared = CompressedImage.map(*known)
+            else:
+                shared = cls.build(path, level, key)
+            with cls._lock:
+                shared = cls._shared.setdefault(shared.cache_path, shared) if shared.cache_path else shared
+                shared.users += 1
+            return shared
+
+    @classmethod
+    def build(cls, path, level, key) -> CompressedImage:
+        image = cls.read_image(path)
+        cache_path = cls.path_for(image, level)
+        known = (cache_path, len(image), hashlib.md5(image).hexdigest())
+        with cls._lock:
+            future = cls._pending.get(key)
+        if future and not os.path.exists(cache_path):
+            try:
+                future.result()
+            except Exception:
+                pass
+        if not os.path.exists(cache_path):
+            # Never prefetched (or pruned since): compress here, on the flash worker, and keep it for next time
+            data = zlib.compress(image, level)
+            try:
+                cls.store(cache_path, data)
+            except OSError:
+                return CompressedImage(data, *known[1:])
+        try:
+            os.utime(cache_path)
+            shared = CompressedImage.map(*known)
+        except (OSError, ValueError):
+            return CompressedImage(zlib.compress(image, level), *known[1:])
+        with cls._lock:
+            cls._known[key] = known
+        return shared
+
+    @classmethod
+    def release(cls, shared: CompressedImage):
+        with cls._lock:
+            shared.users -= 1
+            if shared.users <= 0 and cls._shared.get(shared.cache_path) is shared:
+                # The mapping itself closes once the last memoryview slice is garbage collected
+                del cls._shared[shared.cache_path]
+
+    @staticmethod
+    def prune():
+        # Least recently flashed entries go first once the cache outgrows its budget
+        try:
+            entries = [entry for entry in os.scandir(COMPRESSED_CACHE_DIR) if entry.name.endswith('.z')]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        total = 0
+        for entry in entries:
+            total += entry.stat().st_size
+            if total > COMPRESSED_CACHE_MAX_BYTES:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+                cls._pool = None
+            cls._pending.clear()
+
+
 class FlashThread(QThread):
     progress = Signal(int, str)
     finished = Signal(bool, str)
     speed = Signal(float)
 
-    def __init__(self, chip, port, baudrate, firmware_path, address, erase=False, ota=False, verify=True):
+    def __init__(self, chip, port, baudrate, firmware_path, address, erase=False, ota=False, verify=True, images=None,
+                 compression_level=9, provision=None):
         super().__init__()
         self.chip = chip
         self.port = port
         self.baudrate = baudrate
         self.firmware_path = firmware_path
         self.address = address
+        # (address, path) pairs written in one esptool run, e.g. bootloader, partition table and app
+        self.images = images or [(address, firmware_path)]
         self.erase = erase
         self.ota = ota
         self.verify = verify
+        self.compression_level = compression_level
+        # provision(mac) -> (address, image bytes): per-device data built for the board this run is talking to
+        self.provision = provision
+        # MAC of the board this run actually talked to, for crediting the flash to the right device record
+        self.mac = None
         self._process = None
         self._is_running = True
         self.start_time = None
 
     def run(self):
+        provision_path = None
         try:
-            if not os.path.exists(self.firmware_path):
-                self.finished.emit(False, f"Error: Firmware file not found at: {self.firmware_path}")
+            missing = [path for _, path in self.images if not os.path.exists(path)]
+            if missing:
+                self.finished.emit(False, f"Error: Firmware file not found at: {missing[0]}")
                 return
             
-            file_size = os.path.getsize(self.firmware_path)
+            file_size = sum(os.path.getsize(path) for _, path in self.images)
             self.start_time = time.time()
             
             if self.erase:
@@ -364,6 +697,14 @@ class FlashThread(QThread):
                 if erase_process.returncode != 0:
                     self.finished.emit(False, "Failed to erase flash")
                     return
+
+            # OTA mode rewrites the bootloader header, which only esptool's own write_flash does
+            if ESPTOOL_STREAMING_AVAILABLE and not self.ota:
+                self.write_precompressed(file_size)
+                return
+
+            if self.provision:
+                provision_path = self.write_provision_file()
             
             cmd = [sys.executable, '-m', 'esptool', '--chip', self.chip, '--port', self.port, '--baud', str(self.baudrate), 'write_flash', '-z']
             
@@ -373,9 +714,10 @@ class FlashThread(QThread):
             if self.verify:
                 cmd.append('--verify')
                 
-            cmd.extend([self.address, self.firmware_path])
+            for address, path in self.images:
+                cmd.extend([address, path])
 
-            self.progress.emit(15, f"Preparing flash... File: {os.path.basename(self.firmware_path)}")
+            self.progress.emit(15, f"Preparing flash... File: {', '.join(os.path.basename(path) for _, path in self.images)}")
             self.progress.emit(20, f"Size: {file_size / 1024:.2f} KB")
             self.progress.emit(25, f"Chip: {self.chip}")
             
@@ -388,6 +730,9 @@ class FlashThread(QThread):
                 if not line:
                     continue
                 self.progress.emit(50, line.strip())
+                mac_match = re.match(r'MAC:\s*((?:[0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2})', line.strip())
+                if mac_match:
+                    self.mac = mac_match.group(1).lower()
                 
                 match = re.search(r'\((\d+)\s*%\)', line)
                 if match:
@@ -408,6 +753,128 @@ class FlashThread(QThread):
                 self.finished.emit(False, "Error during flash. See logs for details.")
         except Exception as e:
             self.finished.emit(False, str(e))
+        finally:
+            if provision_path:
+                try:
+                    os.remove(provision_path)
+                except OSError:
+                    pass
+
+    def provisioned_image(self):
+        if not self.mac:
+            raise ValueError("Provisioning failed: the board's MAC could not be read")
+        try:
+            return self.provision(self.mac)
+        except (ValueError, OSError) as e:
+            raise ValueError(f"Provisioning failed: {e}")
+
+    def write_provision_file(self) -> str:
+        # esptool's own write_flash only takes files: the MAC comes from this board, and the image goes to a
+        # file only this user can read, which run() removes however the flash ends
+        self.progress.emit(12, "Reading MAC for provisioning...")
+        result = subprocess.run([sys.executable, '-m', 'esptool', '--port', self.port, 'read_mac'],
+                                capture_output=True, text=True, timeout=30)
+        if result.returncode == 0:
+            self.mac = parse_esptool_info(result.stdout + result.stderr).get('mac')
+        address, image = self.provisioned_image()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='nvs_', suffix='.bin', dir=CACHE_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(image)
+        self.images = [(a, p) for a, p in self.images if int(str(a), 0) != address] + [(hex(address), path)]
+        return path
+
+    def write_precompressed(self, file_size):
+        # The same sequence as esptool's write_flash -z, except the deflate data comes from CompressedFirmwareCache
+        names = ', '.join(os.path.basename(path) for _, path in self.images)
+        self.progress.emit(15, f"Preparing flash... File: {names}")
+        self.progress.emit(20, f"Size: {file_size / 1024:.2f} KB")
+        images = []
+        try:
+            for address, path in self.images:
+                images.append((int(str(address), 0), os.path.basename(path), CompressedFirmwareCache.load(path, self.compression_level)))
+            self.progress.emit(25, f"Chip: {self.chip}")
+            esp = detect_chip(self.port, ESP_ROM_BAUDRATE)
+            try:
+                if self.chip != 'auto' and esp.CHIP_NAME.replace('-', '').lower() != self.chip.lower():
+                    raise FatalError(f"This chip is {esp.CHIP_NAME}, not {self.chip}")
+                if not esp.secure_download_mode:
+                    self.mac = ':'.join(f'{byte:02x}' for byte in esp.read_mac('BASE_MAC'))
+                if self.provision:
+                    # Built for the board on the wire right now, and streamed from memory
+                    address, image = self.provisioned_image()
+                    for entry in [entry for entry in images if entry[0] == address]:
+                        images.remove(entry)
+                        CompressedFirmwareCache.release(entry[2])
+                    images.append((address, "NVS partition", CompressedImage.from_bytes(image, self.compression_level)))
+                esp = run_stub(esp)
+                if self.baudrate > ESP_ROM_BAUDRATE:
+                    esp.change_baud(self.baudrate)
+                attach_flash(esp)
+                if not esp.secure_download_mode:
+                    flash_size = detect_flash_size(esp)
+                    if flash_size:
+                        esp.flash_set_parameters(flash_size_bytes(flash_size))
+                if not self.write_images(esp, images):
+                    return
+                self.progress.emit(97, "Hard resetting via RTS pin...")
+                esp.hard_reset()
+            finally:
+                esp._port.close()
+        finally:
+            for _, _, image in images:
+                CompressedFirmwareCache.release(image)
+
+        elapsed = time.time() - self.start_time
+        self.progress.emit(100, f"Flash completed successfully in {elapsed:.2f}s!")
+        self.finished.emit(True, f"Firmware flashed successfully in {elapsed:.2f} seconds.")
+
+    def write_images(self, esp, images) -> bool:
+        total = sum(image.size for _, _, image in images)
+        written = 0
+        for address, name, image in images:
+            if not esp.IS_STUB and address % esp.FLASH_SECTOR_SIZE:
+                raise FatalError(f"{name}: 0x{address:x} is not sector aligned, which the ROM loader cannot write")
+            self.progress.emit(30 + 65 * written // total,
+                               f"Writing {name} at 0x{address:08x}: {image.size} bytes ({len(image.data)} compressed)")
+            blocks = image.blocks(esp.FLASH_WRITE_SIZE)
+            esp.flash_defl_begin(image.size, len(image.data), address)
+            timeout = self.block_timeout(esp, 0)
+            for seq, (block, offset, block_size, _) in enumerate(blocks):
+                if not self._is_running:
+                    return False
+                timeout = self.block_timeout(esp, block_size)
+                esp.flash_defl_block(block, seq, timeout=timeout)
+                written += block_size
+                self.progress.emit(30 + 65 * written // total,
+                                   f"Writing at 0x{address + offset + block_size:08x}... "
+                                   f"({100 * (offset + block_size) // image.size} %)")
+                elapsed = time.time() - self.start_time
+                if elapsed > 0:
+                    self.speed.emit(written / elapsed)
+            if esp.IS_STUB:
+                # The stub acknowledges blocks before writing them; this reply only comes once flash is done
+                esp.flash_defl_finish(reboot=False, timeout=timeout)
+            if self.verify and not esp.secure_download_mode:
+                self.progress.emit(30 + 65 * written // total, f"Verifying {name}...")
+                if esp.flash_md5sum(address, image.size) != image.md5:
+                    raise FatalError(f"MD5 of {name} does not match data in flash{self.first_mismatch(esp, address, blocks)}")
+        return True
+
+    @staticmethod
+    def first_mismatch(esp, address, blocks) -> str:
+        # The per-block MD5s narrow a failed verify down to the first bad write block
+        for _, offset, block_size, md5 in blocks:
+            if block_size and esp.flash_md5sum(address + offset, block_size) != md5:
+                return f" (first difference in 0x{address + offset:08x}-0x{address + offset + block_size - 1:08x})"
+        return ""
+
+    @staticmethod
+    def block_timeout(esp, size):
+        # esptool's budget: the stub erases one 64 KB block up front and one more per 32 KB deflate buffer
+        if esp.IS_STUB:
+            size += (-(-size // STUB_DEFLATE_BUFFER_BYTES) + 1) * STUB_ERASE_BLOCK_BYTES
+        return timeout_per_mb(ERASE_WRITE_TIMEOUT_PER_MB, size)
 
     def stop(self):
         self._is_running = False
@@ -435,7 +902,9 @@ class BackupThread(QThread):
     def run(self):
         try:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"backup_{self.chip}_{self.port.replace(':', '_')}_{timestamp}.bin"
+            # /dev/ttyUSB0 and rfc2217://host:port both contain characters that cannot go in a file name
+            port_name = re.sub(r'[^\w.-]+', '_', self.port).strip('_')
+            filename = f"backup_{self.chip}_{port_name}_{timestamp}.bin"
             backup_path = os.path.join(self.backup_dir, filename)
             
             cmd = [sys.executable, '-m', 'esptool', '--chip', self.chip, '--port', self.port, '--baud', str(self.baudrate),
@@ -475,98 +944,1257 @@ class BackupThread(QThread):
                 pass
 
 
+# Most specific names first, "ESP32" would otherwise swallow every variant
+ESP_CHIP_NAMES = ['ESP32-S2', 'ESP32-S3', 'ESP32-C3', 'ESP32-C6', 'ESP32-H2', 'ESP32', 'ESP8266']
+
+
+def parse_esptool_info(output: str) -> dict:
+    # Understands both the esptool v4 ("Chip is ...") and v5 ("Chip type: ...") report layouts
+    info = {}
+    for line in output.splitlines():
+        line = line.strip()
+        chip_match = re.match(r'(?:Chip is|Chip type:|Detecting chip type\.*)\s*(.+)', line)
+        if chip_match:
+            description = chip_match.group(1).strip()
+            chip = next((name for name in ESP_CHIP_NAMES if name in description.upper()), None)
+            if chip:
+                info['chip'] = chip
+                info['chip_description'] = description.replace(' in Secure Download Mode', '')
+            if 'Secure Download Mode' in line:
+                info['secure_download_mode'] = True
+            continue
+        mac_match = re.match(r'MAC:\s*([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5,7})$', line)
+        if mac_match:
+            info['mac'] = mac_match.group(1).lower()
+        elif line.startswith('Detected flash size:'):
+            info['flash_size'] = line.split(':', 1)[1].strip()
+        elif re.match(r'Crystal (?:is|frequency:)', line):
+            crystal = re.search(r'(\d+)\s*MHz', line)
+            if crystal:
+                info['crystal_mhz'] = int(crystal.group(1))
+        elif line.startswith('Features:'):
+            info['features'] = line.split(':', 1)[1].strip()
+        elif line.startswith('Secure Boot:'):
+            info['secure_boot'] = line.endswith('Enabled')
+        elif line.startswith('Flash Encryption:'):
+            info['flash_encryption'] = line.endswith('Enabled')
+    return info
+
+
+class EraseThread(QThread):
+    progress = Signal(int, str)
+    finished = Signal(bool, str)
+
+    def __init__(self, chip, port, baudrate):
+        super().__init__()
+        self.chip = chip
+        self.port = port
+        self.baudrate = baudrate
+        self._process = None
+        self._is_running = True
+
+    def run(self):
+        try:
+            start_time = time.time()
+            cmd = [sys.executable, '-m', 'esptool', '--chip', self.chip, '--port', self.port, '--baud', str(self.baudrate), 'erase_flash']
+            self.progress.emit(0, "Erasing flash...")
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+            for line in self._process.stdout:
+                if not self._is_running:
+                    self._process.terminate()
+                    return
+                if line.strip():
+                    self.progress.emit(50, line.strip())
+            self._process.wait()
+            if self._process.returncode == 0:
+                elapsed = time.time() - start_time
+                self.progress.emit(100, "Flash erased!")
+                self.finished.emit(True, f"Flash erased successfully in {elapsed:.2f} seconds.")
+            else:
+                self.finished.emit(False, "Failed to erase flash")
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+    def stop(self):
+        self._is_running = False
+        if self._process:
+            try:
+                self._process.terminate()
+            except:
+                pass
+
+
+class ChipProbe:
+    # Magic register values and ROM chip IDs mapped to esptool's target classes, built from esptool's
+    # own definitions so chip families added by an esptool update are recognised without changes here
+    _magic_table = None
+    _chip_id_table = None
+
+    @classmethod
+    def tables(cls):
+        if cls._magic_table is None:
+            magic_table, chip_id_table = {}, {}
+            for target in CHIP_DEFS.values():
+                if getattr(target, 'USES_MAGIC_VALUE', True):
+                    magic = getattr(target, 'MAGIC_VALUE', None)
+                    for value in getattr(target, 'CHIP_DETECT_MAGIC_VALUE', []) + ([magic] if magic is not None else []):
+                        magic_table[value] = target
+                else:
+                    chip_id_table[target.IMAGE_CHIP_ID] = target
+            cls._magic_table, cls._chip_id_table = magic_table, chip_id_table
+        return cls._magic_table, cls._chip_id_table
+
+    @classmethod
+    def identify(cls, device, baudrate=115200, wants_details=lambda mac: True) -> dict:
+        # One sync, one magic read (plus a chip ID query on newer ROMs) and the eFuse MAC;
+        # description, crystal, security and flash ID are only read when wants_details(mac) says so
+        magic_table, chip_id_table = cls.tables()
+        loader = ESPLoader(device, baudrate)
+        try:
+            loader.connect(attempts=1, detecting=True)
+            secure_download = False
+            try:
+                target = magic_table.get(loader.read_reg(ESPLoader.CHIP_DETECT_MAGIC_REG_ADDR))
+            except UnsupportedCommandError:
+                # Register reads are refused in Secure Download Mode; only the ESP32-S2 lacks a chip ID there
+                target, secure_download = None, True
+            if target is None:
+                try:
+                    target = chip_id_table.get(loader.get_chip_id())
+                except UnsupportedCommandError:
+                    target = CHIP_DEFS['esp32s2'] if secure_download else None
+            if target is None:
+                raise FatalError("Unrecognised chip, esptool may need an update")
+
+            esp = target(loader._port, baudrate)
+            esp.secure_download_mode = secure_download
+            esp._post_connect()
+            facts = {'chip': esp.CHIP_NAME, 'secure_download_mode': secure_download}
+            if not secure_download:
+                mac = esp.read_mac('BASE_MAC')
+                facts['mac'] = ':'.join(f'{byte:02x}' for byte in mac)
+            if wants_details(facts.get('mac')):
+                facts.update(cls.details(esp))
+            esp.hard_reset()
+            return facts
+        finally:
+            loader._port.close()
+
+    @staticmethod
+    def details(esp) -> dict:
+        facts = {}
+        if not esp.secure_download_mode:
+            facts['chip_description'] = esp.get_chip_description()
+            facts['features'] = ', '.join(esp.get_chip_features())
+            facts['crystal_mhz'] = esp.get_crystal_freq()
+        if not getattr(esp, 'USES_MAGIC_VALUE', True) or esp.CHIP_NAME == 'ESP32-S2':
+            try:
+                security = esp.get_security_info()
+                facts['secure_boot'] = security['parsed_flags']['SECURE_BOOT_EN']
+                facts['flash_encryption'] = bin(security['flash_crypt_cnt']).count('1') % 2 == 1
+            except (FatalError, UnsupportedCommandError, KeyError):
+                pass
+        if not esp.secure_download_mode:
+            try:
+                from esptool.cmds import attach_flash, detect_flash_size
+                attach_flash(esp)
+                facts['flash_size'] = detect_flash_size(esp) or 'Unknown'
+            except (ImportError, FatalError, TypeError):
+                pass
+        return facts
+
+
+def classify_port(port):
+    # Returns (priority, reason); a priority of None means the port is skipped without probing
+    if port.vid is not None:
+        bridge = ESP_USB_BRIDGES.get((port.vid, port.pid)) or ESP_USB_BRIDGES.get((port.vid, None))
+        if bridge:
+            return (0 if port.vid == 0x303A else 1), bridge
+        if port.vid in NON_ESP_USB_VENDORS:
+            return None, NON_ESP_USB_VENDORS[port.vid]
+        return 2, "Unknown USB device"
+    description = f"{port.device} {port.description}".lower()
+    if 'bluetooth' in description or 'rfcomm' in description:
+        return None, "Bluetooth serial link"
+    return 2, "Non-USB serial port"
+
+
 class DetectBoardsThread(QThread):
     finished = Signal(list)
     error = Signal(str)
     progress = Signal(str)
 
-    def __init__(self):
+    def __init__(self, device_store=None):
         super().__init__()
+        self.device_store = device_store
         self._is_running = True
 
     def run(self):
-        boards = []
         ports = serial.tools.list_ports.comports()
-        
-        for idx, port in enumerate(ports):
-            if not self._is_running:
-                break
-            
-            self.progress.emit(f"Scanning {port.device}... ({idx + 1}/{len(ports)})")
-            
-            try:
-                result = subprocess.run(
-                    [sys.executable, '-m', 'esptool', '--port', port.device, 'flash_id'],
-                    capture_output=True, text=True, timeout=10
-                )
-                if result.returncode == 0:
-                    output = result.stdout + result.stderr
-                    chip_type = 'Unknown'
-                    mac = 'N/A'
-                    flash_size = 'N/A'
-                    
-                    for line in output.splitlines():
-                        if 'Chip is' in line or 'Detecting chip type' in line:
-                            if 'ESP32-S2' in line.upper():
-                                chip_type = 'ESP32-S2'
-                            elif 'ESP32-S3' in line.upper():
-                                chip_type = 'ESP32-S3'
-                            elif 'ESP32-C3' in line.upper():
-                                chip_type = 'ESP32-C3'
-                            elif 'ESP32-C6' in line.upper():
-                                chip_type = 'ESP32-C6'
-                            elif 'ESP32-H2' in line.upper():
-                                chip_type = 'ESP32-H2'
-                            elif 'ESP32' in line.upper():
-                                chip_type = 'ESP32'
-                            elif 'ESP8266' in line.upper():
-                                chip_type = 'ESP8266'
-                        elif 'MAC:' in line:
-                            mac = line.split('MAC:')[-1].strip()
-                        elif 'Detected flash size:' in line:
-                            flash_size = line.split('Detected flash size:')[-1].strip()
-                    
-                    boards.append({
-                        'port': port.device,
-                        'description': port.description,
-                        'chip': chip_type,
-                        'mac': mac,
-                        'flash_size': flash_size,
-                        'status': 'detected'
-                    })
-                else:
-                    boards.append({
-                        'port': port.device,
-                        'description': port.description,
-                        'chip': 'Not ESP / Detection failed',
-                        'mac': 'N/A',
-                        'flash_size': 'N/A',
-                        'status': 'failed'
-                    })
-            except subprocess.TimeoutExpired:
-                boards.append({
+        results = {}
+        queue_order = []
+        for port in ports:
+            priority, reason = classify_port(port)
+            skip_reason = reason if priority is None else None
+            if skip_reason is None and self.device_store and self.device_store.recently_failed(port):
+                skip_reason = "no ESP answered recently"
+            if skip_reason:
+                results[port.device] = {
                     'port': port.device,
                     'description': port.description,
-                    'chip': 'Detection timeout',
+                    'chip': f"Skipped ({skip_reason})",
                     'mac': 'N/A',
                     'flash_size': 'N/A',
-                    'status': 'timeout'
-                })
+                    'status': 'skipped'
+                }
+            else:
+                queue_order.append((priority, port))
+        # Likely ESP ports are submitted first so they are not stuck behind slow, unknown devices
+        queue_order.sort(key=lambda item: item[0])
+        probe_ports = [port for _, port in queue_order]
+
+        if probe_ports:
+            # Every port is an independent serial link, so they are probed side by side
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(probe_ports))) as pool:
+                futures = {pool.submit(self.scan_port, port): (priority, port) for priority, port in queue_order}
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    priority, port = futures[future]
+                    self.progress.emit(f"Scanned {port.device}... ({done}/{len(probe_ports)})")
+                    board = future.result()
+                    if board:
+                        results[port.device] = board
+                        # A known ESP bridge that did not answer is usually busy (monitor open) or waiting for
+                        # manual boot mode, so it is tried again next time; only unknown ports are skipped for a while
+                        if board['status'] in ('failed', 'timeout') and priority == 2 and self.device_store:
+                            self.device_store.mark_failed(port)
+
+        self.finished.emit([results[port.device] for port in ports if port.device in results])
+
+    def scan_port(self, port):
+        if not self._is_running:
+            return None
+        try:
+            if ESPTOOL_API_AVAILABLE:
+                return self.fast_probe(port)
+            return self.probe(port)
+        except subprocess.TimeoutExpired:
+            return {
+                'port': port.device,
+                'description': port.description,
+                'chip': 'Detection timeout',
+                'mac': 'N/A',
+                'flash_size': 'N/A',
+                'status': 'timeout'
+            }
+        except Exception as e:
+            # Shown in the board row, so an unexpected probe error is not mistaken for an empty port
+            return {
+                'port': port.device,
+                'description': port.description,
+                'chip': f"Detection error: {str(e)}",
+                'mac': 'N/A',
+                'flash_size': 'N/A',
+                'status': 'failed'
+            }
+
+    def fast_probe(self, port) -> dict:
+        board = {'port': port.device, 'description': port.description}
+        store = self.device_store
+        try:
+            facts = ChipProbe.identify(port.device, wants_details=lambda mac: not (store and mac and store.get(mac)))
+        except Exception:
+            board.update(chip='Not ESP / Detection failed', mac='N/A', flash_size='N/A', status='failed')
+            return board
+        record = None
+        cached = False
+        if store and facts.get('mac'):
+            cached = 'chip_description' not in facts
+            mac = facts.pop('mac')
+            record = store.update(mac, usb_key=usb_identity_key(port), port=port.device, vid=port.vid, pid=port.pid, **facts)
+            facts = dict(record)
+        board.update(chip=facts.get('chip', 'Unknown'), mac=facts.get('mac', 'N/A'),
+                     flash_size=facts.get('flash_size', 'N/A'), status='detected', cached=cached, record=record)
+        return board
+
+    def probe(self, port) -> dict:
+        board = {'port': port.device, 'description': port.description}
+        store = self.device_store
+        usb_key = usb_identity_key(port)
+        known = store.find(usb_key, port.device, port.vid, port.pid) if store else None
+        if known:
+            # One ROM-only MAC read confirms it is the same board, the cache supplies the rest
+            facts = self.esptool(port.device, '--no-stub', 'read_mac')
+            if facts is not None and facts.get('mac') == known['mac']:
+                record = store.update(known['mac'], usb_key=usb_key, port=port.device, vid=port.vid, pid=port.pid)
+                board.update(chip=record.get('chip', 'Unknown'), mac=record['mac'],
+                             flash_size=record.get('flash_size', 'N/A'), status='detected', cached=True, record=record)
+                return board
+
+        facts = self.esptool(port.device, 'flash_id')
+        if facts is None:
+            board.update(chip='Not ESP / Detection failed', mac='N/A', flash_size='N/A', status='failed')
+            return board
+        if store and facts.get('mac'):
+            if facts.get('chip') not in (None, 'ESP32', 'ESP8266') and self._is_running:
+                # Only asked once per board, the answer is cached with the rest
+                security = self.esptool(port.device, '--no-stub', 'get_security_info')
+                if security:
+                    facts.update({key: security[key] for key in ('secure_boot', 'flash_encryption') if key in security})
+            facts.setdefault('secure_download_mode', False)
+            facts['record'] = store.update(facts['mac'], usb_key=usb_key, port=port.device, vid=port.vid, pid=port.pid,
+                                           **{key: value for key, value in facts.items() if key != 'mac'})
+        board.update(chip=facts.get('chip', 'Unknown'), mac=facts.get('mac', 'N/A'),
+                     flash_size=facts.get('flash_size', 'N/A'), status='detected', record=facts.get('record'))
+        return board
+
+    def esptool(self, device, *args):
+        result = subprocess.run(
+            [sys.executable, '-m', 'esptool', '--port', device, *args],
+            capture_output=True, text=True, timeout=10
+        )
+        if result.returncode != 0:
+            return None
+        return parse_esptool_info(result.stdout + result.stderr)
+
+    def stop(self):
+        self._is_running = False
+
+
+class ChipCheckThread(QThread):
+    progress = Signal(int, str)
+    finished = Signal(bool, str)
+
+    def __init__(self, chip, port, attempts=3):
+        super().__init__()
+        self.chip = chip
+        self.port = port
+        self.attempts = attempts
+        self.facts = {}
+        self._is_running = True
+
+    def run(self):
+        error = None
+        for attempt in range(1, self.attempts + 1):
+            if not self._is_running:
+                return
+            self.progress.emit(0, f"Connecting to {self.port} (attempt {attempt}/{self.attempts})...")
+            try:
+                self.facts = self.identify()
+                break
             except Exception as e:
-                continue
-        
-        self.finished.emit(boards)
+                error = e
+                time.sleep(0.5)
+        else:
+            self.finished.emit(False, f"No ESP answered on {self.port}: {error}")
+            return
+        found = self.facts.get('chip', 'Unknown')
+        if self.chip != 'auto' and found.replace('-', '').lower() != self.chip.replace('-', '').lower():
+            self.finished.emit(False, f"Expected {self.chip} but found {found}")
+            return
+        message = f"Detected {found}" + (f" ({self.facts['mac']})" if self.facts.get('mac') else "")
+        self.progress.emit(100, message)
+        self.finished.emit(True, message)
+
+    def identify(self) -> dict:
+        if ESPTOOL_API_AVAILABLE:
+            return ChipProbe.identify(self.port, ESP_ROM_BAUDRATE, wants_details=lambda mac: False)
+        result = subprocess.run([sys.executable, '-m', 'esptool', '--port', self.port, '--no-stub', 'read_mac'],
+                                capture_output=True, text=True, timeout=10)
+        facts = parse_esptool_info(result.stdout + result.stderr)
+        if result.returncode != 0 or 'chip' not in facts:
+            raise RuntimeError("esptool could not connect")
+        return facts
+
+    def stop(self):
+        self._is_running = False
+
+
+class SelfTestThread(QThread):
+    progress = Signal(int, str)
+    finished = Signal(bool, str)
+
+    def __init__(self, port, baudrate, pattern, fail_pattern='', timeout=SELF_TEST_DEFAULT_TIMEOUT_S, reset=True):
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.pattern = pattern
+        self.fail_pattern = fail_pattern
+        self.timeout = timeout
+        self.reset = reset
+        self._is_running = True
+
+    def run(self):
+        try:
+            pattern = re.compile(self.pattern)
+            fail_pattern = re.compile(self.fail_pattern) if self.fail_pattern else None
+        except re.error as e:
+            self.finished.emit(False, f"Invalid self-test pattern: {e}")
+            return
+        started = time.time()
+        link = None
+        while link is None:
+            try:
+                link = serial.serial_for_url(self.port, self.baudrate, timeout=0.1)
+            except (serial.SerialException, OSError) as e:
+                # Boards on native USB drop off the bus for a moment after the reset at the end of flashing
+                if not self._is_running:
+                    return
+                if time.time() - started > min(self.timeout, 5):
+                    self.finished.emit(False, f"Self-test could not open {self.port}: {e}")
+                    return
+                time.sleep(0.2)
+        try:
+            if self.reset:
+                self.reset_board(link)
+            self.progress.emit(0, f"Waiting up to {self.timeout:g}s for /{self.pattern}/...")
+            started = time.time()
+            partial = b''
+            while self._is_running:
+                elapsed = time.time() - started
+                if elapsed > self.timeout:
+                    self.finished.emit(False, f"Self-test timed out after {self.timeout:g}s without /{self.pattern}/")
+                    return
+                data = link.read(link.in_waiting or 1)
+                if not data:
+                    continue
+                lines = (partial + data).split(b'\n')
+                partial = lines.pop()[-4096:]
+                for raw in lines:
+                    line = raw.decode('utf-8', errors='replace').strip()
+                    if not line:
+                        continue
+                    self.progress.emit(min(99, int(elapsed / self.timeout * 100)), line)
+                    if fail_pattern and fail_pattern.search(line):
+                        self.finished.emit(False, f"Self-test failed: {line}")
+                        return
+                    if pattern.search(line):
+                        self.progress.emit(100, "Self-test passed!")
+                        self.finished.emit(True, f"Self-test passed: {line}")
+                        return
+        except (serial.SerialException, OSError) as e:
+            self.finished.emit(False, f"Self-test lost {self.port}: {e}")
+        finally:
+            link.close()
+
+    @staticmethod
+    def reset_board(link):
+        # EN is pulsed through RTS with IO0 (DTR) released, so the board boots the freshly written firmware
+        try:
+            link.dtr = False
+            link.rts = True
+            time.sleep(0.1)
+            link.rts = False
+        except (serial.SerialException, OSError):
+            pass
+        link.reset_input_buffer()
 
     def stop(self):
         self._is_running = False
 
 
+class LineTimestamper:
+    def __init__(self, baudrate, bits_per_char=10):
+        self.ns_per_byte = bits_per_char * 1_000_000_000 // max(int(baudrate), 1)
+        self.at_line_start = True
+        self.last_ns = 0
+
+    def marks(self, data: bytes, read_ns: int) -> list:
+        # The read time stamps the last byte of data; each line start is back-dated
+        # from it by its byte offset at the line's character time.
+        size = len(data)
+        offsets = [0] if self.at_line_start and size else []
+        pos = data.find(b'\n')
+        while pos >= 0:
+            if pos + 1 < size:
+                offsets.append(pos + 1)
+            pos = data.find(b'\n', pos + 1)
+        self.at_line_start = data.endswith(b'\n')
+
+        marks = []
+        floor = self.last_ns
+        for offset in offsets:
+            floor = max(read_ns - (size - 1 - offset) * self.ns_per_byte, floor)
+            marks.append((offset, floor))
+        self.last_ns = max(read_ns, self.last_ns)
+        return marks
+
+
+class LineTimingStats:
+    BUCKETS = [(1_000_000, "under 1 ms"), (10_000_000, "1-10 ms"), (100_000_000, "10-100 ms"),
+               (1_000_000_000, "100 ms - 1 s"), (None, "over 1 s")]
+
+    def __init__(self, maxlen=10000):
+        self.deltas = deque(maxlen=maxlen)
+        self.reset()
+
+    def reset(self):
+        self.deltas.clear()
+        self.first_ns = None
+        self.last_ns = None
+        self.count = 0
+
+    def add(self, timestamp_ns):
+        if self.last_ns is not None:
+            self.deltas.append(timestamp_ns - self.last_ns)
+        else:
+            self.first_ns = timestamp_ns
+        self.last_ns = timestamp_ns
+        self.count += 1
+
+    def percentiles(self, points=(50, 90, 99)):
+        ordered = sorted(self.deltas)
+        if not ordered:
+            return {}
+        return {p: ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in points}
+
+    def histogram(self):
+        counts = [0] * len(self.BUCKETS)
+        bounds = [limit for limit, _ in self.BUCKETS[:-1]]
+        for delta in self.deltas:
+            counts[bisect.bisect_right(bounds, delta)] += 1
+        return [(label, count) for (_, label), count in zip(self.BUCKETS, counts)]
+
+
+FRAME_CRC_MODES = {
+    "None": None,
+    "CRC-16/CCITT (BE)": (2, lambda data: binascii.crc_hqx(data, 0xFFFF), 'big'),
+    "CRC-32 (LE)": (4, zlib.crc32, 'little'),
+}
+
+
+class StreamDecoder:
+    # Shared CRC checking and counters; each subclass provides feed(data, timestamp_ns) -> list of records
+    name = "Raw"
+
+    def __init__(self, crc_mode="None", max_frame=4096):
+        self.crc = FRAME_CRC_MODES.get(crc_mode)
+        self.max_frame = max_frame
+        self._buffer = b''
+        self.frames = 0
+        self.crc_errors = 0
+
+    def record(self, frame: bytes, timestamp_ns: int, valid=True):
+        crc_ok = None
+        payload = frame
+        if self.crc and valid:
+            size, func, order = self.crc
+            if len(frame) < size:
+                valid = False
+            else:
+                payload = frame[:-size]
+                crc_ok = func(payload) & (2 ** (8 * size) - 1) == int.from_bytes(frame[-size:], order)
+        if not valid:
+            crc_ok = False
+        self.frames += 1
+        if crc_ok is False:
+            self.crc_errors += 1
+        return (timestamp_ns, self.name, payload, crc_ok)
+
+
+class SlipDecoder(StreamDecoder):
+    name = "SLIP"
+
+    def feed(self, data, timestamp_ns):
+        if b'\xC0' not in data:
+            self._buffer = (self._buffer + data)[-self.max_frame * 2:]
+            return []
+        parts = (self._buffer + data).split(b'\xC0')
+        self._buffer = parts.pop()
+        # Replacing ESC+ESC_END before ESC+ESC_ESC cannot create new escape pairs
+        return [self.record(raw.replace(b'\xDB\xDC', b'\xC0').replace(b'\xDB\xDD', b'\xDB'), timestamp_ns)
+                for raw in parts if raw]
+
+
+class CobsDecoder(StreamDecoder):
+    name = "COBS"
+
+    def feed(self, data, timestamp_ns):
+        if b'\x00' not in data:
+            self._buffer = (self._buffer + data)[-self.max_frame * 2:]
+            return []
+        parts = (self._buffer + data).split(b'\x00')
+        self._buffer = parts.pop()
+        records = []
+        for raw in parts:
+            if raw:
+                frame = self.cobs_decode(raw)
+                records.append(self.record(raw if frame is None else frame, timestamp_ns, frame is not None))
+        return records
+
+    @staticmethod
+    def cobs_decode(raw: bytes):
+        out = bytearray()
+        i, size = 0, len(raw)
+        while i < size:
+            code = raw[i]
+            end = i + code
+            if code == 0 or end > size:
+                return None
+            out += raw[i + 1:end]
+            i = end
+            if code < 0xFF and i < size:
+                out.append(0)
+        return bytes(out)
+
+
+class LengthPrefixedDecoder(StreamDecoder):
+    name = "Length-prefixed"
+
+    def __init__(self, crc_mode="None", max_frame=4096, sync=b'\xAA\x55', length_bytes=2):
+        super().__init__(crc_mode, max_frame)
+        self.sync = sync
+        self.length_bytes = length_bytes
+
+    def feed(self, data, timestamp_ns):
+        buffer = self._buffer + data
+        records = []
+        pos = 0
+        header = len(self.sync) + self.length_bytes
+        while True:
+            if self.sync:
+                start = buffer.find(self.sync, pos)
+                if start < 0:
+                    # Keep a possible partial sync marker for the next chunk
+                    pos = max(pos, len(buffer) - len(self.sync) + 1)
+                    break
+                pos = start
+            if len(buffer) - pos < header:
+                break
+            length = int.from_bytes(buffer[pos + len(self.sync):pos + header], 'little')
+            if length > self.max_frame:
+                if not self.sync:
+                    # Without a sync marker there is nothing to resynchronise on
+                    buffer, pos = b'', 0
+                    break
+                pos += 1
+                continue
+            if len(buffer) - pos < header + length:
+                break
+            records.append(self.record(buffer[pos + header:pos + header + length], timestamp_ns))
+            pos += header + length
+        self._buffer = buffer[pos:]
+        return records
+
+
+STREAM_DECODERS = {
+    "SLIP": SlipDecoder,
+    "COBS": CobsDecoder,
+    "Length-prefixed": LengthPrefixedDecoder,
+}
+
+
+class LineAssembler:
+    def __init__(self, max_partial=64 * 1024):
+        self.partial = b''
+        self.partial_ns = 0
+        self.max_partial = max_partial
+
+    def feed(self, data: bytes, marks: list) -> list:
+        # marks come from LineTimestamper and may be shared with other consumers, so never mutate them
+        first = 0
+        if marks and marks[0][0] == 0:
+            self.partial_ns = marks[0][1]
+            first = 1
+        if b'\n' not in data:
+            self.partial = (self.partial + data)[-self.max_partial:]
+            return []
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        starts = [self.partial_ns]
+        starts.extend(timestamp_ns for _, timestamp_ns in marks[first:])
+        if self.partial:
+            self.partial_ns = starts[-1]
+        return list(zip(starts, lines))
+
+
+class SampleExtractor:
+    MODES = ["Key=Value", "Regex", "CSV", "JSON"]
+    KEY_VALUE_RE = re.compile(rb"([A-Za-z_][\w.]*)\s*[=:]\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)")
+    CSV_SPLIT_RE = re.compile(rb"[,;\t ]+")
+
+    def __init__(self, mode="Key=Value", pattern=""):
+        self.mode = mode
+        self.lines = LineAssembler()
+        self.header = []
+        self.samples = 0
+        self.regex = None
+        self.group_names = []
+        if mode == "Regex":
+            self.regex = re.compile(pattern.encode('utf-8'))
+            names = {index: name for name, index in self.regex.groupindex.items()}
+            self.group_names = [names.get(i, f"field{i}") for i in range(1, self.regex.groups + 1)]
+            if not self.group_names:
+                self.group_names = ["value"]
+
+    def feed(self, data: bytes, marks: list) -> dict:
+        series = {}
+        for timestamp_ns, line in self.lines.feed(data, marks):
+            for name, value in self.parse(line):
+                entry = series.get(name)
+                if entry is None:
+                    entry = series[name] = ([], [])
+                entry[0].append(timestamp_ns)
+                entry[1].append(value)
+                self.samples += 1
+        return series
+
+    def parse(self, line: bytes):
+        if self.mode == "Key=Value":
+            return [(key.decode('ascii'), float(value)) for key, value in self.KEY_VALUE_RE.findall(line)]
+        if self.mode == "Regex":
+            match = self.regex.search(line)
+            if not match:
+                return []
+            if not self.regex.groups:
+                return self.numeric([("value", match.group(0))])
+            return self.numeric(zip(self.group_names, match.groups()))
+        if self.mode == "CSV":
+            tokens = [t for t in self.CSV_SPLIT_RE.split(line.strip()) if t]
+            fields = []
+            for index, token in enumerate(tokens):
+                name = self.header[index] if index < len(self.header) else f"col{index + 1}"
+                fields.append((name, token))
+            values = self.numeric(fields)
+            if tokens and not values:
+                self.header = [t.decode('utf-8', errors='replace') for t in tokens]
+            return values
+        line = line.strip()
+        if not line.startswith(b'{'):
+            return []
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            return []
+        fields = []
+        for key, value in obj.items():
+            if isinstance(value, dict):
+                fields.extend((f"{key}.{k}", v) for k, v in value.items())
+            else:
+                fields.append((key, value))
+        return [(k, float(v)) for k, v in fields if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+    @staticmethod
+    def numeric(fields):
+        values = []
+        for name, raw in fields:
+            if raw is None:
+                continue
+            try:
+                values.append((name, float(raw)))
+            except ValueError:
+                pass
+        return values
+
+
+class SessionRecorder:
+    MAGIC = b'ESPCAP\x00\x01'
+    HEADER = struct.Struct('<8sqI')
+    RECORD = struct.Struct('<QI')
+
+    def __init__(self, path, baudrate=115200):
+        self.path = path
+        self.timed = path.lower().endswith('.espcap')
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.file = open(path, 'wb')
+        if self.timed:
+            self.file.write(self.HEADER.pack(self.MAGIC, time.time_ns() - time.monotonic_ns(), baudrate))
+
+    def write(self, data: bytes, timestamp_ns: int):
+        with self.lock:
+            if not self.file:
+                return
+            if self.timed:
+                self.file.write(self.RECORD.pack(timestamp_ns, len(data)))
+            self.file.write(data)
+            self.file.flush()
+            self.bytes += len(data)
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    @classmethod
+    def load(cls, path, baudrate=115200):
+        # The records are read lazily; the file is only opened once iteration starts and closed when it ends
+        with open(path, 'rb') as f:
+            header = f.read(cls.HEADER.size)
+        if len(header) == cls.HEADER.size and header[:8] == cls.MAGIC:
+            _, wall_offset_ns, _ = cls.HEADER.unpack(header)
+            return wall_offset_ns, cls._timed_records(path)
+        # Raw captures carry no timing, so pace them as if they arrived at the line rate
+        return time.time_ns() - time.monotonic_ns(), cls._raw_records(path, baudrate)
+
+    @classmethod
+    def payload_size(cls, path) -> int:
+        # Bytes of captured data, without the file and record headers; only the record headers are read
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            header = f.read(cls.HEADER.size)
+            if len(header) < cls.HEADER.size or header[:8] != cls.MAGIC:
+                return size
+            total = 0
+            position = cls.HEADER.size
+            while position + cls.RECORD.size <= size:
+                f.seek(position)
+                _, length = cls.RECORD.unpack(f.read(cls.RECORD.size))
+                position += cls.RECORD.size
+                # A capture cut off mid-record replays only what is there
+                length = min(length, size - position)
+                total += length
+                position += length
+            return total
+
+    @classmethod
+    def _timed_records(cls, path):
+        with open(path, 'rb') as f:
+            f.seek(cls.HEADER.size)
+            while True:
+                head = f.read(cls.RECORD.size)
+                if len(head) < cls.RECORD.size:
+                    return
+                timestamp_ns, length = cls.RECORD.unpack(head)
+                data = f.read(length)
+                if data:
+                    yield timestamp_ns, data
+                if len(data) < length:
+                    return
+
+    @staticmethod
+    def _raw_records(path, baudrate):
+        ns_per_byte = 10 * 1_000_000_000 // baudrate
+        timestamp_ns = time.monotonic_ns()
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(256)
+                if not data:
+                    return
+                timestamp_ns += len(data) * ns_per_byte
+                yield timestamp_ns, data
+
+
+class TxJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, data=None, path=None, rate=0, chunk_size=TX_CHUNK_BYTES, chunk_delay_ms=0):
+        self.id = next(TxJob._ids)
+        self.data = data
+        self.path = path
+        self.total = len(data) if path is None else os.path.getsize(path)
+        self.label = os.path.basename(path) if path else f"{self.total} bytes"
+        self.rate = rate
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay_ms = chunk_delay_ms
+        self.sent = 0
+        self.offset = 0
+        self.pending = b''
+        self.file = None
+        self.started = None
+        self.next_send = 0.0
+        self.cancelled = False
+        self.ok = None
+        self.message = ''
+        self._done = threading.Event()
+
+    @property
+    def complete(self):
+        return self.sent >= self.total and not self.pending
+
+    def next_chunk(self) -> bytes:
+        # Leftovers from a partial write go out before anything new is read
+        if not self.pending:
+            size = self.chunk_size
+            if self.rate:
+                size = min(size, max(1, self.rate // 100))
+            if self.path:
+                if not self.file:
+                    self.file = open(self.path, 'rb')
+                self.pending = self.file.read(size)
+            else:
+                self.pending = self.data[self.offset:self.offset + size]
+            self.offset += len(self.pending)
+        return self.pending
+
+    def advance(self, written: int):
+        self.pending = self.pending[written:]
+        self.sent += written
+
+    def finish(self, ok, message):
+        self.ok = ok
+        self.message = message
+        if self.file:
+            self.file.close()
+            self.file = None
+        self._done.set()
+
+    def wait(self, timeout=None) -> bool:
+        self._done.wait(timeout)
+        return bool(self.ok)
+
+
+SOH, STX, EOT, ACK, NAK, CAN, SUB = 0x01, 0x02, 0x04, 0x06, 0x15, 0x18, 0x1A
+CRC_REQUEST = 0x43
+
+
+class ModemTransfer:
+    # XMODEM-1K / YMODEM state machine; the serial I/O thread feeds it bytes and writes whatever it returns
+    def __init__(self, protocol, direction, path):
+        self.protocol = protocol
+        self.ymodem = protocol == "YMODEM"
+        self.sending = direction == "send"
+        self.path = path
+        self.label = os.path.basename(path) if self.sending else path
+        self.state = 'idle'
+        self.crc = True
+        self.buffer = bytearray()
+        self.file = None
+        self.file_size = None
+        self.file_written = 0
+        self.files = []
+        self.block = 0
+        self.packet = b''
+        self.payload_len = 0
+        self.got_block = False
+        self.eot_seen = False
+        self.cancels = 0
+        self.retries = 0
+        self.total_retries = 0
+        self.bytes_done = 0
+        self.total = os.path.getsize(path) if self.sending else 0
+        self.started = None
+        self.deadline = 0.0
+        self.cancel_requested = False
+        self.done = False
+        self.ok = False
+        self.message = ''
+
+    @property
+    def throughput(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def start(self, now) -> bytes:
+        self.started = now
+        if self.sending:
+            self.file = open(self.path, 'rb')
+            self.state = 'wait_start'
+            self.deadline = now + MODEM_TIMEOUT_S
+            return b''
+        # The receiver drives the session by asking for CRC mode
+        self.state = 'wait_header' if self.ymodem else 'wait_block'
+        self.block = 1
+        self.deadline = now + MODEM_START_TIMEOUT_S
+        return bytes([CRC_REQUEST])
+
+    def feed(self, data: bytes, now) -> bytes:
+        if self.done:
+            return b''
+        if not self.sending:
+            self.buffer += data
+            return self.parse_blocks(now)
+        out = bytearray()
+        for byte in data:
+            out += self.on_response(byte, now)
+            if self.done:
+                break
+        return bytes(out)
+
+    def poll(self, now) -> bytes:
+        if self.done or now < self.deadline:
+            return b''
+        if self.sending:
+            if self.state in ('wait_eot_ack', 'wait_end_ack'):
+                return self.retry(now, self.packet)
+            # Data blocks only go out again on a NAK; resending on our own timeout as well
+            # lets a late ACK pair up with the wrong block
+            return self.retry(now, b'')
+        self.buffer.clear()
+        waiting_first = self.state == 'wait_header' or not self.got_block
+        out = self.retry(now, bytes([CRC_REQUEST if waiting_first else NAK]))
+        if waiting_first and not self.done:
+            self.deadline = now + MODEM_START_TIMEOUT_S
+        return out
+
+    def retry(self, now, packet: bytes) -> bytes:
+        self.retries += 1
+        self.total_retries += 1
+        if self.retries > MODEM_MAX_RETRIES:
+            return self.abort(f"Gave up after {MODEM_MAX_RETRIES} retries on block {self.block}")
+        self.deadline = now + MODEM_TIMEOUT_S
+        return packet
+
+    def abort(self, reason) -> bytes:
+        self.finish(False, reason)
+        return bytes([CAN] * 3)
+
+    def finish(self, ok, message):
+        self.done = True
+        self.ok = ok
+        self.message = message
+        self.close()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    # Sender
+
+    def on_response(self, byte, now) -> bytes:
+        if byte == CAN:
+            self.cancels += 1
+            if self.cancels >= 2:
+                self.finish(False, "Cancelled by receiver")
+            return b''
+        self.cancels = 0
+        state = self.state
+        if state == 'wait_start':
+            if byte == CRC_REQUEST or (byte == NAK and not self.ymodem):
+                self.crc = byte == CRC_REQUEST
+                return self.send_header(now) if self.ymodem else self.send_next(now)
+        elif state == 'wait_header_ack':
+            if byte == ACK:
+                self.state = 'wait_data_start'
+                self.deadline = now + MODEM_TIMEOUT_S
+            elif byte in (NAK, CRC_REQUEST):
+                return self.retry(now, self.packet)
+        elif state == 'wait_data_start':
+            if byte == CRC_REQUEST:
+                return self.send_next(now)
+        elif state == 'wait_ack':
+            if byte == ACK:
+                self.bytes_done += self.payload_len
+                return self.send_next(now)
+            if byte == NAK or (byte == CRC_REQUEST and self.block == 1):
+                return self.retry(now, self.packet)
+        elif state == 'wait_eot_ack':
+            if byte == ACK:
+                if not self.ymodem:
+                    self.finish(True, self.summary())
+                    return b''
+                self.state = 'wait_end_start'
+                self.deadline = now + MODEM_TIMEOUT_S
+            elif byte == NAK and self.ymodem and not self.eot_seen:
+                # The first EOT is always NAKed by a YMODEM receiver
+                self.eot_seen = True
+                return self.packet
+            elif byte == NAK:
+                return self.retry(now, self.packet)
+        elif state == 'wait_end_start':
+            if byte == CRC_REQUEST:
+                # An empty block 0 closes the YMODEM batch
+                return self.send_packet(now, self.build(0, b'', 128, 0), 'wait_end_ack')
+        elif state == 'wait_end_ack':
+            if byte == ACK:
+                self.finish(True, self.summary())
+            elif byte in (NAK, CRC_REQUEST):
+                return self.retry(now, self.packet)
+        return b''
+
+    def send_header(self, now) -> bytes:
+        info = f"{os.path.basename(self.path)}\0{self.total} {int(os.path.getmtime(self.path)):o}".encode('utf-8')
+        size = 128 if len(info) < 128 else 1024
+        return self.send_packet(now, self.build(0, info[:size - 1], size, 0), 'wait_header_ack')
+
+    def send_next(self, now) -> bytes:
+        # Blocks are read from disk one at a time so file size never matters
+        data = self.file.read(1024)
+        if not data:
+            return self.send_packet(now, bytes([EOT]), 'wait_eot_ack')
+        self.block = (self.block + 1) & 0xFF
+        size = 128 if len(data) <= 128 else 1024
+        return self.send_packet(now, self.build(self.block, data, size), 'wait_ack', len(data))
+
+    def send_packet(self, now, packet, state, payload_len=0) -> bytes:
+        self.packet = packet
+        self.payload_len = payload_len
+        self.state = state
+        self.retries = 0
+        self.deadline = now + MODEM_TIMEOUT_S
+        return packet
+
+    def build(self, number, payload, size, pad=SUB) -> bytes:
+        payload = payload.ljust(size, bytes([pad]))
+        head = bytes([STX if size == 1024 else SOH, number, 0xFF - number])
+        if self.crc:
+            return head + payload + binascii.crc_hqx(payload, 0).to_bytes(2, 'big')
+        return head + payload + bytes([sum(payload) & 0xFF])
+
+    # Receiver
+
+    def parse_blocks(self, now) -> bytes:
+        out = bytearray()
+        buffer = self.buffer
+        while buffer and not self.done:
+            head = buffer[0]
+            if head in (SOH, STX):
+                size = 1024 if head == STX else 128
+                if len(buffer) < size + 5:
+                    break
+                packet = bytes(buffer[:size + 5])
+                del buffer[:size + 5]
+                out += self.on_block(packet, size, now)
+            elif head == EOT:
+                del buffer[0]
+                out += self.on_eot(now)
+            elif head == CAN:
+                if len(buffer) < 2:
+                    break
+                if buffer[1] == CAN:
+                    self.finish(False, "Cancelled by sender")
+                    break
+                del buffer[0]
+            else:
+                del buffer[0]
+        return bytes(out)
+
+    def on_block(self, packet, size, now) -> bytes:
+        number = packet[1]
+        payload = packet[3:3 + size]
+        if number != 0xFF - packet[2] or binascii.crc_hqx(payload, 0) != int.from_bytes(packet[-2:], 'big'):
+            # Whatever followed a damaged block is line noise too
+            self.buffer.clear()
+            return self.retry(now, bytes([NAK]))
+        if self.state == 'wait_header':
+            if number != 0:
+                return self.retry(now, bytes([NAK]))
+            return self.on_header(payload, now)
+        expected = self.block & 0xFF
+        if number == (expected - 1) & 0xFF:
+            # Our ACK got lost and the sender repeated itself
+            return bytes([ACK])
+        if number != expected:
+            return self.abort(f"Block sequence error: expected {expected}, got {number}")
+        if self.file is None:
+            self.open_file(self.path)
+        data = payload
+        if self.file_size is not None:
+            data = data[:max(0, self.file_size - self.file_written)]
+        self.file.write(data)
+        self.file_written += len(data)
+        self.bytes_done += len(data)
+        self.block += 1
+        self.got_block = True
+        self.retries = 0
+        self.deadline = now + MODEM_TIMEOUT_S
+        return bytes([ACK])
+
+    def on_header(self, payload, now) -> bytes:
+        name, _, info = payload.partition(b'\0')
+        if not name:
+            self.finish(True, self.summary())
+            return bytes([ACK])
+        fields = info.split(b'\0')[0].split()
+        self.file_size = int(fields[0]) if fields and fields[0].isdigit() else None
+        self.total += self.file_size or 0
+        # Never trust a sender-supplied path
+        file_name = os.path.basename(name.decode('utf-8', 'replace').replace('\\', '/')) or "received.bin"
+        self.open_file(os.path.join(self.path, file_name))
+        self.state = 'wait_block'
+        self.block = 1
+        self.got_block = False
+        self.eot_seen = False
+        self.retries = 0
+        self.deadline = now + MODEM_START_TIMEOUT_S
+        return bytes([ACK, CRC_REQUEST])
+
+    def on_eot(self, now) -> bytes:
+        if self.state != 'wait_block':
+            return bytes([ACK])
+        if self.ymodem and not self.eot_seen:
+            # YMODEM NAKs the first EOT so a corrupted byte can't end the file early
+            self.eot_seen = True
+            self.deadline = now + MODEM_TIMEOUT_S
+            return bytes([NAK])
+        self.close_file()
+        if not self.ymodem:
+            self.finish(True, self.summary())
+            return bytes([ACK])
+        self.state = 'wait_header'
+        self.retries = 0
+        self.deadline = now + MODEM_START_TIMEOUT_S
+        return bytes([ACK, CRC_REQUEST])
+
+    def open_file(self, path):
+        self.file = open(path, 'w+b')
+        self.file_written = 0
+        self.files.append(path)
+
+    def close_file(self):
+        if self.file and self.file_size is None:
+            # XMODEM has no length field, so strip the SUB padding off the last block
+            self.file.seek(max(0, self.file_written - 1024))
+            tail = self.file.read()
+            padding = len(tail) - len(tail.rstrip(bytes([SUB])))
+            if padding:
+                self.file.truncate(self.file_written - padding)
+                self.bytes_done -= padding
+        self.close()
+        self.file_size = None
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        speed = f" at {self.bytes_done / elapsed / 1024:.1f} KB/s" if elapsed > 0 else ""
+        if self.sending:
+            what = f"Sent {self.label}"
+        else:
+            what = f"Received {', '.join(os.path.basename(p) for p in self.files) or 'nothing'}"
+        return f"{what} ({self.bytes_done:,} bytes{speed}, {self.total_retries} retries)"
+
+
+def port_identity(device):
+    # USB ports are matched on VID/PID/serial; boards without a serial number fall back to the hub location
+    if sys.platform.startswith('linux'):
+        from serial.tools.list_ports_linux import SysFS
+        info = SysFS(device) if os.path.exists(device) else None
+    else:
+        info = next((p for p in serial.tools.list_ports.comports() if p.device == device), None)
+    if info is None or info.vid is None:
+        return None
+    return (info.vid, info.pid, info.serial_number or info.location)
+
+
+def find_port_by_identity(identity):
+    for info in serial.tools.list_ports.comports():
+        if info.vid is not None and (info.vid, info.pid, info.serial_number or info.location) == identity:
+            return info.device
+    return None
+
+
+class KeepInputSerial(serial.Serial):
+    # pyserial's POSIX open() flushes the driver's input buffer, which would throw away the first boot lines
+    # of a board that was just reconnected. The flush is skipped during open() only; on Windows open() purges
+    # the port itself and this class behaves like serial.Serial.
+    _opening = False
+
+    def open(self):
+        self._opening = True
+        try:
+            super().open()
+        finally:
+            self._opening = False
+
+    def _reset_input_buffer(self):
+        if not self._opening:
+            super()._reset_input_buffer()
+
+
 class SerialMonitorThread(QThread):
-    data_received = Signal(bytes)
+    data_received = Signal(bytes, object)
+    frames_decoded = Signal(list)
+    samples_received = Signal(dict)
     error = Signal(str)
     data_sent = Signal(str)
-
-    def __init__(self, port, baudrate, data_bits=8, stop_bits=1, parity='N'):
+    tx_progress = Signal(int, int, int)
+    tx_done = Signal(int, bool, str)
+    transfer_progress = Signal(int, int, int)
+    transfer_done = Signal(bool, str)
+    connection_lost = Signal(str)
+    reconnected = Signal(str)
+
+    def __init__(self, port, baudrate, data_bits=8, stop_bits=1, parity='N', auto_reconnect=False):
         super().__init__()
         self.port = port
         self.baudrate = baudrate
@@ -574,34 +2202,143 @@ class SerialMonitorThread(QThread):
         self.stop_bits = stop_bits
         self.parity = parity
         self.serial_port = None
+        self.auto_reconnect = auto_reconnect
+        self.identity = None
         self._is_running = True
-        self._write_mutex = QMutex()
+        self.tx_queue = queue.Queue()
+        # Orders queue_tx against the final drain, so no job is queued after the port has closed
+        self.tx_lock = threading.Lock()
+        self.tx_job = None
+        self.tx_wakeup = threading.Event()
+        self._tx_reported = 0.0
+        self.transfer = None
+        self.next_transfer = None
+        self.transfer_out = bytearray()
+        self._transfer_reported = 0.0
+        bits_per_char = 1 + data_bits + (0 if parity == 'N' else 1) + stop_bits
+        self.timestamper = LineTimestamper(baudrate, bits_per_char)
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.decoder = None
+        self.sample_extractor = None
+        self.recorder = None
+        self.bridge_endpoint = None
 
     def run(self):
         try:
-            self.serial_port = serial.Serial(
-                self.port, 
-                self.baudrate,
-                bytesize=self.data_bits,
-                stopbits=self.stop_bits,
-                parity=self.parity,
-                timeout=1,
-                write_timeout=2
-            )
+            self.serial_port = self.open_port(self.port)
+            self.identity = port_identity(self.port)
             self.msleep(100)
-            
+
             while self._is_running:
-                if self.serial_port.in_waiting:
-                    data = self.serial_port.read(self.serial_port.in_waiting)
-                    self.data_received.emit(data)
-                else:
-                    self.msleep(10)
+                try:
+                    self.io_loop()
+                except (serial.SerialException, OSError) as e:
+                    if not (self.auto_reconnect and self._is_running):
+                        raise
+                    # The session (buffer, decoder, recorder, bridge) lives on; only the port object is replaced
+                    self.connection_lost.emit(f"{self.port}: {e}")
+                    self.fail_pending_tx("Device disconnected")
+                    self.fail_transfer("Device disconnected")
+                    device = self.wait_for_device()
+                    if device:
+                        self.reconnected.emit(device)
         except Exception as e:
             self.error.emit(f"Serial error: {str(e)}")
         finally:
+            self._is_running = False
+            self.fail_pending_tx("Serial port closed")
+            self.fail_transfer("Serial port closed")
             if self.serial_port and self.serial_port.is_open:
                 self.serial_port.close()
 
+    def open_port(self, device, keep_input=False):
+        port_class = KeepInputSerial if keep_input and os.name == 'posix' else serial.Serial
+        port = port_class(
+            None,
+            self.baudrate,
+            bytesize=self.data_bits,
+            stopbits=self.stop_bits,
+            parity=self.parity,
+            timeout=1,
+            write_timeout=0
+        )
+        port.port = device
+        port.open()
+        return port
+
+    def wait_for_device(self):
+        try:
+            self.serial_port.close()
+        except:
+            pass
+        device = self.serial_port.port
+        next_scan = 0.0
+        while self._is_running:
+            # Re-enumerated boards usually come back under the same name, so that is tried first and often;
+            # a full scan for the same VID/PID/serial under a new name runs less frequently
+            candidates = [device]
+            now = time.perf_counter()
+            if self.identity and now >= next_scan:
+                next_scan = now + RECONNECT_SCAN_S
+                moved = find_port_by_identity(self.identity)
+                if moved and moved != device:
+                    candidates.insert(0, moved)
+            for candidate in candidates:
+                try:
+                    # Keeps the boot lines sent before the port was reopened on POSIX only; Windows purges on open
+                    port = self.open_port(candidate, keep_input=True)
+                except (serial.SerialException, OSError, ValueError):
+                    continue
+                if self.identity and port_identity(candidate) != self.identity:
+                    port.close()
+                    continue
+                self.serial_port = port
+                return candidate
+            time.sleep(RECONNECT_POLL_S)
+        return None
+
+    def io_loop(self):
+        # Reads and the TX queue share this thread; writes are non-blocking so neither starves the other
+        while self._is_running:
+            busy = False
+            if self.serial_port.in_waiting:
+                data = self.serial_port.read(self.serial_port.in_waiting)
+                if self.transfer:
+                    self.feed_transfer(data)
+                else:
+                    self.process(data, time.monotonic_ns())
+                busy = True
+            if self.transfer or self.next_transfer:
+                # A file transfer owns the line until it ends; queued writes wait behind it
+                wait = self.pump_transfer()
+            else:
+                wait = self.pump_tx()
+            if wait == 0:
+                busy = True
+            if not busy:
+                self.tx_wakeup.wait(min(wait, 0.01) if wait else 0.01)
+                self.tx_wakeup.clear()
+
+    def process(self, data: bytes, read_ns: int):
+        marks = self.timestamper.marks(data, read_ns)
+        self.data_received.emit(data, marks)
+        decoder = self.decoder
+        if decoder:
+            records = decoder.feed(data, read_ns)
+            if records:
+                self.frames_decoded.emit(records)
+        extractor = self.sample_extractor
+        if extractor:
+            samples = extractor.feed(data, marks)
+            if samples:
+                self.samples_received.emit(samples)
+        recorder = self.recorder
+        if recorder:
+            recorder.write(data, read_ns)
+        endpoint = self.bridge_endpoint
+        if endpoint:
+            endpoint.broadcast(data)
+
     def stop(self):
         self._is_running = False
         if self.serial_port and self.serial_port.is_open:
@@ -610,23 +2347,1391 @@ class SerialMonitorThread(QThread):
             except:
                 pass
 
-    def write(self, data: bytes):
-        self._write_mutex.lock()
+    def write(self, data: bytes, rate=0, chunk_size=TX_CHUNK_BYTES, chunk_delay_ms=0) -> TxJob:
+        # Safe from any thread; the I/O thread does the actual write and reports back through tx_done
+        return self.queue_tx(TxJob(bytes(data), rate=rate, chunk_size=chunk_size, chunk_delay_ms=chunk_delay_ms))
+
+    def send_file(self, path, rate=0, chunk_size=TX_CHUNK_BYTES, chunk_delay_ms=0) -> TxJob:
+        return self.queue_tx(TxJob(path=path, rate=rate, chunk_size=chunk_size, chunk_delay_ms=chunk_delay_ms))
+
+    def queue_tx(self, job: TxJob) -> TxJob:
+        with self.tx_lock:
+            queued = self._is_running
+            if queued:
+                self.tx_queue.put(job)
+        if not queued:
+            self.finish_tx(job, False, "Serial port is not open")
+            return job
+        self.tx_wakeup.set()
+        return job
+
+    def cancel_tx(self):
+        with self.tx_queue.mutex:
+            jobs = list(self.tx_queue.queue)
+        if self.tx_job:
+            jobs.append(self.tx_job)
+        for job in jobs:
+            job.cancelled = True
+        self.tx_wakeup.set()
+
+    def pump_tx(self):
+        # Returns None when idle, 0 after doing work, or the seconds until the paced job may send again
+        job = self.tx_job
+        if job is None:
+            try:
+                job = self.tx_queue.get_nowait()
+            except queue.Empty:
+                return None
+            self.tx_job = job
+            job.started = job.next_send = time.perf_counter()
+        if job.cancelled:
+            self.finish_tx(job, False, "Cancelled")
+            return 0
+        now = time.perf_counter()
+        if now < job.next_send:
+            return job.next_send - now
         try:
-            if self.serial_port and self.serial_port.is_open:
-                written = self.serial_port.write(data)
-                self.serial_port.flush()
-                self.data_sent.emit(f"Sent {written} bytes")
-                return True
-            else:
-                self.error.emit("Serial port is not open")
-                return False
+            chunk = job.next_chunk()
+            if not chunk:
+                self.finish_tx(job, False, f"{job.label} ended after {job.sent:,} bytes")
+                return 0
+            written = self.serial_port.write(chunk) or 0
         except Exception as e:
             self.error.emit(f"Error sending data: {str(e)}")
+            self.finish_tx(job, False, str(e))
+            return 0
+        job.advance(written)
+        if job.complete:
+            self.data_sent.emit(f"Sent {job.sent} bytes")
+            self.finish_tx(job, True, f"Sent {job.sent:,} bytes")
+            return 0
+        if job.rate:
+            job.next_send = job.started + job.sent / job.rate
+        if job.chunk_delay_ms and not job.pending:
+            job.next_send = max(job.next_send, now + job.chunk_delay_ms / 1000)
+        if not written:
+            # Driver buffer is full, back off briefly instead of spinning
+            job.next_send = max(job.next_send, now + 0.001)
+        if now - self._tx_reported >= 0.1:
+            self._tx_reported = now
+            self.tx_progress.emit(job.id, job.sent, job.total)
+        return 0
+
+    def finish_tx(self, job, ok, message):
+        if self.tx_job is job:
+            self.tx_job = None
+        job.finish(ok, message)
+        self.tx_progress.emit(job.id, job.sent, job.total)
+        self.tx_done.emit(job.id, ok, message)
+
+    def fail_pending_tx(self, message):
+        if self.tx_job:
+            self.finish_tx(self.tx_job, False, message)
+        with self.tx_lock:
+            with self.tx_queue.mutex:
+                jobs = list(self.tx_queue.queue)
+                self.tx_queue.queue.clear()
+        for job in jobs:
+            self.finish_tx(job, False, message)
+
+    def start_transfer(self, transfer: ModemTransfer) -> bool:
+        if not self._is_running or self.transfer or self.next_transfer:
             return False
-        finally:
-            self._write_mutex.unlock()
-
+        self.next_transfer = transfer
+        self.tx_wakeup.set()
+        return True
+
+    def cancel_transfer(self):
+        transfer = self.transfer or self.next_transfer
+        if transfer:
+            transfer.cancel_requested = True
+            self.tx_wakeup.set()
+
+    def feed_transfer(self, data: bytes):
+        transfer = self.transfer
+        try:
+            self.transfer_out += transfer.feed(data, time.perf_counter())
+        except Exception as e:
+            self.transfer_out += transfer.abort(str(e))
+
+    def pump_transfer(self):
+        now = time.perf_counter()
+        transfer = self.transfer
+        try:
+            if transfer is None:
+                transfer = self.transfer = self.next_transfer
+                self.next_transfer = None
+                self.transfer_out = bytearray(transfer.start(now))
+            if transfer.cancel_requested and not transfer.done:
+                self.transfer_out += transfer.abort("Cancelled")
+            else:
+                self.transfer_out += transfer.poll(now)
+        except Exception as e:
+            self.transfer_out += transfer.abort(str(e))
+        if self.transfer_out:
+            written = self.serial_port.write(self.transfer_out) or 0
+            del self.transfer_out[:written]
+            if self.transfer_out:
+                return 0.001
+        if transfer.done or now - self._transfer_reported >= 0.1:
+            self._transfer_reported = now
+            self.transfer_progress.emit(transfer.bytes_done, transfer.total, transfer.total_retries)
+        if transfer.done:
+            self.transfer = None
+            self.transfer_done.emit(transfer.ok, transfer.message)
+            return 0
+        # Poll tightly while a transfer runs, every block waits on a one-byte reply
+        return 0.001
+
+    def fail_transfer(self, message):
+        for transfer in (self.transfer, self.next_transfer):
+            if transfer:
+                transfer.finish(False, message)
+                self.transfer_done.emit(False, message)
+        self.transfer = self.next_transfer = None
+
+
+class SerialReplayThread(SerialMonitorThread):
+    progress = Signal(int, int)
+    pty_ready = Signal(str)
+    finished = Signal(bool, str)
+
+    def __init__(self, path, speed=1.0, baudrate=115200, pty_mode=False):
+        super().__init__(path, baudrate)
+        self.path = path
+        self.speed = speed
+        self.pty_mode = pty_mode
+        self.master_fd = None
+        self.total_bytes = 0
+        # Original monotonic stamps plus the recorded wall offset reproduce the captured clock times
+        self.wall_offset_ns, self.records = SessionRecorder.load(path, baudrate)
+
+    def run(self):
+        slave_fd = None
+        replayed = 0
+        try:
+            self.total_bytes = SessionRecorder.payload_size(self.path)
+            if self.pty_mode:
+                import tty
+                self.master_fd, slave_fd = os.openpty()
+                tty.setraw(slave_fd)
+                os.set_blocking(self.master_fd, False)
+                self.pty_ready.emit(os.ttyname(slave_fd))
+                # Give host tools a moment to attach before the first byte goes out
+                self.wait_until(time.perf_counter_ns() + 1_000_000_000)
+
+            start_ns = time.perf_counter_ns()
+            first_ns = None
+            last_progress = 0
+            pending = []
+            pending_bytes = 0
+            for timestamp_ns, data in self.records:
+                if not self._is_running:
+                    break
+                if first_ns is None:
+                    first_ns = timestamp_ns
+                if self.speed:
+                    self.wait_until(start_ns + int((timestamp_ns - first_ns) / self.speed))
+                    self.deliver(data, timestamp_ns)
+                    replayed += len(data)
+                else:
+                    # Flat out, coalesce reads so the GUI sees a few large chunks instead of thousands of tiny ones
+                    pending.append(data)
+                    pending_bytes += len(data)
+                    if pending_bytes < REPLAY_CHUNK_BYTES:
+                        continue
+                    self.deliver(b''.join(pending), timestamp_ns)
+                    replayed += pending_bytes
+                    pending, pending_bytes = [], 0
+                    self.msleep(1)
+                now = time.perf_counter_ns()
+                if now - last_progress > 100_000_000:
+                    last_progress = now
+                    self.progress.emit(replayed, self.total_bytes)
+            if pending and self._is_running:
+                self.deliver(b''.join(pending), timestamp_ns)
+                replayed += pending_bytes
+            self.progress.emit(replayed, self.total_bytes)
+            if self.master_fd is not None:
+                self.wait_until(time.perf_counter_ns() + 1_000_000_000)
+            self.finished.emit(True, f"Replayed {replayed:,} bytes from {os.path.basename(self.path)}")
+        except Exception as e:
+            self.error.emit(f"Replay error: {str(e)}")
+            self.finished.emit(False, str(e))
+        finally:
+            self.records.close()
+            for fd in (self.master_fd, slave_fd):
+                if fd is not None:
+                    os.close(fd)
+            self.master_fd = None
+
+    def wait_until(self, deadline_ns):
+        while self._is_running:
+            remaining = deadline_ns - time.perf_counter_ns()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining / 1e9, 0.05))
+
+    def deliver(self, data: bytes, timestamp_ns: int):
+        if self.master_fd is not None:
+            view = memoryview(data)
+            while view and self._is_running:
+                try:
+                    view = view[os.write(self.master_fd, view):]
+                except BlockingIOError:
+                    self.drain_pty()
+                    time.sleep(0.005)
+            self.drain_pty()
+        self.process(data, timestamp_ns)
+
+    def drain_pty(self):
+        try:
+            incoming = os.read(self.master_fd, 4096)
+        except (BlockingIOError, OSError):
+            return
+        if incoming:
+            self.data_sent.emit(f"Virtual port received {len(incoming)} bytes")
+
+    def queue_tx(self, job: TxJob) -> TxJob:
+        self.error.emit("Replay sessions are read-only")
+        self.finish_tx(job, False, "Replay sessions are read-only")
+        return job
+
+    def start_transfer(self, transfer: ModemTransfer) -> bool:
+        self.error.emit("Replay sessions are read-only")
+        return False
+
+
+class SerialSessionBuffer:
+    def __init__(self, max_bytes=SERIAL_SESSION_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.base_offset = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def end_offset(self):
+        return self.base_offset + len(self.data)
+
+    def append(self, data: bytes) -> int:
+        self.data += data
+        if len(self.data) <= self.max_bytes:
+            return 0
+        # Drop an extra slack so trimming (and the view resets it causes) stays rare
+        drop = len(self.data) - self.max_bytes + self.max_bytes // 8
+        drop += -drop % HEX_DUMP_ROW_BYTES
+        del self.data[:drop]
+        self.base_offset += drop
+        return drop
+
+    def read(self, offset: int, size: int) -> bytes:
+        start = max(offset - self.base_offset, 0)
+        return bytes(self.data[start:start + size])
+
+    def clear(self):
+        self.data = bytearray()
+        self.base_offset = 0
+
+
+class SerialChannel:
+    def __init__(self, port, serial_port, baudrate):
+        self.port = port
+        self.serial_port = serial_port
+        self.buffer = SerialSessionBuffer(MULTI_PORT_BUFFER_BYTES)
+        self.timestamper = LineTimestamper(baudrate)
+        self.pending = []
+        self.lines = LineAssembler()
+        self.line_count = 0
+        self.write_lock = threading.Lock()
+        self.endpoint = None
+
+    def feed(self, data: bytes, read_ns: int):
+        self.buffer.append(data)
+        lines = self.lines.feed(data, self.timestamper.marks(data, read_ns))
+        self.line_count += len(lines)
+        for timestamp_ns, line in lines:
+            self.pending.append((timestamp_ns, self.port, line.rstrip(b'\r').decode('utf-8', errors='replace')))
+
+
+class MultiSerialMonitorThread(QThread):
+    lines_received = Signal(list)
+    error = Signal(str, str)
+    port_opened = Signal(str)
+    port_closed = Signal(str)
+
+    def __init__(self, ports, baudrate, flush_interval_ms=50):
+        super().__init__()
+        self.ports = list(ports)
+        self.baudrate = baudrate
+        self.flush_interval_ns = flush_interval_ms * 1_000_000
+        self.channels = {}
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.bridge = None
+        self._is_running = True
+
+    def run(self):
+        # One selector covers every port on POSIX; Windows falls back to polling in_waiting
+        selector = selectors.DefaultSelector() if os.name == 'posix' else None
+        for port in self.ports:
+            try:
+                serial_port = serial.Serial(port, self.baudrate, timeout=0, write_timeout=2)
+            except Exception as e:
+                self.error.emit(port, f"Serial error: {str(e)}")
+                continue
+            channel = SerialChannel(port, serial_port, self.baudrate)
+            self.channels[port] = channel
+            if self.bridge:
+                self.attach_bridge(channel, self.bridge)
+            if selector:
+                selector.register(serial_port.fileno(), selectors.EVENT_READ, channel)
+            self.port_opened.emit(port)
+
+        last_flush = time.monotonic_ns()
+        try:
+            while self._is_running and self.channels:
+                if selector:
+                    ready = [key.data for key, _ in selector.select(timeout=0.02)]
+                else:
+                    # Each port is polled on its own, so one adapter being unplugged only closes its channel
+                    ready = []
+                    for channel in list(self.channels.values()):
+                        try:
+                            if channel.serial_port.in_waiting:
+                                ready.append(channel)
+                        except Exception as e:
+                            self.close_channel(channel, selector, f"Serial error: {str(e)}")
+                    if not ready:
+                        self.msleep(5)
+
+                for channel in ready:
+                    try:
+                        data = channel.serial_port.read(channel.serial_port.in_waiting or 1)
+                    except Exception as e:
+                        self.close_channel(channel, selector, f"Serial error: {str(e)}")
+                        continue
+                    if data:
+                        channel.feed(data, time.monotonic_ns())
+                        endpoint = channel.endpoint
+                        if endpoint:
+                            endpoint.broadcast(data)
+
+                now = time.monotonic_ns()
+                if now - last_flush >= self.flush_interval_ns:
+                    self.flush()
+                    last_flush = now
+            self.flush()
+        finally:
+            for channel in list(self.channels.values()):
+                self.close_channel(channel, selector)
+            if selector:
+                selector.close()
+
+    def flush(self):
+        batches = []
+        for channel in self.channels.values():
+            if channel.pending:
+                batches.append(channel.pending)
+                channel.pending = []
+        if batches:
+            # Each channel's pending list is already in read order, so a k-way merge keeps the timeline sorted
+            self.lines_received.emit(list(heapq.merge(*batches)))
+
+    def attach_bridge(self, channel, bridge):
+        port = channel.port
+        channel.endpoint = bridge.add_endpoint(port, lambda data: self.write(port, data), lambda: channel.serial_port)
+
+    def close_channel(self, channel, selector, message=None):
+        self.channels.pop(channel.port, None)
+        endpoint = channel.endpoint
+        if endpoint:
+            channel.endpoint = None
+            endpoint.bridge.remove_endpoint(channel.port)
+        if selector:
+            try:
+                selector.unregister(channel.serial_port.fileno())
+            except (KeyError, ValueError, OSError):
+                pass
+        try:
+            channel.serial_port.close()
+        except:
+            pass
+        if channel.pending:
+            self.lines_received.emit(channel.pending)
+            channel.pending = []
+        if message:
+            self.error.emit(channel.port, message)
+        self.port_closed.emit(channel.port)
+
+    def stop(self):
+        self._is_running = False
+
+    def write(self, port, data: bytes):
+        channel = self.channels.get(port)
+        if not channel:
+            self.error.emit(port, "Serial port is not open")
+            return False
+        with channel.write_lock:
+            try:
+                channel.serial_port.write(data)
+                return True
+            except Exception as e:
+                self.error.emit(port, f"Error sending data: {str(e)}")
+                return False
+
+
+class ModemLineGuard:
+    # Virtual and some USB CDC ports have no modem lines; RFC 2217 negotiation must not die on them
+    LINES = ('cts', 'dsr', 'ri', 'cd', 'dtr', 'rts', 'break_condition')
+
+    def __init__(self, serial_port):
+        object.__setattr__(self, 'serial_port', serial_port)
+
+    def __getattr__(self, name):
+        try:
+            return getattr(self.serial_port, name)
+        except (OSError, serial.SerialException):
+            if name in self.LINES:
+                return False
+            raise
+
+    def __setattr__(self, name, value):
+        try:
+            setattr(self.serial_port, name, value)
+        except (OSError, serial.SerialException):
+            if name not in self.LINES:
+                raise
+
+
+class BridgeClient:
+    def __init__(self, sock, address, endpoint):
+        self.sock = sock
+        self.address = f"{address[0]}:{address[1]}"
+        self.endpoint = endpoint
+        self.outbound = bytearray()
+        self.overflow = False
+        self.events = selectors.EVENT_READ
+        self.manager = None
+
+    def queue(self, data: bytes):
+        # Caller holds the bridge lock; a client that cannot keep up is cut off instead of stalling the rest
+        if len(self.outbound) + len(data) > BRIDGE_CLIENT_BUFFER_BYTES:
+            self.overflow = True
+        elif not self.overflow:
+            self.outbound += data
+
+    def write(self, data: bytes):
+        # Telnet/RFC 2217 replies from PortManager
+        with self.endpoint.bridge.lock:
+            self.queue(data)
+
+
+class BridgeEndpoint:
+    def __init__(self, bridge, name, tcp_port, writer, port_getter=None):
+        self.bridge = bridge
+        self.name = name
+        self.tcp_port = tcp_port
+        self.writer = writer
+        self.port_getter = port_getter
+        self.mode = bridge.mode
+        self.clients = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dropped = 0
+        self.listener = socket.create_server((bridge.host, tcp_port))
+        self.listener.setblocking(False)
+
+    def broadcast(self, data: bytes):
+        if not self.clients:
+            return
+        escaped = data.replace(b'\xff', b'\xff\xff') if self.mode == "RFC2217" else data
+        with self.bridge.lock:
+            for client in self.clients:
+                client.queue(escaped if client.manager else data)
+        self.bridge.wake()
+
+
+class SerialTcpBridge(QThread):
+    client_connected = Signal(str, str)
+    client_disconnected = Signal(str, str, str)
+    endpoint_added = Signal(str, int)
+    endpoint_removed = Signal(str)
+    error = Signal(str)
+
+    def __init__(self, base_port=BRIDGE_BASE_PORT, mode="Raw", host="127.0.0.1"):
+        super().__init__()
+        self.base_port = base_port
+        self.mode = mode
+        self.host = host
+        self.endpoints = {}
+        self.port_map = {}
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self._changes = queue.Queue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._is_running = True
+
+    def add_endpoint(self, name, writer, port_getter=None):
+        with self.lock:
+            # A port keeps its TCP port across reconnects so scripts can hard-code it
+            tcp_port = self.port_map.get(name)
+            if tcp_port is None:
+                used = set(self.port_map.values())
+                tcp_port = self.base_port
+                while tcp_port in used:
+                    tcp_port += 1
+            try:
+                endpoint = BridgeEndpoint(self, name, tcp_port, writer, port_getter)
+            except OSError as e:
+                self.error.emit(f"{name}: cannot listen on TCP port {tcp_port}: {str(e)}")
+                return None
+            self.port_map[name] = tcp_port
+            self.endpoints[name] = endpoint
+        self._changes.put(('add', endpoint))
+        self.wake()
+        self.endpoint_added.emit(name, tcp_port)
+        return endpoint
+
+    def remove_endpoint(self, name):
+        with self.lock:
+            endpoint = self.endpoints.pop(name, None)
+        if endpoint:
+            self._changes.put(('remove', endpoint))
+            self.wake()
+
+    def wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+
+    def run(self):
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        last_modem_check = time.monotonic()
+        try:
+            while self._is_running:
+                self.apply_changes()
+                for key, mask in self.selector.select(timeout=0.5):
+                    target = key.data
+                    if target is None:
+                        try:
+                            while self._wake_r.recv(4096):
+                                pass
+                        except OSError:
+                            pass
+                    elif isinstance(target, BridgeEndpoint):
+                        self.accept(target)
+                    elif mask & selectors.EVENT_READ:
+                        self.read_client(target)
+                self.flush_clients()
+                if time.monotonic() - last_modem_check >= 1.0:
+                    last_modem_check = time.monotonic()
+                    self.check_modem_lines()
+        finally:
+            self.apply_changes()
+            for endpoint in list(self.endpoints.values()):
+                self.close_endpoint(endpoint)
+            self.selector.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def apply_changes(self):
+        while True:
+            try:
+                action, endpoint = self._changes.get_nowait()
+            except queue.Empty:
+                return
+            if action == 'add':
+                self.selector.register(endpoint.listener, selectors.EVENT_READ, endpoint)
+            else:
+                self.close_endpoint(endpoint)
+
+    def close_endpoint(self, endpoint):
+        for client in list(endpoint.clients):
+            self.close_client(client, "serial port closed")
+        try:
+            self.selector.unregister(endpoint.listener)
+        except (KeyError, ValueError):
+            pass
+        endpoint.listener.close()
+        with self.lock:
+            if self.endpoints.get(endpoint.name) is endpoint:
+                del self.endpoints[endpoint.name]
+        self.endpoint_removed.emit(endpoint.name)
+
+    def accept(self, endpoint):
+        try:
+            sock, address = endpoint.listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = BridgeClient(sock, address, endpoint)
+        # RFC 2217 needs a real pyserial port to apply remote line settings to, replays stay raw
+        serial_port = endpoint.port_getter() if endpoint.port_getter else None
+        if endpoint.mode == "RFC2217" and serial_port is not None:
+            client.manager = serial.rfc2217.PortManager(ModemLineGuard(serial_port), client)
+        with self.lock:
+            endpoint.clients.append(client)
+        self.selector.register(sock, client.events, client)
+        self.client_connected.emit(endpoint.name, client.address)
+
+    def read_client(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.close_client(client, str(e))
+            return
+        if not data:
+            self.close_client(client, "closed by client")
+            return
+        if client.manager:
+            try:
+                data = b''.join(client.manager.filter(data))
+            except Exception:
+                data = b''
+        if data:
+            client.endpoint.bytes_in += len(data)
+            # Goes through the monitor's own write path, so it serialises with console and macro writes
+            client.endpoint.writer(data)
+
+    def flush_clients(self):
+        for endpoint in list(self.endpoints.values()):
+            for client in list(endpoint.clients):
+                with self.lock:
+                    if client.overflow:
+                        reason = "too slow, output buffer overflowed"
+                    else:
+                        reason = None
+                        try:
+                            sent = client.sock.send(client.outbound) if client.outbound else 0
+                            del client.outbound[:sent]
+                            endpoint.bytes_out += sent
+                        except BlockingIOError:
+                            pass
+                        except OSError as e:
+                            reason = str(e)
+                    pending = bool(client.outbound)
+                if reason:
+                    if client.overflow:
+                        endpoint.dropped += 1
+                    self.close_client(client, reason)
+                    continue
+                events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+                if events != client.events:
+                    client.events = events
+                    self.selector.modify(client.sock, events, client)
+
+    def check_modem_lines(self):
+        for endpoint in list(self.endpoints.values()):
+            for client in list(endpoint.clients):
+                if client.manager:
+                    client.manager.check_modem_lines()
+
+    def close_client(self, client, reason):
+        endpoint = client.endpoint
+        with self.lock:
+            if client in endpoint.clients:
+                endpoint.clients.remove(client)
+        try:
+            self.selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        self.client_disconnected.emit(endpoint.name, client.address, reason)
+
+    def stop(self):
+        self._is_running = False
+        self.wake()
+
+
+def websocket_frame(payload: bytes, opcode=0x1) -> bytes:
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def parse_websocket_frames(buffer: bytearray) -> list:
+    # Consumes complete client frames from buffer; browsers always mask what they send
+    frames = []
+    while len(buffer) >= 2:
+        opcode = buffer[0] & 0x0F
+        masked = buffer[1] & 0x80
+        length = buffer[1] & 0x7F
+        offset = 2
+        if length == 126:
+            if len(buffer) < 4:
+                break
+            length, = struct.unpack_from('!H', buffer, 2)
+            offset = 4
+        elif length == 127:
+            if len(buffer) < 10:
+                break
+            length, = struct.unpack_from('!Q', buffer, 2)
+            offset = 10
+        mask = b''
+        if masked:
+            mask = bytes(buffer[offset:offset + 4])
+            offset += 4
+        if len(buffer) < offset + length:
+            break
+        payload = bytes(buffer[offset:offset + length])
+        if masked:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        del buffer[:offset + length]
+        frames.append((opcode, payload))
+    return frames
+
+
+class ApiClient:
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = f"{address[0]}:{address[1]}"
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+        self.websocket = False
+        self.closing = False
+        self.overflow = False
+        self.origin = None
+        self.events = selectors.EVENT_READ
+
+    def queue(self, data: bytes):
+        # Caller holds the server lock; a subscriber that cannot keep up is cut off instead of stalling the rest
+        if len(self.outbound) + len(data) > API_CLIENT_BUFFER_BYTES:
+            self.overflow = True
+        elif not self.overflow:
+            self.outbound += data
+
+
+class ControlApiServer(QThread):
+    listening = Signal(str, int)
+    client_count_changed = Signal(int)
+    error = Signal(str)
+
+    def __init__(self, jobs, host="127.0.0.1", port=API_DEFAULT_PORT, token="", allowed_origin=""):
+        super().__init__()
+        self.jobs = jobs
+        self.host = host
+        self.port = port
+        self.token = token
+        self.allowed_origin = allowed_origin.rstrip('/')
+        self.clients = []
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._is_running = True
+
+    def publish(self, event: dict):
+        # Encoded once and shared by every subscriber, so a busy job costs the same for one viewer or fifty
+        if not self.subscribers:
+            return
+        frame = websocket_frame(json.dumps(event, default=str).encode('utf-8'))
+        with self.lock:
+            for client in self.subscribers:
+                client.queue(frame)
+        self.wake()
+
+    def wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+
+    def run(self):
+        try:
+            listener = socket.create_server((self.host, self.port))
+        except OSError as e:
+            self.error.emit(f"Control API cannot listen on {self.host}:{self.port}: {str(e)}")
+            return
+        listener.setblocking(False)
+        self.selector.register(listener, selectors.EVENT_READ, listener)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self.jobs.listeners.append(self.publish)
+        self.listening.emit(self.host, listener.getsockname()[1])
+        try:
+            while self._is_running:
+                for key, mask in self.selector.select(timeout=0.5):
+                    target = key.data
+                    if target is None:
+                        try:
+                            while self._wake_r.recv(4096):
+                                pass
+                        except OSError:
+                            pass
+                    elif target is listener:
+                        self.accept(listener)
+                    elif mask & selectors.EVENT_READ:
+                        self.read_client(target)
+                self.flush_clients()
+        finally:
+            if self.publish in self.jobs.listeners:
+                self.jobs.listeners.remove(self.publish)
+            for client in list(self.clients):
+                self.close_client(client)
+            self.selector.close()
+            listener.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def accept(self, listener):
+        try:
+            sock, address = listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = ApiClient(sock, address)
+        with self.lock:
+            self.clients.append(client)
+        self.selector.register(sock, client.events, client)
+
+    def read_client(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.close_client(client)
+            return
+        if not data:
+            self.close_client(client)
+            return
+        client.inbound += data
+        if client.websocket:
+            for opcode, payload in parse_websocket_frames(client.inbound):
+                if opcode == 0x8:
+                    self.send(client, websocket_frame(payload[:2], 0x8), close=True)
+                elif opcode == 0x9:
+                    self.send(client, websocket_frame(payload, 0xA))
+            return
+        if client.closing:
+            return
+        head_end = client.inbound.find(b'\r\n\r\n')
+        if head_end < 0:
+            if len(client.inbound) > API_MAX_REQUEST_BYTES:
+                self.respond(client, 413, {'error': "Request too large"})
+            return
+        head = client.inbound[:head_end].decode('latin-1').split('\r\n')
+        headers = {}
+        for line in head[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > API_MAX_REQUEST_BYTES:
+            self.respond(client, 413, {'error': "Request too large"})
+            return
+        if len(client.inbound) < head_end + 4 + length:
+            return
+        body = bytes(client.inbound[head_end + 4:head_end + 4 + length])
+        del client.inbound[:head_end + 4 + length]
+        try:
+            method, target, _ = head[0].split(' ', 2)
+        except ValueError:
+            self.respond(client, 400, {'error': "Malformed request line"})
+            return
+        try:
+            self.handle_request(client, method.upper(), target, headers, body)
+        except Exception as e:
+            self.respond(client, 500, {'error': str(e)})
+
+    def authorized(self, headers, query):
+        # There is no unauthenticated mode; without a token every request is refused
+        if not self.token:
+            return False
+        supplied = headers.get('authorization', '')
+        supplied = supplied[7:] if supplied.lower().startswith('bearer ') else query.get('token', [''])[0]
+        return hmac.compare_digest(supplied.encode('utf-8'), self.token.encode('utf-8'))
+
+    def handle_request(self, client, method, target, headers, body):
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        # Browsers always send Origin on cross-site fetches and WebSocket upgrades; only the configured one
+        # may talk to the API, so a web page open on the operator's machine cannot drive the flashers
+        origin = headers.get('origin')
+        if origin and origin.rstrip('/') != self.allowed_origin:
+            self.respond(client, 403, {'error': "Cross-origin requests are not allowed"})
+            return
+        client.origin = origin
+        if method == 'OPTIONS':
+            self.respond(client, 204, None)
+            return
+        if method == 'POST' and headers.get('content-type', '').split(';')[0].strip().lower() != 'application/json':
+            self.respond(client, 415, {'error': "Content-Type must be application/json"})
+            return
+        if parts[:1] != ['api']:
+            self.respond(client, 404, {'error': "Not found"})
+            return
+        if not self.authorized(headers, query):
+            self.respond(client, 401, {'error': "Missing or wrong API token"})
+            return
+        route = parts[1:]
+
+        if route == ['events'] and method == 'GET':
+            self.upgrade(client, headers)
+        elif route == ['status'] and method == 'GET':
+            self.respond(client, 200, {'app': APP_NAME, 'version': VERSION, 'subscribers': len(self.subscribers),
+                                       'jobs': self.jobs.counts()})
+        elif route == ['devices'] and method == 'GET':
+            self.respond(client, 200, self.jobs.device_snapshot())
+        elif route == ['devices', 'scan'] and method == 'POST':
+            self.jobs.scan_requested.emit()
+            self.respond(client, 202, {'scanning': True})
+        elif route == ['jobs'] and method == 'GET':
+            self.respond(client, 200, {'jobs': self.jobs.snapshot()})
+        elif route == ['jobs'] and method == 'POST':
+            try:
+                spec = json.loads(body or b'{}')
+            except ValueError:
+                self.respond(client, 400, {'error': "Body must be JSON"})
+                return
+            job, status, message = self.jobs.submit(spec if isinstance(spec, dict) else {})
+            self.respond(client, status, job if job else {'error': message})
+        elif len(route) == 2 and route[0] == 'jobs' and method == 'GET':
+            job = self.jobs.get(route[1])
+            self.respond(client, 200 if job else 404, job or {'error': "No such job"})
+        elif len(route) == 2 and route[0] == 'jobs' and method == 'DELETE':
+            job, status, message = self.jobs.cancel(route[1])
+            self.respond(client, status, job if job else {'error': message})
+        else:
+            self.respond(client, 405 if route in (['events'], ['status'], ['devices'], ['jobs']) else 404,
+                         {'error': f"{method} {url.path} is not supported"})
+
+    def upgrade(self, client, headers):
+        key = headers.get('sec-websocket-key')
+        if 'websocket' not in headers.get('upgrade', '').lower() or not key:
+            self.respond(client, 400, {'error': "Expected a WebSocket upgrade"})
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        handshake = ("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('ascii')
+        # The hello snapshot is queued under the same lock as publish(), so no event can slip in between
+        hello = websocket_frame(json.dumps(dict(self.jobs.device_snapshot(), event='hello', jobs=self.jobs.snapshot()),
+                                           default=str).encode('utf-8'))
+        with self.lock:
+            client.websocket = True
+            client.queue(handshake + hello)
+            self.subscribers.append(client)
+            count = len(self.subscribers)
+        self.client_count_changed.emit(count)
+
+    def respond(self, client, status, payload):
+        reasons = {200: "OK", 201: "Created", 202: "Accepted", 204: "No Content", 400: "Bad Request",
+                   401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+                   409: "Conflict", 413: "Payload Too Large", 415: "Unsupported Media Type",
+                   500: "Internal Server Error"}
+        body = json.dumps(payload, default=str).encode('utf-8') if payload is not None else b''
+        # CORS headers only ever name the one allowed origin, and only when that origin asked
+        cors = (f"Access-Control-Allow-Origin: {client.origin}\r\n"
+                "Vary: Origin\r\n"
+                "Access-Control-Allow-Methods: GET, POST, DELETE, OPTIONS\r\n"
+                "Access-Control-Allow-Headers: Authorization, Content-Type\r\n") if client.origin else ""
+        head = (f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"{cors}"
+                "Connection: close\r\n\r\n")
+        self.send(client, head.encode('latin-1') + body, close=True)
+
+    def send(self, client, data: bytes, close=False):
+        with self.lock:
+            client.queue(data)
+            client.closing = client.closing or close
+
+    def flush_clients(self):
+        for client in list(self.clients):
+            with self.lock:
+                reason = client.overflow
+                if not reason:
+                    try:
+                        sent = client.sock.send(client.outbound) if client.outbound else 0
+                        del client.outbound[:sent]
+                    except BlockingIOError:
+                        pass
+                    except OSError:
+                        reason = True
+                pending = bool(client.outbound)
+            if reason or (client.closing and not pending):
+                self.close_client(client)
+                continue
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+            if events != client.events:
+                client.events = events
+                self.selector.modify(client.sock, events, client)
+
+    def close_client(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+            subscribed = client in self.subscribers
+            if subscribed:
+                self.subscribers.remove(client)
+            count = len(self.subscribers)
+        try:
+            self.selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        if subscribed:
+            self.client_count_changed.emit(count)
+
+    def stop(self):
+        self._is_running = False
+        self.wake()
+
+
+MACRO_VAR_RE = re.compile(r"\$\{(\w+)\}")
+
+
+def parse_macro(script: str) -> list:
+    root = []
+    stack = [root]
+    for lineno, raw in enumerate(script.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        command, _, arg = line.partition(' ')
+        command = command.lower()
+        arg = arg.strip()
+
+        if command in ('send', 'sendraw', 'sendhex', 'log'):
+            stack[-1].append((command, arg, lineno))
+        elif command == 'wait':
+            pattern, timeout = arg, 5000
+            head, _, tail = arg.rpartition(' ')
+            if head and tail.isdigit():
+                pattern, timeout = head, int(tail)
+            if not pattern:
+                raise ValueError(f"Line {lineno}: wait needs a regex")
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Line {lineno}: invalid regex ({e})")
+            stack[-1].append(('wait', (compiled, timeout), lineno))
+        elif command == 'delay':
+            if not arg.isdigit():
+                raise ValueError(f"Line {lineno}: delay needs milliseconds")
+            stack[-1].append(('delay', int(arg), lineno))
+        elif command == 'set':
+            name, _, value = arg.partition(' ')
+            if not re.fullmatch(r"\w+", name):
+                raise ValueError(f"Line {lineno}: set needs a variable name")
+            stack[-1].append(('set', (name, value.strip()), lineno))
+        elif command == 'loop':
+            if not arg.isdigit():
+                raise ValueError(f"Line {lineno}: loop needs a count")
+            body = []
+            stack[-1].append(('loop', (int(arg), body), lineno))
+            stack.append(body)
+        elif command == 'end':
+            if len(stack) == 1:
+                raise ValueError(f"Line {lineno}: end without loop")
+            stack.pop()
+        else:
+            raise ValueError(f"Line {lineno}: unknown command '{command}'")
+    if len(stack) != 1:
+        raise ValueError("Missing 'end' for loop")
+    return root
+
+
+class MacroRunnerThread(QThread):
+    log = Signal(str)
+    sent = Signal(int)
+    completed = Signal(bool, str)
+
+    def __init__(self, name, steps, write, line_ending='\n', variables=None):
+        super().__init__()
+        self.name = name
+        self.steps = steps
+        self.write = write
+        self.line_ending = line_ending
+        self.variables = dict(variables or {})
+        self.lines = queue.Queue()
+        self._is_running = True
+
+    def feed_line(self, text: str):
+        self.lines.put(text)
+
+    def stop(self):
+        self._is_running = False
+
+    def run(self):
+        try:
+            self.execute(self.steps)
+            if self._is_running:
+                self.completed.emit(True, f"Macro '{self.name}' completed")
+            else:
+                self.completed.emit(False, f"Macro '{self.name}' stopped")
+        except Exception as e:
+            self.completed.emit(False, f"Macro '{self.name}' failed: {str(e)}")
+
+    def substitute(self, text):
+        return MACRO_VAR_RE.sub(lambda m: str(self.variables.get(m.group(1), m.group(0))), text)
+
+    def execute(self, steps):
+        for command, arg, lineno in steps:
+            if not self._is_running:
+                return
+            if command in ('send', 'sendraw', 'sendhex'):
+                text = self.substitute(arg)
+                if command == 'send':
+                    data = (text + self.line_ending).encode('utf-8')
+                elif command == 'sendraw':
+                    data = text.encode('latin-1', errors='replace').decode('unicode_escape').encode('latin-1')
+                else:
+                    data = bytes.fromhex(text.replace(' ', ''))
+                # Responses only count once the command is out, so drop anything older
+                while not self.lines.empty():
+                    self.lines.get_nowait()
+                if not self.write(data):
+                    raise RuntimeError(f"line {lineno}: write failed")
+                self.sent.emit(len(data))
+            elif command == 'wait':
+                pattern, timeout = arg
+                self.wait_for(pattern, timeout, lineno)
+            elif command == 'delay':
+                self.sleep_precise(arg / 1000)
+            elif command == 'set':
+                name, value = arg
+                self.variables[name] = self.substitute(value)
+            elif command == 'log':
+                self.log.emit(self.substitute(arg))
+            elif command == 'loop':
+                count, body = arg
+                for i in range(count):
+                    self.variables['loop'] = i
+                    self.execute(body)
+
+    def wait_for(self, pattern, timeout_ms, lineno):
+        deadline = time.perf_counter() + timeout_ms / 1000
+        while self._is_running:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"line {lineno}: no match for /{pattern.pattern}/ within {timeout_ms} ms")
+            try:
+                line = self.lines.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                continue
+            match = pattern.search(line)
+            if match:
+                self.variables.update({k: v for k, v in match.groupdict().items() if v is not None})
+                return
+
+    def sleep_precise(self, seconds):
+        # Coarse sleeps keep stop() responsive, the final millisecond is spun for accuracy
+        deadline = time.perf_counter() + seconds
+        while self._is_running:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            if remaining > 0.002:
+                time.sleep(min(remaining - 0.001, 0.05))
+
+
+class ElfSymbolIndex:
+    # Most recently used indexes, keyed by ELF digest; loads run on ElfIndexThread, hence the lock
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, addresses, sizes, names):
+        self.addresses = addresses
+        self.sizes = sizes
+        self.names = names
+
+    def __len__(self):
+        return len(self.addresses)
+
+    @classmethod
+    def load(cls, path):
+        hash_sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hash_sha.update(chunk)
+        digest = hash_sha.hexdigest()
+        with cls._cache_lock:
+            if digest in cls._cache:
+                cls._cache.move_to_end(digest)
+                return cls._cache[digest]
+
+        cache_path = os.path.join(CACHE_DIR, f"elf_{digest}.json")
+        index = None
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    cached = json.load(f)
+                index = cls(cached['addresses'], cached['sizes'], cached['names'])
+            except:
+                index = None
+        if index is None:
+            index = cls.parse(path)
+            try:
+                with open(cache_path, 'w') as f:
+                    json.dump({'addresses': index.addresses, 'sizes': index.sizes, 'names': index.names}, f)
+            except OSError:
+                pass
+        with cls._cache_lock:
+            cls._cache[digest] = index
+            while len(cls._cache) > ELF_INDEX_CACHE_ENTRIES:
+                cls._cache.popitem(last=False)
+        return index
+
+    @classmethod
+    def parse(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != b'\x7fELF':
+            raise ValueError(f"{os.path.basename(path)} is not an ELF file")
+
+        is64 = data[4] == 2
+        endian = '<' if data[5] == 1 else '>'
+        if is64:
+            shoff = struct.unpack_from(endian + 'Q', data, 0x28)[0]
+            shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x3A)
+            shdr_fmt, sym_fmt = endian + 'IIQQQQIIQQ', endian + 'IBBHQQ'
+        else:
+            shoff = struct.unpack_from(endian + 'I', data, 0x20)[0]
+            shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x2E)
+            shdr_fmt, sym_fmt = endian + 'IIIIIIIIII', endian + 'IIIBBH'
+
+        # (type, offset, size, link) for every section header
+        sections = []
+        for i in range(shnum):
+            fields = struct.unpack_from(shdr_fmt, data, shoff + i * shentsize)
+            sections.append((fields[1], fields[4], fields[5], fields[6]))
+
+        symtabs = [sec for sec in sections if sec[0] == 2] or [sec for sec in sections if sec[0] == 11]
+        if not symtabs:
+            raise ValueError(f"{os.path.basename(path)} has no symbol table")
+
+        symbols = {}
+        sym_size = struct.calcsize(sym_fmt)
+        for _, offset, size, link in symtabs:
+            str_offset = sections[link][1]
+            table = data[offset:offset + size - size % sym_size]
+            for entry in struct.iter_unpack(sym_fmt, table):
+                if is64:
+                    st_name, st_info, _, _, value, sym_len = entry
+                else:
+                    st_name, value, sym_len, st_info, _, _ = entry
+                if st_info & 0xF != 2 or not value:
+                    continue
+                start = str_offset + st_name
+                name = data[start:data.find(b'\0', start)].decode('utf-8', errors='replace')
+                # Prefer the sized, global entry when several names share an address
+                if value not in symbols or (sym_len and st_info >> 4 == 1):
+                    symbols[value] = (sym_len, name)
+
+        addresses = sorted(symbols)
+        return cls(addresses, [symbols[a][0] for a in addresses], [symbols[a][1] for a in addresses])
+
+    def lookup(self, address):
+        i = bisect.bisect_right(self.addresses, address) - 1
+        if i < 0:
+            return None
+        start = self.addresses[i]
+        if self.sizes[i] and address >= start + self.sizes[i]:
+            return None
+        if not self.sizes[i] and i == len(self.addresses) - 1:
+            return None
+        return self.names[i], address - start
+
+
+class ElfIndexThread(QThread):
+    indexed = Signal(str, object, str)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def run(self):
+        # Hashing and parsing a large ELF takes long enough to freeze the window, so it happens here
+        try:
+            self.indexed.emit(self.path, ElfSymbolIndex.load(self.path), "")
+        except Exception as e:
+            self.indexed.emit(self.path, None, str(e))
+
+
+class PanicDecoder:
+    BACKTRACE_RE = re.compile(rb"Backtrace:\s*((?:0x[0-9a-fA-F]{8}:0x[0-9a-fA-F]{8}\s*)+)")
+    BACKTRACE_PC_RE = re.compile(rb"0x([0-9a-fA-F]{8}):0x")
+    REGISTER_RE = re.compile(rb"\b(PC|MEPC|RA|epc1|epc2|epc3)\s*[:=]\s*0x([0-9a-fA-F]{8})")
+    PANIC_RE = re.compile(rb"Guru Meditation Error|abort\(\) was called|Fatal exception \(\d+\)|Exception \(\d+\):")
+
+    def __init__(self):
+        self.index = None
+        self.elf_path = None
+        self._partial = bytearray()
+
+    def load_elf(self, path):
+        self.use_index(path, ElfSymbolIndex.load(path))
+
+    def use_index(self, path, index):
+        self.index = index
+        self.elf_path = path
+        self._partial.clear()
+
+    def unload(self):
+        self.index = None
+        self.elf_path = None
+        self._partial.clear()
+
+    def feed(self, data: bytes) -> list:
+        """Return (offset after line, text) pairs to insert after each decoded line of data."""
+        if self.index is None:
+            return []
+        results = []
+        start = 0
+        while True:
+            end = data.find(b'\n', start)
+            if end < 0:
+                break
+            line = data[start:end]
+            if self._partial:
+                line = bytes(self._partial) + line
+                self._partial.clear()
+            if b'0x' in line or b'Guru' in line:
+                text = self.decode_line(line)
+                if text:
+                    results.append((end + 1, text))
+            start = end + 1
+        self._partial += data[start:]
+        if len(self._partial) > 4096:
+            del self._partial[:-4096]
+        return results
+
+    def decode_line(self, line: bytes) -> str:
+        match = self.BACKTRACE_RE.search(line)
+        if match:
+            frames = [(None, int(pc, 16)) for pc in self.BACKTRACE_PC_RE.findall(match.group(1))]
+        else:
+            frames = [(name.decode(), int(value, 16)) for name, value in self.REGISTER_RE.findall(line)
+                      if int(value, 16)]
+        if not frames:
+            return "🧩 Panic detected - decoding frames with the loaded ELF\n" if self.PANIC_RE.search(line) else ""
+
+        lines = []
+        for register, address in frames:
+            symbol = self.index.lookup(address)
+            if symbol is None and register:
+                continue
+            label = f"{register}: " if register else ""
+            where = f"{symbol[0]}+0x{symbol[1]:X}" if symbol else "??"
+            lines.append(f"    ↳ {label}0x{address:08X}: {where}\n")
+        return ''.join(lines)
+
 
 class SettingsManager:
     def __init__(self):
@@ -650,6 +3755,13 @@ class SettingsManager:
         with open(self.settings_file, 'w') as f:
             json.dump(self.data, f, indent=4)
 
+    def api_token(self) -> str:
+        # The Control API always requires a token; one is generated the first time it is needed and kept
+        if not self.data.get('api_token'):
+            self.data['api_token'] = secrets.token_hex(16)
+            self.save()
+        return self.data['api_token']
+
     def defaults(self) -> dict:
         return {
             'baudrate': DEFAULT_BAUDRATE,
@@ -672,39 +3784,414 @@ class SettingsManager:
             'auto_scroll_serial': True,
             'timestamp_serial': True,
             'show_hex_serial': False,
+            'serial_elf_path': '',
             'auto_save_backups': True,
-            'compression_level': 9
+            'compression_level': 9,
+            'api_enabled': False,
+            'api_host': '127.0.0.1',
+            'api_port': API_DEFAULT_PORT,
+            'api_token': '',
+            'api_allowed_origin': '',
+            'max_parallel_jobs': 0
         }
 
 
-class HistoryManager:
+class HistoryManager:
+    def __init__(self):
+        self.history_file = HISTORY_FILE
+        self.history = self.load()
+
+    def load(self) -> list:
+        if os.path.exists(self.history_file):
+            try:
+                with open(self.history_file, 'r') as f:
+                    return json.load(f)
+            except:
+                return []
+        return []
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+        with open(self.history_file, 'w') as f:
+            json.dump(self.history, f, indent=4)
+
+    def add_entry(self, entry: dict):
+        self.history.insert(0, entry)
+        # Keep only last 100 entries
+        self.history = self.history[:100]
+        self.save()
+
+    def clear(self):
+        self.history = []
+        self.save()
+
+
+class MacroManager:
+    def __init__(self):
+        self.macros_file = MACROS_FILE
+        self.macros = self.load()
+
+    def load(self) -> dict:
+        if os.path.exists(self.macros_file):
+            try:
+                with open(self.macros_file, 'r') as f:
+                    return json.load(f)
+            except:
+                return {}
+        return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.macros_file), exist_ok=True)
+        with open(self.macros_file, 'w') as f:
+            json.dump(self.macros, f, indent=4)
+
+    def set_macro(self, name, script):
+        self.macros[name] = script
+        self.save()
+
+    def delete_macro(self, name):
+        self.macros.pop(name, None)
+        self.save()
+
+
+def usb_identity_key(port_info):
+    # Only adapters with a serial number identify a board; bare bridge chips share VID/PID across boards
+    if port_info.vid is None or not port_info.serial_number:
+        return None
+    return f"{port_info.vid:04X}:{port_info.pid:04X}:{port_info.serial_number}"
+
+
+class DeviceIdentityStore:
+    def __init__(self):
+        self.devices_file = DEVICES_FILE
+        self.lock = threading.Lock()
+        self.devices = self.load()
+        self.usb_index = {record['usb_key']: mac for mac, record in self.devices.items() if record.get('usb_key')}
+        # Ports that did not answer as an ESP, kept in memory only so a restart always rescans
+        self.failed_probes = {}
+
+    def load(self) -> dict:
+        if os.path.exists(self.devices_file):
+            try:
+                with open(self.devices_file, 'r') as f:
+                    return json.load(f)
+            except:
+                return {}
+        return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.devices_file), exist_ok=True)
+        with open(self.devices_file, 'w') as f:
+            json.dump(self.devices, f, indent=4)
+
+    def get(self, mac):
+        with self.lock:
+            record = self.devices.get(mac)
+            return dict(record) if record else None
+
+    def find(self, usb_key=None, port=None, vid=None, pid=None):
+        with self.lock:
+            mac = self.usb_index.get(usb_key) if usb_key else None
+            if mac in self.devices:
+                return dict(self.devices[mac])
+            # Without a USB serial number the best guess is whatever board was last seen on this port
+            if port and vid is not None:
+                candidates = [record for record in self.devices.values()
+                              if record.get('port') == port and record.get('vid') == vid and record.get('pid') == pid]
+                if candidates:
+                    return dict(max(candidates, key=lambda record: record.get('last_seen', '')))
+        return None
+
+    def update(self, mac, **facts) -> dict:
+        with self.lock:
+            now = datetime.datetime.now().isoformat()
+            record = self.devices.setdefault(mac, {'mac': mac, 'first_seen': now})
+            record.update({key: value for key, value in facts.items() if value is not None})
+            record['last_seen'] = now
+            if record.get('usb_key'):
+                self.usb_index[record['usb_key']] = mac
+            self.save()
+            return dict(record)
+
+    @staticmethod
+    def probe_key(port):
+        return (port.device, port.vid, port.pid, port.serial_number)
+
+    def mark_failed(self, port):
+        with self.lock:
+            self.failed_probes[self.probe_key(port)] = time.monotonic() + NEGATIVE_PROBE_TTL_S
+
+    def recently_failed(self, port) -> bool:
+        with self.lock:
+            expires = self.failed_probes.get(self.probe_key(port))
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self.failed_probes[self.probe_key(port)]
+                return False
+            return True
+
+    def clear_failures(self):
+        with self.lock:
+            self.failed_probes.clear()
+
+    def forget_failures(self, device):
+        # A replugged port may have a different board behind it
+        with self.lock:
+            for key in [key for key in self.failed_probes if key[0] == device]:
+                del self.failed_probes[key]
+
+    def record_flash(self, mac, firmware_md5, baudrate):
+        # mac is what the flash session itself read; a port name alone may have a different board behind it by now
+        if mac is None:
+            return None
+        return self.update(mac, last_firmware_md5=firmware_md5, last_good_baud=baudrate,
+                           last_flashed=datetime.datetime.now().isoformat())
+
+
+class NvsPartitionBuilder:
+    # Builds an ESP-IDF NVS (format v2) partition image in memory with the page layout nvs_partition_gen.py
+    # produces, so per-device data needs neither that tool nor a CSV file per board
+    PAGE_ACTIVE = 0xFFFFFFFE
+    PAGE_FULL = 0xFFFFFFFC
+    PAGE_VERSION = 0xFE
+    ENTRIES_PER_PAGE = 126
+    FIRST_ENTRY_OFFSET = 64
+    MAX_STRING_BYTES = 4000
+    PRIMITIVES = {'u8': (0x01, '<B'), 'i8': (0x11, '<b'), 'u16': (0x02, '<H'), 'i16': (0x12, '<h'),
+                  'u32': (0x04, '<I'), 'i32': (0x14, '<i'), 'u64': (0x08, '<Q'), 'i64': (0x18, '<q')}
+    TYPE_STRING = 0x21
+    TYPE_BLOB_DATA = 0x42
+    TYPE_BLOB_INDEX = 0x48
+
+    def __init__(self, size=NVS_DEFAULT_SIZE):
+        if size % NVS_PAGE_SIZE or size < 3 * NVS_PAGE_SIZE:
+            raise ValueError(f"NVS partition size must be a multiple of 4 KB and at least 12 KB, got {size:#x}")
+        self.size = size
+        self.pages = []
+        self.namespaces = {}
+        self.namespace = None
+        self.entry = 0
+        self.new_page()
+
+    @classmethod
+    def from_csv(cls, text, size=NVS_DEFAULT_SIZE, values=None, base_dir=''):
+        # nvs_partition_gen CSV layout (key,type,encoding,value); with values, {placeholders} in the
+        # value column are filled in first, which is how one template yields a partition per board
+        builder = cls(size)
+        for number, row in enumerate(csv.reader(io.StringIO(text)), 1):
+            if not row or not row[0].strip() or row[0].startswith('#') or (number == 1 and row[0].strip() == 'key'):
+                continue
+            key, kind, encoding, value = [field.strip() for field in (row + ['', '', ''])[:4]]
+            try:
+                if values is not None:
+                    value = value.format_map(values)
+                if kind == 'namespace':
+                    builder.add_namespace(key)
+                elif builder.namespace is None:
+                    raise ValueError("the first entry has to be a namespace")
+                elif kind == 'file':
+                    with open(os.path.join(base_dir, value), 'rb') as f:
+                        data = f.read()
+                    builder.add(key, encoding.lower(), data if encoding.lower() == 'binary' else data.decode())
+                elif kind == 'data':
+                    builder.add(key, encoding.lower(), value)
+                else:
+                    raise ValueError(f"unknown type '{kind}'")
+            except KeyError as e:
+                raise ValueError(f"NVS CSV line {number}: no value for placeholder {e}")
+            except (ValueError, IndexError, OSError, binascii.Error, struct.error) as e:
+                raise ValueError(f"NVS CSV line {number}: {e}")
+        return builder
+
+    def new_page(self):
+        # The last page always stays erased, NVS needs a free page for garbage collection
+        if (len(self.pages) + 2) * NVS_PAGE_SIZE > self.size:
+            raise ValueError(f"the data does not fit in an NVS partition of {self.size:#x} bytes")
+        if self.pages:
+            struct.pack_into('<I', self.pages[-1], 0, self.PAGE_FULL)
+        page = bytearray(b'\xff') * NVS_PAGE_SIZE
+        struct.pack_into('<II', page, 0, self.PAGE_ACTIVE, len(self.pages))
+        page[8] = self.PAGE_VERSION
+        struct.pack_into('<I', page, 28, zlib.crc32(page[4:28], 0xFFFFFFFF))
+        self.pages.append(page)
+        self.entry = 0
+
+    def write(self, data, count):
+        page = self.pages[-1]
+        offset = self.FIRST_ENTRY_OFFSET + self.entry * 32
+        page[offset:offset + len(data)] = data
+        for _ in range(count):
+            # Two state bits per entry, 0b10 marks it written
+            bit = self.entry * 2
+            page[32 + bit // 8] &= ~(1 << (bit % 8)) & 0xFF
+            self.entry += 1
+
+    def header(self, type_code, span, key, namespace=None, chunk=0xFF):
+        if not key or len(key.encode()) > 15:
+            raise ValueError(f"key '{key}' has to be 1 to 15 bytes long")
+        entry = bytearray(b'\xff') * 32
+        entry[0:4] = bytes([self.namespace if namespace is None else namespace, type_code, span, chunk])
+        entry[8:24] = key.encode().ljust(16, b'\x00')
+        return entry
+
+    @staticmethod
+    def seal(entry):
+        struct.pack_into('<I', entry, 4, zlib.crc32(bytes(entry[0:4]) + bytes(entry[8:32]), 0xFFFFFFFF))
+        return entry
+
+    def add_namespace(self, name):
+        if name not in self.namespaces:
+            if len(self.namespaces) >= 254:
+                raise ValueError("too many namespaces")
+            self.namespaces[name] = len(self.namespaces) + 1
+            self.add_primitive(name, 'u8', self.namespaces[name], namespace=0)
+        self.namespace = self.namespaces[name]
+
+    def add(self, key, encoding, value):
+        if encoding in self.PRIMITIVES:
+            number = value if isinstance(value, int) else int(value, 16) if value.lower().startswith('0x') else int(value)
+            self.add_primitive(key, encoding, number)
+        elif encoding == 'string':
+            self.add_string(key, value)
+        elif encoding == 'hex2bin':
+            self.add_blob(key, binascii.a2b_hex(value.strip()))
+        elif encoding == 'base64':
+            self.add_blob(key, binascii.a2b_base64(value))
+        elif encoding == 'binary':
+            self.add_blob(key, value if isinstance(value, bytes) else value.encode())
+        else:
+            raise ValueError(f"unknown encoding '{encoding}'")
+
+    def add_primitive(self, key, encoding, number, namespace=None):
+        if self.entry >= self.ENTRIES_PER_PAGE:
+            self.new_page()
+        type_code, layout = self.PRIMITIVES[encoding]
+        entry = self.header(type_code, 1, key, namespace)
+        try:
+            struct.pack_into(layout, entry, 24, number)
+        except struct.error:
+            raise ValueError(f"{number} does not fit in {encoding}")
+        self.write(self.seal(entry), 1)
+
+    def add_string(self, key, text):
+        data = text.encode() + b'\x00'
+        if len(data) > self.MAX_STRING_BYTES:
+            raise ValueError(f"strings are limited to {self.MAX_STRING_BYTES} bytes")
+        count = (len(data) + 31) // 32
+        # Strings never span pages
+        if self.entry + count + 1 >= self.ENTRIES_PER_PAGE:
+            self.new_page()
+        entry = self.header(self.TYPE_STRING, count + 1, key)
+        struct.pack_into('<H', entry, 24, len(data))
+        struct.pack_into('<I', entry, 28, zlib.crc32(data, 0xFFFFFFFF))
+        self.write(self.seal(entry), 1)
+        self.write(data, count)
+
+    def add_blob(self, key, data):
+        # Blobs are split into per-page chunks and tied together by an index entry
+        if self.entry >= self.ENTRIES_PER_PAGE:
+            self.new_page()
+        chunks = 0
+        offset = 0
+        while True:
+            tailroom = (self.ENTRIES_PER_PAGE - self.entry - 1) * 32
+            chunk = data[offset:offset + tailroom]
+            count = (len(chunk) + 31) // 32
+            entry = self.header(self.TYPE_BLOB_DATA, count + 1, key, chunk=chunks)
+            struct.pack_into('<H', entry, 24, len(chunk))
+            struct.pack_into('<I', entry, 28, zlib.crc32(chunk, 0xFFFFFFFF))
+            self.write(self.seal(entry), 1)
+            self.write(chunk, count)
+            chunks += 1
+            offset += len(chunk)
+            if offset < len(data) or tailroom - len(chunk) < 32:
+                self.new_page()
+            if offset >= len(data):
+                break
+        entry = self.header(self.TYPE_BLOB_INDEX, 1, key)
+        struct.pack_into('<IBB', entry, 24, len(data), chunks, 0)
+        self.write(self.seal(entry), 1)
+
+    def to_bytes(self) -> bytes:
+        return b''.join(self.pages) + b'\xff' * (self.size - len(self.pages) * NVS_PAGE_SIZE)
+
+
+class ProvisioningLedger:
+    # Which per-device data went to which board, keyed by MAC. A board that is flashed again (after a
+    # failed self-test, say) gets its serial and data row back instead of using up a new one
     def __init__(self):
-        self.history_file = HISTORY_FILE
-        self.history = self.load()
+        self.ledger_file = PROVISIONING_FILE
+        self.lock = threading.Lock()
+        self.assignments = self.load()
 
-    def load(self) -> list:
-        if os.path.exists(self.history_file):
+    def load(self) -> dict:
+        if os.path.exists(self.ledger_file):
             try:
-                with open(self.history_file, 'r') as f:
+                with open(self.ledger_file, 'r') as f:
                     return json.load(f)
             except:
-                return []
-        return []
+                return {}
+        return {}
 
     def save(self):
-        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-        with open(self.history_file, 'w') as f:
-            json.dump(self.history, f, indent=4)
+        os.makedirs(os.path.dirname(self.ledger_file), exist_ok=True)
+        with open(self.ledger_file, 'w') as f:
+            json.dump(self.assignments, f, indent=4)
 
-    def add_entry(self, entry: dict):
-        self.history.insert(0, entry)
-        # Keep only last 100 entries
-        self.history = self.history[:100]
-        self.save()
+    @staticmethod
+    def data_rows(data_csv) -> list:
+        with open(data_csv, 'r', newline='') as f:
+            return list(csv.DictReader(f))
+
+    def assign(self, mac, config) -> dict:
+        profile = config['nvs_csv']
+        with self.lock:
+            existing = self.assignments.get(mac)
+            if existing and existing['profile'] == profile:
+                return dict(existing)
+            taken = [assignment for assignment in self.assignments.values() if assignment['profile'] == profile]
+            row_index, row = None, {}
+            if config.get('data_csv'):
+                rows = self.data_rows(config['data_csv'])
+                used = {assignment['row'] for assignment in taken}
+                row_index = next((index for index in range(len(rows)) if index not in used), None)
+                if row_index is None:
+                    raise ValueError(f"All {len(rows)} rows of {os.path.basename(config['data_csv'])} are already assigned")
+                row = rows[row_index]
+            first_seq = int(config.get('first_seq', 1))
+            assignment = {
+                'mac': mac,
+                'profile': profile,
+                'seq': max((assignment['seq'] for assignment in taken), default=first_seq - 1) + 1,
+                'row': row_index,
+                'values': row,
+                'token': secrets.token_hex(16),
+                'assigned': datetime.datetime.now().isoformat(),
+                'flashed': None,
+                'nvs_md5': None,
+            }
+            self.assignments[mac] = assignment
+            self.save()
+            return dict(assignment)
 
-    def clear(self):
-        self.history = []
-        self.save()
+    def mark_flashed(self, mac, nvs_md5):
+        with self.lock:
+            if mac in self.assignments:
+                self.assignments[mac].update(flashed=datetime.datetime.now().isoformat(), nvs_md5=nvs_md5)
+                self.save()
+
+    def count(self, profile) -> int:
+        with self.lock:
+            return sum(1 for assignment in self.assignments.values() if assignment['profile'] == profile)
+
+    @staticmethod
+    def placeholders(assignment) -> dict:
+        # Columns of the data CSV plus a few generated fields, available as {name} in the NVS CSV
+        values = dict(assignment['values'])
+        values.update(mac=assignment['mac'], mac_hex=assignment['mac'].replace(':', '').upper(), seq=assignment['seq'],
+                      token=assignment['token'], date=assignment['assigned'][:10].replace('-', ''))
+        return values
 
 
 class FirmwareInfo:
@@ -789,6 +4276,707 @@ class ProjectManager:
             os.remove(path)
 
 
+class DeviceRegistry(QObject):
+    # One shared view of the serial ports; pages get add/remove deltas instead of re-enumerating on timers
+    port_added = Signal(object)
+    port_removed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ports = {}
+        self._node_names = None
+        self._scan_timer = QTimer(self)
+        self._scan_timer.setSingleShot(True)
+        self._scan_timer.setInterval(DEVICE_SCAN_DEBOUNCE_MS)
+        self._scan_timer.timeout.connect(self.scan_if_changed)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.timeout.connect(self.scan_if_changed)
+        self.watcher = None
+        if os.name == 'posix' and os.path.isdir('/dev'):
+            # inotify (kqueue on macOS) on /dev fires as soon as udev creates or removes a node
+            self.watcher = QFileSystemWatcher(['/dev'], self)
+            self.watcher.directoryChanged.connect(self.schedule_scan)
+        if not (self.watcher and self.watcher.directories()):
+            # Windows is also woken by WM_DEVICECHANGE through MainWindow; the poll only diffs port names
+            self._poll_timer.start(DEVICE_POLL_FALLBACK_MS)
+        self.scan()
+
+    def schedule_scan(self, *_):
+        # Nodes appear in bursts during enumeration, one scan covers the whole burst
+        self._scan_timer.start()
+
+    def node_names(self):
+        if os.name == 'nt':
+            import winreg
+            names = set()
+            try:
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DEVICEMAP\SERIALCOMM") as key:
+                    for index in itertools.count():
+                        names.add(winreg.EnumValue(key, index)[1])
+            except OSError:
+                pass
+            return frozenset(names)
+        try:
+            return frozenset(name for name in os.listdir('/dev') if name.startswith(('tty', 'cu.', 'rfcomm')))
+        except OSError:
+            return None
+
+    def scan_if_changed(self):
+        names = self.node_names()
+        if names is not None and names == self._node_names:
+            return
+        self.scan(names)
+
+    def scan(self, names=None):
+        self._node_names = names if names is not None else self.node_names()
+        current = {info.device: info for info in serial.tools.list_ports.comports()}
+        for device in [device for device in self.ports if device not in current]:
+            del self.ports[device]
+            self.port_removed.emit(device)
+        for device, info in current.items():
+            if device not in self.ports:
+                self.ports[device] = info
+                self.port_added.emit(info)
+
+    def connect_combo(self, combo):
+        for info in self.ports.values():
+            add_port_item(combo, info)
+        self.port_added.connect(lambda info: add_port_item(combo, info))
+        self.port_removed.connect(lambda device: remove_port_item(combo, device))
+
+
+def add_port_item(combo, info):
+    if combo.findData(info.device) < 0:
+        combo.addItem(f"{info.device} - {info.description}", info.device)
+
+
+def remove_port_item(combo, device):
+    index = combo.findData(device)
+    if index >= 0:
+        combo.removeItem(index)
+
+
+class JobScheduler(QObject):
+    # Jobs may be submitted or cancelled from any thread; worker threads are created and joined on the main thread
+    event_published = Signal(object)
+    dispatch_requested = Signal()
+    cancel_requested = Signal(str)
+    scan_requested = Signal()
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+        self.jobs_file = JOBS_FILE
+        self.jobs = {}
+        self.heap = []
+        self.threads = {}
+        self.boards = []
+        self.scanned = None
+        self.detect_thread = None
+        self.listeners = []
+        self.lock = threading.Lock()
+        # Held across snapshot and write, so the file always ends up with the newest snapshot
+        self.save_lock = threading.Lock()
+        self.shutting_down = False
+        self.load()
+        self.ids = itertools.count(max((int(job_id) for job_id in self.jobs), default=0) + 1)
+        self.dispatch_requested.connect(self.dispatch, Qt.ConnectionType.QueuedConnection)
+        self.cancel_requested.connect(self.cancel_job)
+        self.scan_requested.connect(self.scan)
+        if self.heap:
+            self.dispatch_requested.emit()
+
+    def load(self):
+        if not os.path.exists(self.jobs_file):
+            return
+        try:
+            with open(self.jobs_file, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            # Kept aside rather than overwritten by the next save, so the queue can still be recovered by hand
+            print(f"⚠️ Job queue {self.jobs_file} could not be loaded ({e}), starting empty; "
+                  f"the file was moved to {self.jobs_file}.bad", file=sys.stderr)
+            try:
+                os.replace(self.jobs_file, f"{self.jobs_file}.bad")
+            except OSError:
+                pass
+            return
+        for job in saved:
+            if job['status'] == 'running':
+                # Cut short by a crash or shutdown; a half-written flash has to be redone from the start
+                job.update(status='queued', percent=0, message="Re-queued after restart")
+            self.jobs[job['id']] = job
+            if job['status'] == 'queued':
+                heapq.heappush(self.heap, (-job['priority'], int(job['id']), job['id']))
+
+    def save(self):
+        # Called from the API thread and the GUI thread; written to a temp file and swapped in, so a crash
+        # mid-write leaves the previous queue intact
+        with self.save_lock:
+            with self.lock:
+                finished = [job_id for job_id, job in self.jobs.items() if job['status'] in JOB_FINISHED]
+                for job_id in finished[:-JOB_HISTORY_KEEP]:
+                    del self.jobs[job_id]
+                saved = [dict(job) for job in self.jobs.values()]
+            os.makedirs(os.path.dirname(self.jobs_file), exist_ok=True)
+            temp_path = f"{self.jobs_file}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(saved, f, indent=4)
+            os.replace(temp_path, self.jobs_file)
+
+    def publish(self, event: dict):
+        self.event_published.emit(event)
+        for listener in list(self.listeners):
+            listener(event)
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def counts(self) -> dict:
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+    def device_snapshot(self) -> dict:
+        with self.lock:
+            return {'boards': list(self.boards), 'scanned': self.scanned}
+
+    def set_devices(self, boards):
+        with self.lock:
+            self.boards = [{key: value for key, value in board.items() if key != 'record'} for board in boards]
+            self.scanned = datetime.datetime.now().isoformat()
+        self.publish(dict(self.device_snapshot(), event='devices'))
+
+    def scan(self):
+        if self.detect_thread and self.detect_thread.isRunning():
+            return
+        self.detect_thread = DetectBoardsThread(self.owner.device_store)
+        self.detect_thread.finished.connect(self.set_devices)
+        self.detect_thread.start()
+
+    def submit(self, spec: dict, source="API"):
+        # Returns (job, http_status, error)
+        kind = spec.get('kind')
+        port = spec.get('port')
+        after = str(spec['after']) if spec.get('after') else None
+        if kind not in JOB_KINDS:
+            return None, 400, f"kind must be one of: {', '.join(JOB_KINDS)}"
+        if not port:
+            return None, 400, "port is required"
+        images = spec.get('images') or []
+        if kind == 'flash' and images:
+            if not all(isinstance(image, dict) and image.get('address') and image.get('file') for image in images):
+                return None, 400, "images must be a list of {address, file} objects"
+            missing = [image['file'] for image in images if not os.path.exists(image['file'])]
+            if missing:
+                return None, 400, f"Firmware file not found: {missing[0]}"
+        elif kind == 'flash' and not os.path.exists(spec.get('firmware') or ''):
+            return None, 400, f"Firmware file not found: {spec.get('firmware')}"
+        provision = spec.get('provision')
+        if kind == 'flash' and provision:
+            if not isinstance(provision, dict) or not os.path.exists(provision.get('nvs_csv') or ''):
+                return None, 400, f"NVS CSV not found: {provision.get('nvs_csv') if isinstance(provision, dict) else provision}"
+            if provision.get('data_csv') and not os.path.exists(provision['data_csv']):
+                return None, 400, f"Device data CSV not found: {provision['data_csv']}"
+        if kind == 'selftest':
+            try:
+                re.compile(spec.get('pattern') or '')
+                re.compile(spec.get('fail_pattern') or '')
+            except re.error as e:
+                return None, 400, f"Invalid self-test pattern: {e}"
+            if not spec.get('pattern'):
+                return None, 400, "pattern is required for selftest jobs"
+        try:
+            priority = int(spec.get('priority', 0))
+            timeout = float(spec.get('timeout') or SELF_TEST_DEFAULT_TIMEOUT_S)
+        except (TypeError, ValueError):
+            return None, 400, "priority and timeout must be numbers"
+        settings = self.owner.settings.data
+        # Detection and the self-test talk to the ROM loader or the firmware console, not the flasher stub
+        default_baudrate = ESP_ROM_BAUDRATE if kind in ('detect', 'selftest') else settings.get('baudrate', DEFAULT_BAUDRATE)
+        with self.lock:
+            if after and after not in self.jobs:
+                return None, 400, f"Unknown job {after} in 'after'"
+            job_id = str(next(self.ids))
+            job = {
+                'id': job_id,
+                'kind': kind,
+                'port': port,
+                'chip': spec.get('chip') or settings.get('chip_type', 'auto'),
+                'baudrate': int(spec.get('baudrate') or default_baudrate),
+                'priority': priority,
+                'after': after,
+                'source': source,
+                'status': 'queued',
+                'percent': 0,
+                'message': '',
+                'created': datetime.datetime.now().isoformat(),
+            }
+            if kind == 'flash':
+                images = [{'address': str(image['address']), 'file': image['file']} for image in images]
+                # History and the device record name the largest image, which is the application
+                main = max(images, key=lambda image: os.path.getsize(image['file'])) if images else None
+                job.update(firmware=main['file'] if main else spec['firmware'], images=images,
+                           address=main['address'] if main else spec.get('address') or settings.get('flash_address', DEFAULT_FLASH_ADDRESS),
+                           erase=bool(spec.get('erase', settings.get('erase_before_flash', False))),
+                           ota=bool(spec.get('ota', False)),
+                           verify=bool(spec.get('verify', settings.get('verify_after_flash', True))),
+                           provision=provision or None, provisioned=None)
+            elif kind == 'backup':
+                job.update(size=int(spec.get('size') or settings.get('backup_size', 4194304)),
+                           backup_dir=spec.get('backup_dir') or settings.get('backup_dir', BACKUP_DIR), path=None)
+            elif kind == 'selftest':
+                job.update(pattern=spec['pattern'], fail_pattern=spec.get('fail_pattern') or '', timeout=timeout)
+            self.jobs[job_id] = job
+            heapq.heappush(self.heap, (-priority, int(job_id), job_id))
+            snapshot = dict(job)
+        if kind == 'flash' and not job['ota']:
+            CompressedFirmwareCache.prefetch([image['file'] for image in images] or [job['firmware']],
+                                             settings.get('compression_level', 9))
+        self.publish({'event': 'job', 'job': snapshot})
+        self.save()
+        self.dispatch_requested.emit()
+        return snapshot, 201, None
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if not job:
+            return None, 404, "No such job"
+        if job['status'] not in JOB_ACTIVE:
+            return None, 409, f"Job {job_id} already {job['status']}"
+        self.cancel_requested.emit(job_id)
+        return job, 202, None
+
+    def set_priority(self, job_id, priority):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] != 'queued':
+                return None
+            job['priority'] = priority
+            # The old heap entry goes stale and is skipped by dispatch()
+            heapq.heappush(self.heap, (-priority, int(job_id), job_id))
+            snapshot = dict(job)
+        self.publish({'event': 'job', 'job': snapshot})
+        self.save()
+        return snapshot
+
+    def clear_finished(self):
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job['status'] in JOB_FINISHED]:
+                del self.jobs[job_id]
+        self.publish({'event': 'cleared'})
+        self.save()
+
+    def update(self, job_id, **changes):
+        with self.lock:
+            job = self.jobs[job_id]
+            job.update(changes)
+            snapshot = dict(job)
+        self.publish({'event': 'job', 'job': snapshot})
+        self.save()
+        return snapshot
+
+    def dispatch(self):
+        if self.shutting_down:
+            return
+        # A finished thread may still have its finished signal queued; dropping it before that is delivered loses the result
+        self.threads = {job_id: thread for job_id, thread in self.threads.items()
+                        if not thread.isFinished() or self.jobs.get(job_id, {}).get('status') == 'running'}
+        limit = self.owner.settings.data.get('max_parallel_jobs', 0)
+        ready, orphaned, deferred = [], [], []
+        with self.lock:
+            # One job per port at a time; ports are independent, so every free port gets its best queued job.
+            # A cancelled job's worker may still be closing the port, so a live thread keeps its port busy too
+            busy = {job['port'] for job in self.jobs.values() if job['status'] == 'running'}
+            busy.update(thread.port for thread in self.threads.values() if not thread.isFinished())
+            running = len(busy)
+            while self.heap:
+                entry = heapq.heappop(self.heap)
+                job = self.jobs.get(entry[2])
+                if not job or job['status'] != 'queued' or entry[0] != -job['priority']:
+                    continue
+                parent = self.jobs.get(job['after']) if job['after'] else None
+                if job['after'] and (not parent or parent['status'] in ('failed', 'cancelled')):
+                    orphaned.append(job['id'])
+                    continue
+                if (parent and parent['status'] != 'succeeded') or job['port'] in busy or (limit and running >= limit):
+                    deferred.append(entry)
+                    continue
+                busy.add(job['port'])
+                running += 1
+                ready.append(job['id'])
+            for entry in deferred:
+                heapq.heappush(self.heap, entry)
+        for job_id in orphaned:
+            self.update(job_id, status='cancelled', message=f"Skipped because job {self.jobs[job_id]['after']} did not succeed",
+                        finished=datetime.datetime.now().isoformat())
+        for job_id in ready:
+            self.start_job(job_id)
+        if orphaned:
+            self.dispatch()
+
+    def provision(self, job_id, mac):
+        # Called by the flash worker with the MAC it just read from the board, so the assignment always belongs
+        # to the board being flashed; the image only ever exists in memory (or a private temp file for esptool)
+        job = self.get(job_id)
+        config = job['provision']
+        assignment = self.owner.provisioning_ledger.assign(mac, config)
+        with open(config['nvs_csv'], 'r') as f:
+            text = f.read()
+        image = NvsPartitionBuilder.from_csv(text, int(str(config.get('size', NVS_DEFAULT_SIZE)), 0),
+                                             ProvisioningLedger.placeholders(assignment),
+                                             os.path.dirname(config['nvs_csv'])).to_bytes()
+        self.update(job_id, provisioned={
+            'mac': mac, 'seq': assignment['seq'], 'row': assignment['row'], 'nvs_md5': hashlib.md5(image).hexdigest()
+        })
+        return int(str(config.get('address', NVS_DEFAULT_ADDRESS)), 0), image
+
+    def start_job(self, job_id):
+        job = self.get(job_id)
+        changes = {}
+        if job['kind'] == 'flash':
+            provision = (lambda mac: self.provision(job_id, mac)) if job.get('provision') else None
+            thread = FlashThread(job['chip'], job['port'], job['baudrate'], job['firmware'], job['address'],
+                                 job['erase'], job['ota'], job['verify'],
+                                 [(image['address'], image['file']) for image in job.get('images') or []],
+                                 self.owner.settings.data.get('compression_level', 9), provision)
+            changes['provisioned'] = None
+            if os.path.exists(job['firmware']):
+                changes['firmware_md5'] = FirmwareInfo(job['firmware']).md5
+        elif job['kind'] == 'backup':
+            os.makedirs(job['backup_dir'], exist_ok=True)
+            thread = BackupThread(job['chip'], job['port'], job['baudrate'], job['size'], job['backup_dir'])
+        elif job['kind'] == 'erase':
+            thread = EraseThread(job['chip'], job['port'], job['baudrate'])
+        elif job['kind'] == 'detect':
+            thread = ChipCheckThread(job['chip'], job['port'])
+        else:
+            thread = SelfTestThread(job['port'], job['baudrate'], job['pattern'], job['fail_pattern'], job['timeout'])
+        thread.progress.connect(lambda percent, message: self.on_progress(job_id, percent, message))
+        if job['kind'] == 'flash':
+            thread.speed.connect(lambda speed: self.on_speed(job_id, speed))
+        thread.finished.connect(lambda success, message, *rest: self.on_finished(job_id, success, message, *rest))
+        # The worker classes shadow QThread.finished with their result signal; the port is only free once run() has
+        # returned, which is the original QThread::finished()
+        QObject.connect(thread, SIGNAL('finished()'), lambda: self.on_thread_exited(job_id))
+        self.threads[job_id] = thread
+        self.update(job_id, status='running', started=datetime.datetime.now().isoformat(), **changes)
+        thread.start()
+
+    def on_progress(self, job_id, percent, message):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] != 'running':
+                return
+            job['percent'] = max(job['percent'], percent)
+            job['message'] = message
+            event = {'event': 'progress', 'job_id': job_id, 'port': job['port'], 'percent': job['percent'],
+                     'message': message, 'speed': job.get('speed')}
+        self.publish(event)
+
+    def on_speed(self, job_id, speed):
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id]['speed'] = speed
+
+    def on_finished(self, job_id, success, message, path=None):
+        job = self.get(job_id)
+        if self.shutting_down or not job or job['status'] != 'running':
+            return
+        if success and job['kind'] == 'flash':
+            self.owner.history_manager.add_entry({
+                'timestamp': datetime.datetime.now().isoformat(),
+                'port': job['port'],
+                'chip': job['chip'],
+                'firmware': job['firmware'],
+                'address': job['address'],
+                'status': 'success'
+            })
+            self.owner.device_store.record_flash(self.threads[job_id].mac, job.get('firmware_md5'), job['baudrate'])
+            if job.get('provisioned'):
+                self.owner.provisioning_ledger.mark_flashed(job['provisioned']['mac'], job['provisioned']['nvs_md5'])
+        changes = {'path': path} if job['kind'] == 'backup' else {}
+        if success and job['kind'] == 'detect':
+            facts = self.threads[job_id].facts
+            changes.update(detected_chip=facts.get('chip'), mac=facts.get('mac'))
+            if facts.get('mac'):
+                self.owner.device_store.update(facts['mac'], port=job['port'], chip=facts.get('chip'))
+        self.update(job_id, status='succeeded' if success else 'failed', message=message,
+                    percent=100 if success else job['percent'], finished=datetime.datetime.now().isoformat(), **changes)
+        self.dispatch()
+
+    def on_thread_exited(self, job_id):
+        thread = self.threads.get(job_id)
+        if thread:
+            # finished() is emitted just before the thread is marked finished; this returns straight away
+            thread.wait()
+        self.dispatch()
+
+    def cancel_job(self, job_id):
+        job = self.get(job_id)
+        if not job or job['status'] not in JOB_ACTIVE:
+            return
+        thread = self.threads.get(job_id)
+        if thread and not thread.isFinished():
+            # The next job on this port is dispatched from on_thread_exited, once the worker has let go of it
+            thread.stop()
+            self.update(job_id, status='cancelled', message="Cancelled", finished=datetime.datetime.now().isoformat())
+            return
+        self.update(job_id, status='cancelled', message="Cancelled", finished=datetime.datetime.now().isoformat())
+        self.dispatch()
+
+    def shutdown(self):
+        # Running jobs stay 'running' on disk and are queued again on the next start
+        self.shutting_down = True
+        for thread in self.threads.values():
+            if thread.isRunning():
+                thread.stop()
+        for thread in self.threads.values():
+            thread.wait(5000)
+        if self.detect_thread and self.detect_thread.isRunning():
+            self.detect_thread.stop()
+            self.detect_thread.wait(1000)
+        self.save()
+
+
+class ProductionLine(QObject):
+    # Every matching board plugged in while the line runs gets its own chain of scheduler jobs:
+    # detect -> erase (optional) -> flash all images with verify -> serial self-test (optional)
+    station_changed = Signal(object)
+    stats_changed = Signal(object)
+
+    def __init__(self, scheduler, registry, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.registry = registry
+        self.template = None
+        self.template_name = None
+        self.active = False
+        self.stations = {}
+        self.job_stations = {}
+        # MAC of the last unit that passed on each port, so a board that comes back after its final reset is not redone
+        self.passed_macs = {}
+        self.units = itertools.count(1)
+        self.passed = 0
+        self.failed = 0
+        self.pass_times = deque()
+        self.cycle_times = deque(maxlen=100)
+        self.started = None
+        self.stopped = None
+        registry.port_added.connect(self.on_port_added)
+        registry.port_removed.connect(self.on_port_removed)
+        scheduler.event_published.connect(self.on_job_event)
+
+    @staticmethod
+    def load_template(name) -> dict:
+        template_path = os.path.join(TEMPLATES_DIR, f"{name}.json")
+        if not name or not os.path.exists(template_path):
+            raise ValueError(f"Template not found: {name}")
+        with open(template_path, 'r') as f:
+            template = json.load(f)
+        images = template_images(template)
+        if not images:
+            raise ValueError(f"Template '{name}' has no firmware")
+        missing = [path for _, path in images if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"Firmware file not found: {missing[0]}")
+        provisioning = template.get('provisioning')
+        if provisioning:
+            for key in ('nvs_csv', 'data_csv'):
+                if provisioning.get(key):
+                    # Relative paths are relative to the templates folder
+                    provisioning[key] = os.path.join(TEMPLATES_DIR, provisioning[key])
+                    if not os.path.exists(provisioning[key]):
+                        raise ValueError(f"Provisioning file not found: {provisioning[key]}")
+            if not provisioning.get('nvs_csv'):
+                raise ValueError(f"Template '{name}' has provisioning without an nvs_csv")
+        self_test = template.get('self_test') or {}
+        try:
+            re.compile(self_test.get('pattern', ''))
+            re.compile(self_test.get('fail_pattern', ''))
+            re.compile(template.get('port_match', ''))
+        except re.error as e:
+            raise ValueError(f"Invalid pattern in template '{name}': {e}")
+        return template
+
+    def pipeline(self) -> list:
+        template = self.template
+        chip = template.get('chip', 'auto')
+        baudrate = template.get('baudrate')
+        steps = [{'kind': 'detect', 'chip': chip}]
+        if template.get('erase'):
+            steps.append({'kind': 'erase', 'chip': chip, 'baudrate': baudrate})
+        steps.append({'kind': 'flash', 'chip': chip, 'baudrate': baudrate, 'erase': False,
+                      'images': [{'address': address, 'file': path} for address, path in template_images(template)],
+                      'ota': template.get('ota', False), 'verify': template.get('verify', True),
+                      'provision': template.get('provisioning')})
+        self_test = template.get('self_test') or {}
+        if self_test.get('pattern'):
+            steps.append({'kind': 'selftest', 'pattern': self_test['pattern'], 'fail_pattern': self_test.get('fail_pattern', ''),
+                          'timeout': self_test.get('timeout', SELF_TEST_DEFAULT_TIMEOUT_S),
+                          'baudrate': self_test.get('baudrate', ESP_ROM_BAUDRATE)})
+        return steps
+
+    def start(self, name):
+        self.template = self.load_template(name)
+        self.template_name = name
+        self.active = True
+        self.started = time.time()
+        self.stopped = None
+        self.passed = self.failed = 0
+        self.pass_times.clear()
+        self.cycle_times.clear()
+        self.stats_changed.emit(self.stats())
+
+    def stop(self):
+        # Boards already in the pipeline are finished, only new plug-ins are ignored
+        self.active = False
+        self.stopped = time.time()
+        self.stats_changed.emit(self.stats())
+
+    def matches(self, info) -> bool:
+        priority, _ = classify_port(info)
+        if priority is None:
+            return False
+        pattern = self.template.get('port_match')
+        return not pattern or re.search(pattern, f"{info.device} {info.description} {info.hwid}") is not None
+
+    def on_port_added(self, info):
+        station = self.stations.get(info.device)
+        if station and station['status'] == 'running':
+            # Native USB boards re-enumerate when reset, the pipeline simply carries on
+            station['gone'] = None
+            return
+        if station and time.time() - station['ended'] < PRODUCTION_REENUMERATE_MS / 1000:
+            # The same board coming back from the hard reset at the end of its last step
+            return
+        if self.active and self.matches(info):
+            # Lets the OS finish setting up the node (udev rules, permissions) before the first sync
+            QTimer.singleShot(PRODUCTION_SETTLE_MS, lambda: self.start_unit(info.device))
+
+    def on_port_removed(self, device):
+        station = self.stations.get(device)
+        if station and station['status'] == 'running':
+            station['gone'] = time.time()
+            QTimer.singleShot(PRODUCTION_REENUMERATE_MS, lambda: self.check_unplugged(station))
+
+    def check_unplugged(self, station):
+        if station['status'] != 'running' or station['gone'] is None:
+            return
+        self.finish(station, False, f"Unplugged during {station['step'] or 'setup'}")
+        for job_id in station['jobs']:
+            self.scheduler.cancel(job_id)
+
+    def start_unit(self, port):
+        station = self.stations.get(port)
+        if not self.active or port not in self.registry.ports or (station and station['status'] == 'running'):
+            return
+        station = {'unit': next(self.units), 'port': port, 'mac': '', 'jobs': [], 'step': '', 'percent': 0,
+                   'status': 'running', 'message': "Starting...", 'started': time.time(), 'elapsed': 0.0, 'gone': None,
+                   'ended': None}
+        self.stations[port] = station
+        after = None
+        for step in self.pipeline():
+            job, _, error = self.scheduler.submit(dict(step, port=port, after=after), source="Production")
+            if not job:
+                self.finish(station, False, error)
+                for job_id in station['jobs']:
+                    self.scheduler.cancel(job_id)
+                return
+            station['jobs'].append(job['id'])
+            self.job_stations[job['id']] = station
+            after = job['id']
+        self.station_changed.emit(dict(station))
+
+    def on_job_event(self, event):
+        if event['event'] == 'progress':
+            station = self.job_stations.get(event['job_id'])
+            if station:
+                index = station['jobs'].index(event['job_id'])
+                station.update(percent=(index * 100 + event['percent']) // len(station['jobs']), message=event['message'])
+                self.station_changed.emit(dict(station))
+        elif event['event'] == 'job':
+            job = event['job']
+            station = self.job_stations.get(job['id'])
+            if not station:
+                return
+            if job['status'] == 'running':
+                station.update(step=job['kind'], message=job['message'] or f"{job['kind'].capitalize()}...")
+            elif job['status'] in ('failed', 'cancelled'):
+                self.finish(station, False, job['message'])
+                return
+            elif job['status'] == 'succeeded':
+                if job['kind'] == 'detect':
+                    station['mac'] = job.get('mac') or ''
+                    if station['mac'] and self.passed_macs.get(station['port']) == station['mac']:
+                        self.skip(station, f"Already passed on {station['port']}; plug in the next board")
+                        return
+                if job['id'] == station['jobs'][-1]:
+                    self.finish(station, True, job['message'])
+                    return
+            self.station_changed.emit(dict(station))
+
+    def skip(self, station, message):
+        # Not a unit at all, so it counts towards neither passed nor failed
+        station.update(status='skipped', message=message, ended=time.time(), elapsed=time.time() - station['started'])
+        for job_id in station['jobs']:
+            self.job_stations.pop(job_id, None)
+            self.scheduler.cancel(job_id)
+        self.station_changed.emit(dict(station))
+        self.stats_changed.emit(self.stats())
+
+    def finish(self, station, passed, message):
+        now = time.time()
+        station.update(status='passed' if passed else 'failed', message=message, elapsed=now - station['started'],
+                       percent=100 if passed else station['percent'], ended=now)
+        for job_id in station['jobs']:
+            self.job_stations.pop(job_id, None)
+        if passed:
+            if station['mac']:
+                self.passed_macs[station['port']] = station['mac']
+            self.passed += 1
+            self.pass_times.append(now)
+            self.cycle_times.append(station['elapsed'])
+        else:
+            self.failed += 1
+        self.station_changed.emit(dict(station))
+        self.stats_changed.emit(self.stats())
+
+    def clear_finished(self):
+        # Also lets a board that already passed be run through the line again
+        self.stations = {port: station for port, station in self.stations.items() if station['status'] == 'running'}
+        self.passed_macs.clear()
+
+    def stats(self) -> dict:
+        now = time.time()
+        while self.pass_times and now - self.pass_times[0] > PRODUCTION_UPH_WINDOW_S:
+            self.pass_times.popleft()
+        elapsed = (self.stopped or now) - self.started if self.started else 0.0
+        # Units passed in the last hour; before the line has run that long the rate is extrapolated,
+        # with at least a minute as the base so the first board does not read as hundreds per hour
+        window = min(max(elapsed, 60.0), PRODUCTION_UPH_WINDOW_S)
+        total = self.passed + self.failed
+        return {
+            'active': self.active,
+            'template': self.template_name,
+            'passed': self.passed,
+            'failed': self.failed,
+            'running': sum(1 for station in self.stations.values() if station['status'] == 'running'),
+            'yield': self.passed / total * 100 if total else None,
+            'units_per_hour': len(self.pass_times) * 3600 / window if self.started else 0.0,
+            'avg_cycle_s': sum(self.cycle_times) / len(self.cycle_times) if self.cycle_times else None,
+            'elapsed_s': elapsed,
+        }
+
+
 class BatchFlashDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -847,11 +5035,13 @@ class BatchFlashDialog(QDialog):
         if file_path:
             self.firmware_path = file_path
             self.fw_edit.setText(file_path)
+            CompressedFirmwareCache.prefetch([file_path], self.parent.settings.data.get('compression_level', 9))
     
     def refresh_devices(self):
         self.device_list.clear()
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
+        registry = self.parent.device_registry
+        registry.scan()
+        for port in registry.ports.values():
             item = QListWidgetItem(f"{port.device} - {port.description}")
             item.setData(Qt.ItemDataRole.UserRole, port.device)
             self.device_list.addItem(item)
@@ -876,24 +5066,15 @@ class BatchFlashDialog(QDialog):
             self.flash_devices(devices)
     
     def flash_devices(self, devices):
-        self.progress.setVisible(True)
-        self.progress.setMaximum(len(devices))
-        self.flash_btn.setEnabled(False)
-        
-        for idx, device in enumerate(devices):
-            self.progress.setValue(idx)
-            self.progress.setFormat(f"Flashing {device}... ({idx + 1}/{len(devices)})")
-            
-            chip = self.parent.settings.data.get('chip_type', 'auto')
-            baudrate = self.parent.settings.data.get('baudrate', DEFAULT_BAUDRATE)
-            address = self.parent.settings.data.get('flash_address', DEFAULT_FLASH_ADDRESS)
-            
-            QMessageBox.information(self, "Flash Complete", 
-                                  f"Would flash {device} with {self.firmware_path}\n(Threading implementation needed for production)")
-        
-        self.progress.setValue(len(devices))
-        self.flash_btn.setEnabled(True)
-        QMessageBox.information(self, "Batch Flash Complete", f"Successfully flashed {len(devices)} device(s)!")
+        # Every port gets its own job, so the scheduler flashes them all side by side
+        for device in devices:
+            job, _, error = self.parent.job_scheduler.submit({'kind': 'flash', 'port': device, 'firmware': self.firmware_path},
+                                                             source="Batch")
+            if not job:
+                QMessageBox.critical(self, "Batch Flash", error)
+                return
+        self.parent.statusBar().showMessage(f"📋 Queued {len(devices)} flash job(s)", 5000)
+        self.parent.switch_page(4)
         self.accept()
 
 
@@ -987,6 +5168,22 @@ class FirmwareCompareDialog(QDialog):
         self.results.setHtml(result)
 
 
+def device_record_tooltip(record, cached=False) -> str:
+    flags = lambda value: "Enabled" if value else "Disabled" if value is not None else "Unknown"
+    lines = [
+        f"{record.get('chip_description', record.get('chip', 'Unknown'))}",
+        f"MAC: {record['mac']}",
+        f"Crystal: {record['crystal_mhz']} MHz" if record.get('crystal_mhz') else "Crystal: Unknown",
+        f"Features: {record.get('features', 'Unknown')}",
+        f"Secure Boot: {flags(record.get('secure_boot'))} | Flash Encryption: {flags(record.get('flash_encryption'))}",
+        f"Last firmware MD5: {record.get('last_firmware_md5', 'Never flashed here')}",
+        f"Last good baud: {record.get('last_good_baud', 'Unknown')}",
+    ]
+    if cached:
+        lines.append("Identity confirmed by MAC, details from the device cache")
+    return "\n".join(lines)
+
+
 class DashboardPage(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1016,9 +5213,14 @@ class DashboardPage(QWidget):
         header.addStretch()
         
         self.refresh_btn = QPushButton("🔄 Refresh")
-        self.refresh_btn.clicked.connect(self.refresh_boards)
+        self.refresh_btn.clicked.connect(lambda: self.refresh_boards())
         self.refresh_btn.setCursor(Qt.CursorShape.PointingHandCursor)
         header.addWidget(self.refresh_btn)
+        self.rescan_btn = QPushButton("🔁 Rescan All")
+        self.rescan_btn.setToolTip("Also probe ports that recently failed detection")
+        self.rescan_btn.clicked.connect(lambda: self.refresh_boards(rescan=True))
+        self.rescan_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        header.addWidget(self.rescan_btn)
         
         layout.addLayout(header)
         
@@ -1114,21 +5316,26 @@ class DashboardPage(QWidget):
         if value_label:
             value_label.setText(str(value))
 
-    def refresh_boards(self):
+    def refresh_boards(self, rescan=False):
         # Stop previous detection if running
         if self.detect_thread and self.detect_thread.isRunning():
             self.detect_thread.stop()
             self.detect_thread.wait(500)
         
         self.refresh_btn.setEnabled(False)
+        self.rescan_btn.setEnabled(False)
         self.refresh_btn.setText("🔍 Detecting...")
         self.parent.statusBar().showMessage("Detecting boards...")
-        self.detect_thread = DetectBoardsThread()
+        # Re-plugged ports are forgotten by the registry; everything else that failed recently is only probed on a rescan
+        if rescan:
+            self.parent.device_store.clear_failures()
+        self.detect_thread = DetectBoardsThread(self.parent.device_store)
         self.detect_thread.finished.connect(self.on_detection_finished)
         self.detect_thread.progress.connect(lambda msg: self.parent.statusBar().showMessage(msg))
         self.detect_thread.start()
 
     def on_detection_finished(self, boards):
+        self.parent.job_scheduler.set_devices(boards)
         self.table.setRowCount(len(boards))
         esp_count = 0
         
@@ -1144,6 +5351,9 @@ class DashboardPage(QWidget):
             elif status == 'timeout':
                 status_item.setText("⏱️")
                 status_item.setForeground(QColor(255, 193, 7))
+            elif status == 'skipped':
+                status_item.setText("⏭️")
+                status_item.setForeground(QColor(158, 158, 158))
             else:
                 status_item.setText("❌")
                 status_item.setForeground(QColor(158, 158, 158))
@@ -1154,15 +5364,24 @@ class DashboardPage(QWidget):
             self.table.setItem(row, 3, QTableWidgetItem(chip))
             self.table.setItem(row, 4, QTableWidgetItem(board.get('mac', '')))
             self.table.setItem(row, 5, QTableWidgetItem(board.get('flash_size', '')))
-            
+
+            record = board.get('record')
+            if record:
+                tooltip = device_record_tooltip(record, board.get('cached', False))
+                for column in range(6):
+                    self.table.item(row, column).setToolTip(tooltip)
+                        
         self.refresh_btn.setEnabled(True)
+        self.rescan_btn.setEnabled(True)
         self.refresh_btn.setText("🔄 Refresh")
         
         self.update_stat_card(self.total_devices_card, len(boards))
         self.update_stat_card(self.esp_devices_card, esp_count)
         
         if esp_count > 0:
-            self.parent.statusBar().showMessage(f"✅ {esp_count} ESP device(s) detected, {len(boards)} total port(s)", 5000)
+            cached = sum(1 for board in boards if board.get('cached'))
+            cached_note = f", {cached} confirmed from cache" if cached else ""
+            self.parent.statusBar().showMessage(f"✅ {esp_count} ESP device(s) detected, {len(boards)} total port(s){cached_note}", 5000)
         else:
             self.parent.statusBar().showMessage(f"ℹ️ No ESP devices found, {len(boards)} port(s) scanned", 5000)
 
@@ -1226,27 +5445,25 @@ class DashboardPage(QWidget):
                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         
         if reply == QMessageBox.StandardButton.Yes:
-            QMessageBox.information(self, "Backup", f"Would backup {len(esp_devices)} device(s)\n(Implementation needed)")
+            for port, _ in esp_devices:
+                self.parent.job_scheduler.submit({'kind': 'backup', 'port': port}, source="Dashboard")
+            self.parent.statusBar().showMessage(f"📋 Queued {len(esp_devices)} backup job(s)", 5000)
+            self.parent.switch_page(4)
 
 class FlashPage(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.current_firmware = None
-        self.flash_thread = None
+        self.current_md5 = None
+        self.backup_job_id = None
+        self.flash_job_id = None
         self.init_ui()
+        self.parent.job_scheduler.event_published.connect(self.on_job_event)
     
     def cleanup(self):
-        try:
-            if hasattr(self, 'port_timer'):
-                self.port_timer.stop()
-            if self.flash_thread and self.flash_thread.isRunning():
-                print("Stopping flash_thread...")
-                self.flash_thread.stop()
-                self.flash_thread.wait(1000)
-                print("flash_thread stopped")
-        except Exception as e:
-            print(f"Error stopping flash_thread: {e}")
+        # Flash and backup jobs belong to the scheduler, which stops them on shutdown
+        pass
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -1340,7 +5557,7 @@ class FlashPage(QWidget):
         options_layout.addWidget(QLabel("Port:"), 0, 2)
         self.port_combo = QComboBox()
         self.port_combo.setMinimumWidth(200)
-        self.refresh_ports()
+        self.parent.device_registry.connect_combo(self.port_combo)
         options_layout.addWidget(self.port_combo, 0, 3)
         
         options_layout.addWidget(QLabel("Baudrate:"), 1, 0)
@@ -1487,10 +5704,6 @@ class FlashPage(QWidget):
         tabs.addTab(ota_tab, "OTA Update")
         
         layout.addWidget(tabs)
-        
-        self.port_timer = QTimer()
-        self.port_timer.timeout.connect(self.refresh_ports)
-        self.port_timer.start(3000)
 
     def select_firmware(self, event):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select firmware", "", "Binary files (*.bin);;All files (*.*)")
@@ -1509,12 +5722,14 @@ class FlashPage(QWidget):
         self.firmware_info.setStyleSheet("color: #00B0FF; font-weight: bold; font-size: 11pt;")
         self.firmware_info.setToolTip(path)
         
+        self.current_md5 = fw_info.md5
         self.hash_label.setText(f"MD5: {fw_info.md5}")
         
         self.log_text.appendPlainText(f"✅ File selected: {fw_info.name}")
         self.log_text.appendPlainText(f"   Path: {path}")
         self.log_text.appendPlainText(f"   Size: {fw_info.size / 1024:.2f} KB")
         self.log_text.appendPlainText(f"   MD5: {fw_info.md5}\n")
+        CompressedFirmwareCache.prefetch([path], self.parent.settings.data.get('compression_level', 9))
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls() and event.mimeData().urls()[0].toString().endswith('.bin'):
@@ -1563,17 +5778,6 @@ class FlashPage(QWidget):
             }
         """)
 
-    def refresh_ports(self):
-        current = self.port_combo.currentText()
-        self.port_combo.clear()
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.port_combo.addItem(f"{port.device} - {port.description}", port.device)
-        if current:
-            index = self.port_combo.findText(current, Qt.MatchFlag.MatchContains)
-            if index >= 0:
-                self.port_combo.setCurrentIndex(index)
-
     def start_flash(self):
         if not self.current_firmware:
             QMessageBox.warning(self, "File missing", "Please select a .bin file first.")
@@ -1591,49 +5795,63 @@ class FlashPage(QWidget):
         verify = self.verify_check.isChecked()
         backup = self.backup_check.isChecked()
 
+        self.backup_job_id = None
         if backup:
             size = self.parent.settings.data.get('backup_size', 4194304)
             reply = QMessageBox.question(self, "Backup",
                                          f"Create backup before flashing ({size/1024/1024:.0f} MB)?",
                                          QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if reply == QMessageBox.StandardButton.Yes:
-                self.backup_thread = BackupThread(chip, port, baudrate, size, self.parent.settings.data['backup_dir'])
-                self.backup_thread.progress.connect(self.update_progress)
-                self.backup_thread.finished.connect(self.on_backup_finished)
-                self.backup_thread.start()
-                self.flash_btn.setEnabled(False)
-                return
+                backup_job, _, _ = self.parent.job_scheduler.submit({
+                    'kind': 'backup', 'port': port, 'chip': chip, 'baudrate': baudrate, 'size': size
+                }, source="Flash page")
+                self.backup_job_id = backup_job['id']
 
         self.do_flash(chip, port, baudrate, address, erase, ota, verify)
 
     def on_backup_finished(self, success, message, backup_path):
         if success:
             self.parent.statusBar().showMessage(f"✅ Backup successful: {os.path.basename(backup_path)}", 5000)
-            chip = self.chip_combo.currentText()
-            port = self.port_combo.currentData()
-            baudrate = int(self.baudrate_combo.currentText())
-            address = self.address_edit.text().strip()
-            erase = self.erase_check.isChecked()
-            ota = self.ota_check.isChecked()
-            verify = self.verify_check.isChecked()
-            self.do_flash(chip, port, baudrate, address, erase, ota, verify)
         else:
+            # The queued flash job depends on this backup and is skipped by the scheduler
             QMessageBox.critical(self, "Backup error", message)
-            self.flash_btn.setEnabled(True)
 
-    def do_flash(self, chip, port, baudrate, address, erase, ota, verify):
+    def do_flash(self, chip, port, baudrate, address, erase, ota, verify, images=None):
         self.flash_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.log_text.clear()
         self.log_text.appendPlainText(f"⚡ Starting flash on {port}...")
         self.log_text.appendPlainText(f"📌 Chip: {chip}")
-        
-        self.flash_thread = FlashThread(chip, port, baudrate, self.current_firmware, address, erase, ota, verify)
-        self.flash_thread.progress.connect(self.update_progress)
-        self.flash_thread.finished.connect(self.on_flash_finished)
-        self.flash_thread.speed.connect(self.update_speed)
-        self.flash_thread.start()
+        for image_address, path in images or []:
+            self.log_text.appendPlainText(f"📦 {image_address}: {os.path.basename(path)}")
+
+        job, _, error = self.parent.job_scheduler.submit({
+            'kind': 'flash', 'port': port, 'chip': chip, 'baudrate': baudrate, 'firmware': self.current_firmware,
+            'images': [{'address': image_address, 'file': path} for image_address, path in images or []],
+            'address': address, 'erase': erase, 'ota': ota, 'verify': verify, 'after': self.backup_job_id
+        }, source="Flash page")
+        if not job:
+            self.on_flash_finished(False, error)
+            return
+        self.flash_job_id = job['id']
+        if any(other['port'] == port and other['status'] == 'running' for other in self.parent.job_scheduler.snapshot()):
+            self.log_text.appendPlainText(f"⏳ Queued as job {job['id']}, waiting for {port} to be free...")
+
+    def on_job_event(self, event):
+        if event['event'] == 'progress' and event['job_id'] in (self.backup_job_id, self.flash_job_id):
+            self.update_progress(event['percent'], event['message'])
+            if event['job_id'] == self.flash_job_id and event.get('speed'):
+                self.update_speed(event['speed'])
+        elif event['event'] == 'job' and event['job']['status'] in JOB_FINISHED:
+            job = event['job']
+            success = job['status'] == 'succeeded'
+            if job['id'] == self.backup_job_id:
+                self.backup_job_id = None
+                self.on_backup_finished(success, job['message'], job.get('path') or '')
+            elif job['id'] == self.flash_job_id:
+                self.flash_job_id = None
+                self.on_flash_finished(success, job['message'])
 
     def update_progress(self, value, message):
         self.progress_bar.setValue(value)
@@ -1653,29 +5871,27 @@ class FlashPage(QWidget):
         if success:
             self.log_text.appendPlainText(f"\n✅ {message}")
             QMessageBox.information(self, "Success", message)
-            
-            entry = {
-                'timestamp': datetime.datetime.now().isoformat(),
-                'port': self.port_combo.currentData(),
-                'chip': self.chip_combo.currentText(),
-                'firmware': self.current_firmware,
-                'address': self.address_edit.text(),
-                'status': 'success'
-            }
-            self.parent.history_manager.add_entry(entry)
+            # History and the device record are written by the job scheduler
             self.parent.dashboard_page.update_stats()
         else:
             self.log_text.appendPlainText(f"\n❌ {message}")
             QMessageBox.critical(self, "Failure", message)
 
     def save_template(self):
-        if not self.current_firmware:
+        images = self.multi_images()
+        if not self.current_firmware and not images:
             QMessageBox.warning(self, "No firmware", "Please select a firmware first.")
             return
         
         name, ok = QInputDialog.getText(self, "Save Template", "Template name:")
         if ok and name:
-            template = {
+            template_path = os.path.join(TEMPLATES_DIR, f"{name}.json")
+            template = {}
+            if os.path.exists(template_path):
+                # Keeps what other pages added, such as the production self-test
+                with open(template_path, 'r') as f:
+                    template = json.load(f)
+            template.update({
                 'name': name,
                 'chip': self.chip_combo.currentText(),
                 'baudrate': self.baudrate_combo.currentText(),
@@ -1685,9 +5901,12 @@ class FlashPage(QWidget):
                 'verify': self.verify_check.isChecked(),
                 'backup': self.backup_check.isChecked(),
                 'firmware': self.current_firmware
-            }
+            })
+            if images:
+                template['images'] = [{'address': address, 'file': path} for address, path in images]
+            else:
+                template.pop('images', None)
             
-            template_path = os.path.join(TEMPLATES_DIR, f"{name}.json")
             with open(template_path, 'w') as f:
                 json.dump(template, f, indent=4)
             
@@ -1714,25 +5933,35 @@ class FlashPage(QWidget):
             self.verify_check.setChecked(template.get('verify', True))
             self.backup_check.setChecked(template.get('backup', True))
             
-            if os.path.exists(template.get('firmware', '')):
+            if os.path.exists(template.get('firmware') or ''):
                 self.set_firmware(template['firmware'])
+            self.multi_table.setRowCount(0)
+            for image in template.get('images') or []:
+                self.add_multi_row(image['address'], image['file'])
             
             QMessageBox.information(self, "Template Loaded", f"Template '{name}' loaded successfully!")
 
     def add_multi_firmware(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select firmware", "", "Binary files (*.bin)")
         if file_path:
-            row = self.multi_table.rowCount()
-            self.multi_table.insertRow(row)
-            
-            address_edit = QLineEdit("0x0")
-            self.multi_table.setCellWidget(row, 0, address_edit)
-            
-            self.multi_table.setItem(row, 1, QTableWidgetItem(file_path))
-            
-            remove_btn = QPushButton("🗑️")
-            remove_btn.clicked.connect(lambda: self.multi_table.removeRow(self.multi_table.currentRow()))
-            self.multi_table.setCellWidget(row, 2, remove_btn)
+            self.add_multi_row("0x0", file_path)
+
+    def add_multi_row(self, address, file_path):
+        row = self.multi_table.rowCount()
+        self.multi_table.insertRow(row)
+        
+        address_edit = QLineEdit(address)
+        self.multi_table.setCellWidget(row, 0, address_edit)
+        
+        self.multi_table.setItem(row, 1, QTableWidgetItem(file_path))
+        
+        remove_btn = QPushButton("🗑️")
+        remove_btn.clicked.connect(lambda: self.multi_table.removeRow(self.multi_table.currentRow()))
+        self.multi_table.setCellWidget(row, 2, remove_btn)
+
+    def multi_images(self) -> list:
+        return [(self.multi_table.cellWidget(row, 0).text().strip(), self.multi_table.item(row, 1).text())
+                for row in range(self.multi_table.rowCount())]
 
     def remove_multi_firmware(self):
         current_row = self.multi_table.currentRow()
@@ -1740,11 +5969,26 @@ class FlashPage(QWidget):
             self.multi_table.removeRow(current_row)
 
     def flash_multi(self):
-        if self.multi_table.rowCount() == 0:
+        images = self.multi_images()
+        if not images:
             QMessageBox.warning(self, "No firmwares", "Please add at least one firmware.")
             return
+        if self.port_combo.count() == 0:
+            QMessageBox.warning(self, "Port missing", "No COM port detected.")
+            return
+        for address, path in images:
+            if not re.fullmatch(r'0x[0-9A-Fa-f]+', address):
+                QMessageBox.warning(self, "Invalid address", f"'{address}' is not a hex address (e.g. 0x10000).")
+                return
+            if not os.path.exists(path):
+                QMessageBox.warning(self, "File missing", f"Firmware file not found:\n{path}")
+                return
         
-        QMessageBox.information(self, "Multi-Flash", "Multi-address flash feature\n(Implementation pending)")
+        # One esptool run writes every image, so the board is only reset once
+        self.backup_job_id = None
+        self.do_flash(self.chip_combo.currentText(), self.port_combo.currentData(), int(self.baudrate_combo.currentText()),
+                      images[0][0], self.erase_check.isChecked(), self.ota_check.isChecked(), self.verify_check.isChecked(),
+                      images)
 
     def select_ota_firmware(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select firmware", "", "Binary files (*.bin)")
@@ -1767,20 +6011,16 @@ class BackupPage(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
-        self.backup_thread = None
+        self.backup_job_id = None
         self.init_ui()
+        self.parent.job_scheduler.event_published.connect(self.on_job_event)
     
     def cleanup(self):
         try:
             if hasattr(self, 'backup_timer'):
                 self.backup_timer.stop()
-            if self.backup_thread and self.backup_thread.isRunning():
-                print("Stopping backup_thread...")
-                self.backup_thread.stop()
-                self.backup_thread.wait(1000)
-                print("backup_thread stopped")
         except Exception as e:
-            print(f"Error stopping backup_thread: {e}")
+            print(f"Error stopping backup_timer: {e}")
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -1800,7 +6040,7 @@ class BackupPage(QWidget):
         form.addRow("Chip:", self.backup_chip_combo)
 
         self.backup_port_combo = QComboBox()
-        self.refresh_backup_ports()
+        self.parent.device_registry.connect_combo(self.backup_port_combo)
         form.addRow("Port:", self.backup_port_combo)
 
         self.backup_baudrate_combo = QComboBox()
@@ -1886,21 +6126,11 @@ class BackupPage(QWidget):
         self.backup_timer.timeout.connect(self.refresh_backups)
         self.backup_timer.start(5000)
 
-    def refresh_backup_ports(self):
-        self.backup_port_combo.clear()
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.backup_port_combo.addItem(f"{port.device} - {port.description}", port.device)
-
     def create_backup(self):
         if self.backup_port_combo.count() == 0:
             QMessageBox.warning(self, "No port", "No COM port detected.")
             return
         
-        if self.backup_thread and self.backup_thread.isRunning():
-            self.backup_thread.stop()
-            self.backup_thread.wait(500)
-        
         chip = self.backup_chip_combo.currentText()
         port = self.backup_port_combo.currentData()
         baudrate = int(self.backup_baudrate_combo.currentText())
@@ -1917,10 +6147,19 @@ class BackupPage(QWidget):
             self.backup_progress.setVisible(True)
             self.backup_progress.setValue(0)
             
-            self.backup_thread = BackupThread(chip, port, baudrate, size_bytes, BACKUP_DIR)
-            self.backup_thread.progress.connect(self.update_backup_progress)
-            self.backup_thread.finished.connect(self.on_backup_complete)
-            self.backup_thread.start()
+            job, _, _ = self.parent.job_scheduler.submit({
+                'kind': 'backup', 'port': port, 'chip': chip, 'baudrate': baudrate, 'size': size_bytes,
+                'backup_dir': BACKUP_DIR
+            }, source="Backup page")
+            self.backup_job_id = job['id']
+
+    def on_job_event(self, event):
+        if event['event'] == 'progress' and event['job_id'] == self.backup_job_id:
+            self.update_backup_progress(event['percent'], event['message'])
+        elif event['event'] == 'job' and event['job']['id'] == self.backup_job_id and event['job']['status'] in JOB_FINISHED:
+            job = event['job']
+            self.backup_job_id = None
+            self.on_backup_complete(job['status'] == 'succeeded', job['message'], job.get('path') or '')
 
     def update_backup_progress(self, value, message):
         self.backup_progress.setValue(value)
@@ -2039,23 +6278,426 @@ class BackupPage(QWidget):
                 QMessageBox.critical(self, "Error", f"Failed to delete backup:\n{str(e)}")
 
 
+_HEX_ASCII_TABLE = bytes(b if 32 <= b < 127 else 0x2E for b in range(256))
+
+
+def format_hex_row(offset: int, chunk: bytes) -> str:
+    half = HEX_DUMP_ROW_BYTES // 2
+    hex_part = f"{chunk[:half].hex(' ')}  {chunk[half:].hex(' ')}".upper()
+    return f"{offset:08X}  {hex_part:<{HEX_DUMP_ROW_BYTES * 3}} |{chunk.translate(_HEX_ASCII_TABLE).decode('ascii')}|"
+
+
+class HexDumpModel(QAbstractListModel):
+    def __init__(self, buffer: SerialSessionBuffer, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self._rows = 0
+        self._base_offset = buffer.base_offset
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._rows
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        offset = self.buffer.base_offset + index.row() * HEX_DUMP_ROW_BYTES
+        return format_hex_row(offset, self.buffer.read(offset, HEX_DUMP_ROW_BYTES))
+
+    def refresh(self):
+        rows = -(-len(self.buffer) // HEX_DUMP_ROW_BYTES)
+        if self.buffer.base_offset != self._base_offset or rows < self._rows:
+            self.beginResetModel()
+            self._rows = rows
+            self._base_offset = self.buffer.base_offset
+            self.endResetModel()
+            return
+        if self._rows:
+            last = self.index(self._rows - 1)
+            self.dataChanged.emit(last, last)
+        if rows > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, rows - 1)
+            self._rows = rows
+            self.endInsertRows()
+
+
+class FrameTableModel(QAbstractTableModel):
+    HEADERS = ["Time", "Decoder", "Length", "CRC", "Payload (HEX)", "ASCII"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = deque()
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        timestamp_ns, decoder, payload, crc_ok = self.records[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                stamp = datetime.datetime.fromtimestamp((timestamp_ns + self.wall_offset_ns) / 1e9)
+                return stamp.strftime("%H:%M:%S.%f")[:-3]
+            if column == 1:
+                return decoder
+            if column == 2:
+                return len(payload)
+            if column == 3:
+                return "-" if crc_ok is None else ("✅" if crc_ok else "❌")
+            if column == 4:
+                return payload[:64].hex(' ').upper() + (" …" if len(payload) > 64 else "")
+            return payload[:64].translate(_HEX_ASCII_TABLE).decode('ascii')
+        if role == Qt.ItemDataRole.ForegroundRole and crc_ok is False:
+            return QColor(244, 67, 54)
+        return None
+
+    def add_records(self, records):
+        overflow = len(self.records) + len(records) - FRAME_TABLE_MAX_ROWS
+        if overflow > 0:
+            overflow = min(overflow, len(self.records))
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.records.popleft()
+            self.endRemoveRows()
+        records = records[-FRAME_TABLE_MAX_ROWS:]
+        start = len(self.records)
+        self.beginInsertRows(QModelIndex(), start, start + len(records) - 1)
+        self.records.extend(records)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.records.clear()
+        self.endResetModel()
+
+
+class SampleRingBuffer:
+    def __init__(self, capacity=PLOT_BUFFER_SAMPLES):
+        self.capacity = capacity
+        if NUMPY_AVAILABLE:
+            self.times = np.zeros(capacity)
+            self.values = np.zeros(capacity)
+        else:
+            self.times = array('d', bytes(8 * capacity))
+            self.values = array('d', bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def extend(self, times, values):
+        count = len(times)
+        if count >= self.capacity:
+            times, values, count = times[-self.capacity:], values[-self.capacity:], self.capacity
+        if not NUMPY_AVAILABLE:
+            times, values = array('d', times), array('d', values)
+        end = self.head + count
+        if end <= self.capacity:
+            self.times[self.head:end] = times
+            self.values[self.head:end] = values
+        else:
+            split = self.capacity - self.head
+            self.times[self.head:] = times[:split]
+            self.values[self.head:] = values[:split]
+            self.times[:end - self.capacity] = times[split:]
+            self.values[:end - self.capacity] = values[split:]
+        self.head = end % self.capacity
+        self.count = min(self.count + count, self.capacity)
+
+    def last_time(self):
+        return self.times[self.head - 1] if self.count else None
+
+    def window(self, start_time):
+        if self.count < self.capacity:
+            times, values = self.times[:self.count], self.values[:self.count]
+        elif NUMPY_AVAILABLE:
+            times = np.concatenate((self.times[self.head:], self.times[:self.head]))
+            values = np.concatenate((self.values[self.head:], self.values[:self.head]))
+        else:
+            times = self.times[self.head:] + self.times[:self.head]
+            values = self.values[self.head:] + self.values[:self.head]
+        if NUMPY_AVAILABLE:
+            first = int(np.searchsorted(times, start_time))
+        else:
+            first = bisect.bisect_left(times, start_time)
+        return times[first:], values[first:]
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+def minmax_decimate(times, values, max_points):
+    count = len(values)
+    if count <= max_points:
+        return times, values
+    size = -(-count // max(1, max_points // 2))
+    if NUMPY_AVAILABLE:
+        usable = count - count % size
+        blocks = values[:usable].reshape(-1, size)
+        rows = np.arange(len(blocks))
+        lo, hi = blocks.argmin(axis=1), blocks.argmax(axis=1)
+        first, second = np.minimum(lo, hi), np.maximum(lo, hi)
+        picks = np.column_stack((rows * size + first, rows * size + second)).ravel()
+        picks = np.concatenate((picks, np.arange(usable, count)))
+        return times[picks], values[picks]
+    out_times = array('d')
+    out_values = array('d')
+    for start in range(0, count, size):
+        block = values[start:start + size]
+        lo, hi = block.index(min(block)), block.index(max(block))
+        for index in ((lo, hi) if lo <= hi else (hi, lo)):
+            out_times.append(times[start + index])
+            out_values.append(block[index])
+    return out_times, out_values
+
+
+class TelemetryPlotter(QWidget):
+    extractor_changed = Signal(object)
+    SERIES_COLORS = ["#00FFFF", "#FF6EC7", "#4CAF50", "#FFC107", "#2196F3", "#F44336", "#B388FF", "#FF9800"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buffers = {}
+        self.series = {}
+        self.t0_ns = None
+        self._dirty = False
+        self._rate_samples = 0
+        self._rate_started = time.perf_counter()
+        self.sample_rate = 0.0
+        self.render_ms = 0.0
+        self.init_ui()
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self.render_frame)
+        self.set_frame_rate(self.fps_spin.value())
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        title = QLabel("📈 Live Telemetry")
+        title.setStyleSheet("font-size: 14pt; font-weight: bold; color: #00FFFF; margin-bottom: 10px;")
+        layout.addWidget(title)
+
+        options = QHBoxLayout()
+        options.addWidget(QLabel("Format:"))
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["Off"] + SampleExtractor.MODES)
+        options.addWidget(self.format_combo)
+
+        options.addWidget(QLabel("Regex:"))
+        self.pattern_edit = QLineEdit(r"(?P<value>-?\d+(?:\.\d+)?)")
+        self.pattern_edit.setPlaceholderText(r"Named groups become series, e.g. T=(?P<temp>[\d.]+)")
+        options.addWidget(self.pattern_edit, 1)
+
+        apply_btn = QPushButton("✔️ Apply")
+        apply_btn.clicked.connect(self.apply_extractor)
+        options.addWidget(apply_btn)
+        layout.addLayout(options)
+
+        view_options = QHBoxLayout()
+        view_options.addWidget(QLabel("Window (s):"))
+        self.window_spin = QDoubleSpinBox()
+        self.window_spin.setRange(0.1, 3600)
+        self.window_spin.setValue(10)
+        view_options.addWidget(self.window_spin)
+
+        view_options.addWidget(QLabel("Max FPS:"))
+        self.fps_spin = QSpinBox()
+        self.fps_spin.setRange(1, 60)
+        self.fps_spin.setValue(20)
+        self.fps_spin.valueChanged.connect(self.set_frame_rate)
+        view_options.addWidget(self.fps_spin)
+
+        self.pause_check = QCheckBox("⏸️ Pause")
+        view_options.addWidget(self.pause_check)
+
+        clear_btn = QPushButton("🗑️ Clear")
+        clear_btn.clicked.connect(self.clear)
+        view_options.addWidget(clear_btn)
+        view_options.addStretch()
+        layout.addLayout(view_options)
+
+        self.stats_label = QLabel("Plotter off")
+        self.stats_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        layout.addWidget(self.stats_label)
+
+        if not CHARTS_AVAILABLE:
+            missing = QLabel("QtCharts is not available in this PySide6 installation.")
+            missing.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            layout.addWidget(missing, 1)
+            self.format_combo.setEnabled(False)
+            return
+
+        self.chart = QChart()
+        self.chart.setTheme(QChart.ChartTheme.ChartThemeDark)
+        self.chart.setBackgroundBrush(QColor("#151522"))
+        self.chart.legend().setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.axis_x = QValueAxis()
+        self.axis_x.setTitleText("Time (s)")
+        self.axis_y = QValueAxis()
+        self.chart.addAxis(self.axis_x, Qt.AlignmentFlag.AlignBottom)
+        self.chart.addAxis(self.axis_y, Qt.AlignmentFlag.AlignLeft)
+
+        self.chart_view = QChartView(self.chart)
+        self.chart_view.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+        self.chart_view.setMinimumHeight(400)
+        layout.addWidget(self.chart_view, 1)
+
+    def set_frame_rate(self, fps):
+        self.frame_timer.setInterval(int(1000 / fps))
+
+    def apply_extractor(self):
+        mode = self.format_combo.currentText()
+        if mode == "Off":
+            self.frame_timer.stop()
+            self.extractor_changed.emit(None)
+            self.stats_label.setText("Plotter off")
+            return
+        try:
+            extractor = SampleExtractor(mode, self.pattern_edit.text())
+        except re.error as e:
+            QMessageBox.warning(self, "Regex error", f"Invalid pattern: {e}")
+            return
+        self.frame_timer.start()
+        self.extractor_changed.emit(extractor)
+
+    def add_series(self, name):
+        buffer = self.buffers[name] = SampleRingBuffer()
+        if CHARTS_AVAILABLE:
+            series = QLineSeries()
+            series.setName(name)
+            series.setPen(QPen(QColor(self.SERIES_COLORS[len(self.series) % len(self.SERIES_COLORS)]), 1.5))
+            self.chart.addSeries(series)
+            series.attachAxis(self.axis_x)
+            series.attachAxis(self.axis_y)
+            self.series[name] = series
+        return buffer
+
+    def add_samples(self, samples: dict):
+        if self.pause_check.isChecked():
+            return
+        for name, (times, values) in samples.items():
+            if self.t0_ns is None:
+                self.t0_ns = times[0]
+            t0 = self.t0_ns
+            buffer = self.buffers.get(name) or self.add_series(name)
+            buffer.extend([(t - t0) / 1e9 for t in times], values)
+            self._rate_samples += len(values)
+        self._dirty = True
+
+    def render_frame(self):
+        now = time.perf_counter()
+        if now - self._rate_started >= 1.0:
+            self.sample_rate = self._rate_samples / (now - self._rate_started)
+            self._rate_samples = 0
+            self._rate_started = now
+            self.update_stats()
+        if not self._dirty or not CHARTS_AVAILABLE or not self.isVisible():
+            return
+        self._dirty = False
+
+        latest = max((b.last_time() for b in self.buffers.values() if len(b)), default=None)
+        if latest is None:
+            return
+        start = latest - self.window_spin.value()
+        max_points = max(200, self.chart_view.width() * 2)
+        y_min, y_max = float('inf'), float('-inf')
+        for name, buffer in self.buffers.items():
+            times, values = minmax_decimate(*buffer.window(start), max_points)
+            if len(values):
+                y_min = min(y_min, float(min(values)))
+                y_max = max(y_max, float(max(values)))
+            self.series[name].replace([QPointF(t, v) for t, v in zip(times.tolist(), values.tolist())])
+
+        self.axis_x.setRange(max(0.0, start), max(latest, start + 0.001))
+        if y_min <= y_max:
+            margin = (y_max - y_min) * 0.05 or 1.0
+            self.axis_y.setRange(y_min - margin, y_max + margin)
+        self.render_ms = (time.perf_counter() - now) * 1000
+        # Back off when a frame gets expensive so plotting never takes more than a quarter of the GUI thread
+        self.frame_timer.setInterval(max(int(1000 / self.fps_spin.value()), int(self.render_ms * 4)))
+
+    def update_stats(self):
+        total = sum(len(b) for b in self.buffers.values())
+        self.stats_label.setText(
+            f"{len(self.buffers)} series | {self.sample_rate:,.0f} samples/s | "
+            f"{total:,} buffered | render {self.render_ms:.1f} ms")
+
+    def clear(self):
+        for buffer in self.buffers.values():
+            buffer.clear()
+        if CHARTS_AVAILABLE:
+            for series in self.series.values():
+                self.chart.removeSeries(series)
+        self.buffers.clear()
+        self.series.clear()
+        self.t0_ns = None
+        self.update_stats()
+
+
 class SerialPage(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.serial_thread = None
-        self.data_buffer = deque(maxlen=10000)
+        self.session_buffer = SerialSessionBuffer()
+        self.hex_model = HexDumpModel(self.session_buffer, self)
+        self.panic_decoder = PanicDecoder()
+        self.line_timing = LineTimingStats()
+        self._stats_refreshed = 0.0
+        self._stats_pending = False
+        self.multi_thread = None
+        self.macro_manager = MacroManager()
+        self.frame_model = FrameTableModel(self)
+        self.stream_decoder = None
+        self.sample_extractor = None
+        self.macro_runners = {}
+        self._macro_partial = b''
+        self.bridge = None
+        self.tx_jobs = {}
+        self.modem_transfer = None
+        self.elf_threads = set()
+        self.elf_pending = None
         self.init_ui()
     
     def cleanup(self):
         try:
-            if hasattr(self, 'port_timer'):
-                self.port_timer.stop()
             if self.serial_thread and self.serial_thread.isRunning():
                 print("Stopping serial_thread...")
                 self.serial_thread.stop()
                 self.serial_thread.wait(1000)
                 print("serial_thread stopped")
+            for runner in list(self.macro_runners.values()):
+                runner.stop()
+                runner.wait(1000)
+            if self.multi_thread and self.multi_thread.isRunning():
+                print("Stopping multi_thread...")
+                self.multi_thread.stop()
+                self.multi_thread.wait(1000)
+                print("multi_thread stopped")
+            if self.recorder:
+                self.recorder.close()
+            if self.bridge and self.bridge.isRunning():
+                print("Stopping bridge...")
+                self.bridge.stop()
+                self.bridge.wait(1000)
+                print("bridge stopped")
+            for thread in list(self.elf_threads):
+                thread.wait(1000)
         except Exception as e:
             print(f"Error stopping serial_thread: {e}")
 
@@ -2194,6 +6836,86 @@ class SerialPage(QWidget):
         btn_layout.addWidget(refresh_btn)
         
         connection_layout.addLayout(btn_layout)
+
+        self.auto_reconnect_check = QCheckBox("🔁 Auto-reconnect when the board resets or re-enumerates")
+        self.auto_reconnect_check.setChecked(self.parent.settings.data.get('serial_auto_reconnect', True))
+        self.auto_reconnect_check.setToolTip("Waits for the same USB device (VID/PID/serial number) and reopens it, keeping the session")
+        self.auto_reconnect_check.toggled.connect(self.set_auto_reconnect)
+        connection_layout.addWidget(self.auto_reconnect_check)
+
+        replay_group = QGroupBox("⏯️ Session Replay")
+        replay_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        replay_layout = QVBoxLayout(replay_group)
+
+        replay_file_layout = QHBoxLayout()
+        self.replay_edit = QLineEdit()
+        self.replay_edit.setPlaceholderText("Timed capture (.espcap) or raw capture file")
+        replay_file_layout.addWidget(self.replay_edit)
+        replay_browse_btn = QPushButton("Browse")
+        replay_browse_btn.clicked.connect(self.select_replay_file)
+        replay_file_layout.addWidget(replay_browse_btn)
+        replay_layout.addLayout(replay_file_layout)
+
+        replay_options = QHBoxLayout()
+        replay_options.addWidget(QLabel("Speed:"))
+        self.replay_speed_combo = QComboBox()
+        self.replay_speed_combo.addItems(list(REPLAY_SPEEDS))
+        replay_options.addWidget(self.replay_speed_combo)
+
+        self.replay_pty_check = QCheckBox("Virtual serial port (pty)")
+        self.replay_pty_check.setEnabled(hasattr(os, 'openpty'))
+        self.replay_pty_check.setToolTip("Also replay the capture to a pseudo-terminal so host tools can read it")
+        replay_options.addWidget(self.replay_pty_check)
+
+        self.replay_btn = QPushButton("▶️ Replay")
+        self.replay_btn.clicked.connect(self.toggle_replay)
+        replay_options.addWidget(self.replay_btn)
+        replay_options.addStretch()
+        replay_layout.addLayout(replay_options)
+
+        self.replay_status_label = QLabel("Idle")
+        self.replay_status_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        self.replay_status_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        replay_layout.addWidget(self.replay_status_label)
+
+        connection_layout.addWidget(replay_group)
+
+        bridge_group = QGroupBox("🌐 TCP Bridge")
+        bridge_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        bridge_layout = QVBoxLayout(bridge_group)
+
+        bridge_info = QLabel("Shares every open port with other tools over TCP. The first port listens on the base port, the next ones on the following ports.")
+        bridge_info.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        bridge_info.setWordWrap(True)
+        bridge_layout.addWidget(bridge_info)
+
+        bridge_options = QHBoxLayout()
+        bridge_options.addWidget(QLabel("Mode:"))
+        self.bridge_mode_combo = QComboBox()
+        self.bridge_mode_combo.addItems(BRIDGE_MODES)
+        bridge_options.addWidget(self.bridge_mode_combo)
+
+        bridge_options.addWidget(QLabel("Base port:"))
+        self.bridge_port_spin = QSpinBox()
+        self.bridge_port_spin.setRange(1024, 65535)
+        self.bridge_port_spin.setValue(BRIDGE_BASE_PORT)
+        bridge_options.addWidget(self.bridge_port_spin)
+
+        self.bridge_remote_check = QCheckBox("Allow remote clients")
+        bridge_options.addWidget(self.bridge_remote_check)
+
+        self.bridge_btn = QPushButton("▶️ Start Bridge")
+        self.bridge_btn.clicked.connect(self.toggle_bridge)
+        bridge_options.addWidget(self.bridge_btn)
+        bridge_options.addStretch()
+        bridge_layout.addLayout(bridge_options)
+
+        self.bridge_status_label = QLabel("Bridge off")
+        self.bridge_status_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        self.bridge_status_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        bridge_layout.addWidget(self.bridge_status_label)
+
+        connection_layout.addWidget(bridge_group)
         connection_layout.addStretch()
         
         tabs.addTab(connection_tab, "🔧 Connection")
@@ -2391,15 +7113,176 @@ class SerialPage(QWidget):
         send_title.setStyleSheet("font-size: 16pt; font-weight: bold; color: #00B0FF; margin-bottom: 10px;")
         send_layout.addWidget(send_title)
         
-        macros_group = QGroupBox("Custom Macros (Coming Soon)")
+        tx_group = QGroupBox("🚚 Transmit Queue")
+        tx_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        tx_layout = QVBoxLayout(tx_group)
+
+        tx_info = QLabel("Pacing applies to everything sent from the console, macros and file sends. Slow bootloaders usually want a byte rate or a delay between chunks.")
+        tx_info.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        tx_info.setWordWrap(True)
+        tx_layout.addWidget(tx_info)
+
+        pacing_layout = QHBoxLayout()
+        pacing_layout.addWidget(QLabel("Rate (B/s):"))
+        self.tx_rate_spin = QSpinBox()
+        self.tx_rate_spin.setRange(0, 1000000)
+        self.tx_rate_spin.setSpecialValueText("Unlimited")
+        self.tx_rate_spin.setSingleStep(100)
+        pacing_layout.addWidget(self.tx_rate_spin)
+
+        pacing_layout.addWidget(QLabel("Chunk (bytes):"))
+        self.tx_chunk_spin = QSpinBox()
+        self.tx_chunk_spin.setRange(1, 65536)
+        self.tx_chunk_spin.setValue(TX_CHUNK_BYTES)
+        pacing_layout.addWidget(self.tx_chunk_spin)
+
+        pacing_layout.addWidget(QLabel("Delay between chunks (ms):"))
+        self.tx_delay_spin = QSpinBox()
+        self.tx_delay_spin.setRange(0, 10000)
+        pacing_layout.addWidget(self.tx_delay_spin)
+        pacing_layout.addStretch()
+        tx_layout.addLayout(pacing_layout)
+
+        tx_buttons = QHBoxLayout()
+        send_file_btn = QPushButton("📁 Send File")
+        send_file_btn.clicked.connect(self.send_file)
+        tx_buttons.addWidget(send_file_btn)
+
+        cancel_tx_btn = QPushButton("⛔ Cancel All")
+        cancel_tx_btn.clicked.connect(self.cancel_tx)
+        tx_buttons.addWidget(cancel_tx_btn)
+
+        self.tx_status_label = QLabel("TX queue empty")
+        self.tx_status_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        tx_buttons.addWidget(self.tx_status_label, 1)
+        tx_layout.addLayout(tx_buttons)
+
+        send_layout.addWidget(tx_group)
+
+        transfer_group = QGroupBox("🔁 File Transfer (XMODEM / YMODEM)")
+        transfer_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        transfer_layout = QVBoxLayout(transfer_group)
+
+        transfer_info = QLabel("Runs over the open port without reconnecting. Start the other side first when sending; YMODEM receives keep the sender's file names.")
+        transfer_info.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        transfer_info.setWordWrap(True)
+        transfer_layout.addWidget(transfer_info)
+
+        transfer_buttons = QHBoxLayout()
+        transfer_buttons.addWidget(QLabel("Protocol:"))
+        self.modem_protocol_combo = QComboBox()
+        self.modem_protocol_combo.addItems(MODEM_PROTOCOLS)
+        transfer_buttons.addWidget(self.modem_protocol_combo)
+
+        modem_send_btn = QPushButton("📤 Send File")
+        modem_send_btn.clicked.connect(self.start_modem_send)
+        transfer_buttons.addWidget(modem_send_btn)
+
+        modem_receive_btn = QPushButton("📥 Receive")
+        modem_receive_btn.clicked.connect(self.start_modem_receive)
+        transfer_buttons.addWidget(modem_receive_btn)
+
+        modem_cancel_btn = QPushButton("⛔ Cancel")
+        modem_cancel_btn.clicked.connect(self.cancel_modem_transfer)
+        transfer_buttons.addWidget(modem_cancel_btn)
+        transfer_buttons.addStretch()
+        transfer_layout.addLayout(transfer_buttons)
+
+        self.transfer_bar = QProgressBar()
+        self.transfer_bar.setValue(0)
+        transfer_layout.addWidget(self.transfer_bar)
+
+        self.transfer_status_label = QLabel("No transfer running")
+        self.transfer_status_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        transfer_layout.addWidget(self.transfer_status_label)
+
+        send_layout.addWidget(transfer_group)
+
+        macros_group = QGroupBox("🧰 Custom Macros")
         macros_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
-        macros_layout = QVBoxLayout(macros_group)
-        
-        macro_info = QLabel("• Save frequently used commands\n• Create custom command sequences\n• Automate testing workflows")
-        macro_info.setStyleSheet("font-size: 11pt; color: #AAAAAA; padding: 20px;")
-        macros_layout.addWidget(macro_info)
+        macros_layout = QHBoxLayout(macros_group)
+        
+        macro_list_layout = QVBoxLayout()
+        self.macro_list = QListWidget()
+        self.macro_list.currentTextChanged.connect(self.load_macro)
+        macro_list_layout.addWidget(self.macro_list)
+        
+        macro_list_btns = QHBoxLayout()
+        new_macro_btn = QPushButton("➕ New")
+        new_macro_btn.clicked.connect(self.new_macro)
+        macro_list_btns.addWidget(new_macro_btn)
+        delete_macro_btn = QPushButton("🗑️ Delete")
+        delete_macro_btn.clicked.connect(self.delete_macro)
+        macro_list_btns.addWidget(delete_macro_btn)
+        macro_list_layout.addLayout(macro_list_btns)
+        macros_layout.addLayout(macro_list_layout, 1)
+        
+        macro_edit_layout = QVBoxLayout()
+        self.macro_editor = QPlainTextEdit()
+        self.macro_editor.setFont(QFont("Consolas", 10))
+        self.macro_editor.setPlaceholderText(
+            "# One step per line\n"
+            "set ssid MyNetwork\n"
+            "send AT+CWJAP=\"${ssid}\",\"secret\"\n"
+            "wait OK|ERROR 10000\n"
+            "loop 3\n"
+            "    send AT+GMR\n"
+            "    wait (?P<version>\\d+\\.\\d+) 2000\n"
+            "    delay 250\n"
+            "end\n"
+            "log ${port}: firmware ${version}\n\n"
+            "# Also: sendraw \\x1b\\r, sendhex C0 00 C0")
+        macro_edit_layout.addWidget(self.macro_editor)
+        
+        macro_run_btns = QHBoxLayout()
+        save_macro_btn = QPushButton("💾 Save")
+        save_macro_btn.clicked.connect(self.save_macro)
+        macro_run_btns.addWidget(save_macro_btn)
+        run_macro_btn = QPushButton("▶️ Run")
+        run_macro_btn.clicked.connect(self.run_macro)
+        macro_run_btns.addWidget(run_macro_btn)
+        run_multi_macro_btn = QPushButton("🧩 Run on Multi-Port")
+        run_multi_macro_btn.clicked.connect(self.run_macro_multi)
+        macro_run_btns.addWidget(run_multi_macro_btn)
+        stop_macro_btn = QPushButton("⏹️ Stop")
+        stop_macro_btn.clicked.connect(self.stop_macros)
+        macro_run_btns.addWidget(stop_macro_btn)
+        macro_edit_layout.addLayout(macro_run_btns)
+        macros_layout.addLayout(macro_edit_layout, 2)
+        
+        self.macro_list.addItems(sorted(self.macro_manager.macros))
         
         send_layout.addWidget(macros_group)
+
+        decoder_group = QGroupBox("🧩 Crash Decoder")
+        decoder_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        decoder_layout = QVBoxLayout(decoder_group)
+
+        decoder_info = QLabel("Panic registers and backtraces are decoded inline against the selected ELF.")
+        decoder_info.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        decoder_info.setWordWrap(True)
+        decoder_layout.addWidget(decoder_info)
+
+        elf_layout = QHBoxLayout()
+        self.elf_edit = QLineEdit()
+        self.elf_edit.setReadOnly(True)
+        self.elf_edit.setPlaceholderText("No ELF selected")
+        elf_layout.addWidget(self.elf_edit)
+
+        elf_browse_btn = QPushButton("Browse")
+        elf_browse_btn.clicked.connect(self.select_elf)
+        elf_layout.addWidget(elf_browse_btn)
+
+        elf_clear_btn = QPushButton("Clear")
+        elf_clear_btn.clicked.connect(lambda: self.load_elf(''))
+        elf_layout.addWidget(elf_clear_btn)
+        decoder_layout.addLayout(elf_layout)
+
+        self.elf_status_label = QLabel("Decoder inactive")
+        self.elf_status_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        decoder_layout.addWidget(self.elf_status_label)
+
+        send_layout.addWidget(decoder_group)
         send_layout.addStretch()
         
         tabs.addTab(send_tab, "📤 Advanced")
@@ -2412,12 +7295,14 @@ class SerialPage(QWidget):
         hex_title.setStyleSheet("font-size: 14pt; font-weight: bold; color: #00FFFF; margin-bottom: 10px;")
         hex_layout.addWidget(hex_title)
         
-        self.hex_view = QPlainTextEdit()
-        self.hex_view.setReadOnly(True)
+        self.hex_view = QListView()
+        self.hex_view.setModel(self.hex_model)
+        self.hex_view.setUniformItemSizes(True)
+        self.hex_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.hex_view.setFont(QFont("Courier New", 10))
         self.hex_view.setMinimumHeight(550)
         self.hex_view.setStyleSheet("""
-            QPlainTextEdit {
+            QListView {
                 background-color: #0A0A0A; 
                 color: #00FFFF; 
                 border: 2px solid #3A3A4A;
@@ -2430,6 +7315,65 @@ class SerialPage(QWidget):
         
         tabs.addTab(hex_tab, "🔢 HEX")
 
+        frames_tab = QWidget()
+        frames_layout = QVBoxLayout(frames_tab)
+        frames_layout.setContentsMargins(0, 0, 0, 0)
+
+        frames_title = QLabel("📦 Framed Binary Protocols")
+        frames_title.setStyleSheet("font-size: 14pt; font-weight: bold; color: #00FFFF; margin-bottom: 10px;")
+        frames_layout.addWidget(frames_title)
+
+        decoder_options = QHBoxLayout()
+        decoder_options.addWidget(QLabel("Decoder:"))
+        self.frame_decoder_combo = QComboBox()
+        self.frame_decoder_combo.addItems(["Off"] + list(STREAM_DECODERS))
+        decoder_options.addWidget(self.frame_decoder_combo)
+
+        decoder_options.addWidget(QLabel("CRC:"))
+        self.frame_crc_combo = QComboBox()
+        self.frame_crc_combo.addItems(list(FRAME_CRC_MODES))
+        decoder_options.addWidget(self.frame_crc_combo)
+
+        decoder_options.addWidget(QLabel("Sync (HEX):"))
+        self.frame_sync_edit = QLineEdit("AA 55")
+        self.frame_sync_edit.setMaximumWidth(120)
+        decoder_options.addWidget(self.frame_sync_edit)
+
+        decoder_options.addWidget(QLabel("Length bytes:"))
+        self.frame_length_combo = QComboBox()
+        self.frame_length_combo.addItems(["1", "2", "4"])
+        self.frame_length_combo.setCurrentText("2")
+        decoder_options.addWidget(self.frame_length_combo)
+
+        apply_decoder_btn = QPushButton("✔️ Apply")
+        apply_decoder_btn.clicked.connect(self.apply_stream_decoder)
+        decoder_options.addWidget(apply_decoder_btn)
+
+        clear_frames_btn = QPushButton("🗑️ Clear")
+        clear_frames_btn.clicked.connect(self.clear_frames)
+        decoder_options.addWidget(clear_frames_btn)
+        decoder_options.addStretch()
+        frames_layout.addLayout(decoder_options)
+
+        self.frame_stats_label = QLabel("Decoder off")
+        self.frame_stats_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        frames_layout.addWidget(self.frame_stats_label)
+
+        self.frame_table = QTableView()
+        self.frame_table.setModel(self.frame_model)
+        self.frame_table.setAlternatingRowColors(True)
+        self.frame_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.frame_table.verticalHeader().setDefaultSectionSize(24)
+        self.frame_table.horizontalHeader().setStretchLastSection(True)
+        self.frame_table.setFont(QFont("Courier New", 9))
+        frames_layout.addWidget(self.frame_table)
+
+        tabs.addTab(frames_tab, "📦 Frames")
+
+        self.plotter = TelemetryPlotter()
+        self.plotter.extractor_changed.connect(self.set_sample_extractor)
+        tabs.addTab(self.plotter, "📈 Plotter")
+
         stats_tab = QWidget()
         stats_layout = QVBoxLayout(stats_tab)
         stats_layout.setContentsMargins(0, 0, 0, 0)
@@ -2444,36 +7388,223 @@ class SerialPage(QWidget):
                 border: 2px solid #3A3A4A;
                 border-radius: 8px;
                 padding: 15px;
-                font-size: 11pt;
+                font-size: 11pt;
+            }
+        """)
+        stats_layout.addWidget(self.stats_text)
+        
+        tabs.addTab(stats_tab, "📊 Statistics")
+
+        multi_tab = QWidget()
+        multi_layout = QVBoxLayout(multi_tab)
+        multi_layout.setContentsMargins(0, 0, 0, 0)
+
+        multi_title = QLabel("🧩 Multi-Port Monitor - Merged Timeline")
+        multi_title.setStyleSheet("font-size: 14pt; font-weight: bold; color: #00B0FF; margin-bottom: 10px;")
+        multi_layout.addWidget(multi_title)
+
+        multi_splitter = QSplitter(Qt.Orientation.Horizontal)
+
+        multi_ports_widget = QWidget()
+        multi_ports_layout = QVBoxLayout(multi_ports_widget)
+        multi_ports_layout.addWidget(QLabel("Ports to monitor:"))
+
+        self.multi_port_list = QListWidget()
+        multi_ports_layout.addWidget(self.multi_port_list)
+
+        multi_baud_layout = QHBoxLayout()
+        multi_baud_layout.addWidget(QLabel("Baudrate:"))
+        self.multi_baud_combo = QComboBox()
+        self.multi_baud_combo.addItems(["9600", "19200", "38400", "57600", "115200", "230400", "460800", "921600", "1000000", "2000000"])
+        self.multi_baud_combo.setCurrentText("115200")
+        multi_baud_layout.addWidget(self.multi_baud_combo)
+        multi_ports_layout.addLayout(multi_baud_layout)
+
+        self.multi_start_btn = QPushButton("▶️ Start Monitoring")
+        self.multi_start_btn.clicked.connect(self.toggle_multi_monitor)
+        multi_ports_layout.addWidget(self.multi_start_btn)
+
+        multi_clear_btn = QPushButton("🗑️ Clear")
+        multi_clear_btn.clicked.connect(lambda: self.multi_view.clear())
+        multi_ports_layout.addWidget(multi_clear_btn)
+
+        self.multi_stats_label = QLabel("No ports monitored")
+        self.multi_stats_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        self.multi_stats_label.setWordWrap(True)
+        multi_ports_layout.addWidget(self.multi_stats_label)
+
+        multi_splitter.addWidget(multi_ports_widget)
+
+        self.multi_view = QPlainTextEdit()
+        self.multi_view.setReadOnly(True)
+        self.multi_view.setFont(QFont("Consolas", 10))
+        self.multi_view.setMaximumBlockCount(20000)
+        self.multi_view.setStyleSheet("""
+            QPlainTextEdit {
+                background-color: #0A0A0A; 
+                color: #00FF00; 
+                border: 2px solid #3A3A4A;
+                border-radius: 8px;
+                padding: 15px;
             }
         """)
-        stats_layout.addWidget(self.stats_text)
-        
-        tabs.addTab(stats_tab, "📊 Statistics")
+        multi_splitter.addWidget(self.multi_view)
+        multi_splitter.setSizes([250, 750])
+
+        multi_layout.addWidget(multi_splitter)
+
+        tabs.addTab(multi_tab, "🧩 Multi-Port")
         
         layout.addWidget(tabs)
 
-        self.refresh_ports()
+        registry = self.parent.device_registry
+        registry.connect_combo(self.port_combo)
+        for info in registry.ports.values():
+            self.on_port_added(info)
+        registry.port_added.connect(self.on_port_added)
+        registry.port_removed.connect(self.on_port_removed)
         
         self.rx_bytes = 0
         self.tx_bytes = 0
         self.line_count = 0
-        self.capture_file = None
+        self.recorder = None
 
-        self.port_timer = QTimer()
-        self.port_timer.timeout.connect(self.refresh_ports)
-        self.port_timer.start(2000)
+        elf_path = self.parent.settings.data.get('serial_elf_path', '')
+        if elf_path and os.path.exists(elf_path):
+            self.load_elf(elf_path)
 
     def refresh_ports(self):
-        current = self.port_combo.currentText()
-        self.port_combo.clear()
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.port_combo.addItem(f"{port.device} - {port.description}", port.device)
-        if current:
-            index = self.port_combo.findText(current, Qt.MatchFlag.MatchContains)
-            if index >= 0:
-                self.port_combo.setCurrentIndex(index)
+        self.parent.device_registry.scan()
+
+    def on_port_added(self, info):
+        item = QListWidgetItem(f"{info.device} - {info.description}")
+        item.setData(Qt.ItemDataRole.UserRole, info.device)
+        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+        item.setCheckState(Qt.CheckState.Unchecked)
+        self.multi_port_list.addItem(item)
+
+    def on_port_removed(self, device):
+        for row in reversed(range(self.multi_port_list.count())):
+            if self.multi_port_list.item(row).data(Qt.ItemDataRole.UserRole) == device:
+                self.multi_port_list.takeItem(row)
+
+    def toggle_multi_monitor(self):
+        if self.multi_thread and self.multi_thread.isRunning():
+            # The reference is dropped in on_multi_finished, after the last queued lines_received has been shown
+            self.multi_thread.stop()
+            self.multi_thread.wait()
+            self.multi_start_btn.setText("▶️ Start Monitoring")
+            return
+
+        ports = [self.multi_port_list.item(row).data(Qt.ItemDataRole.UserRole)
+                 for row in range(self.multi_port_list.count())
+                 if self.multi_port_list.item(row).checkState() == Qt.CheckState.Checked]
+        if self.serial_thread and self.serial_thread.port in ports:
+            QMessageBox.warning(self, "Port busy", f"{self.serial_thread.port} is already open in the console.")
+            return
+        if not ports:
+            QMessageBox.warning(self, "No ports", "Check at least one port to monitor.")
+            return
+
+        self.multi_thread = MultiSerialMonitorThread(ports, int(self.multi_baud_combo.currentText()))
+        self.multi_thread.bridge = self.bridge
+        self.multi_thread.lines_received.connect(self.on_multi_lines)
+        self.multi_thread.error.connect(lambda port, msg: self.multi_view.appendPlainText(f"⚠️ [{port}] {msg}"))
+        self.multi_thread.port_opened.connect(lambda port: self.update_multi_stats())
+        self.multi_thread.port_closed.connect(lambda port: self.update_multi_stats())
+        self.multi_thread.finished.connect(lambda thread=self.multi_thread: self.on_multi_finished(thread))
+        self.multi_thread.start()
+        self.multi_start_btn.setText("⏹️ Stop Monitoring")
+
+    def toggle_bridge(self):
+        if self.bridge:
+            if self.serial_thread:
+                self.serial_thread.bridge_endpoint = None
+            if self.multi_thread:
+                self.multi_thread.bridge = None
+                for channel in list(self.multi_thread.channels.values()):
+                    channel.endpoint = None
+            self.bridge.stop()
+            self.bridge.wait()
+            self.bridge = None
+            self.bridge_btn.setText("▶️ Start Bridge")
+            self.bridge_status_label.setText("Bridge off")
+            return
+
+        host = "0.0.0.0" if self.bridge_remote_check.isChecked() else "127.0.0.1"
+        self.bridge = SerialTcpBridge(self.bridge_port_spin.value(), self.bridge_mode_combo.currentText(), host)
+        self.bridge.error.connect(lambda msg: self.parent.statusBar().showMessage(f"⚠️ Bridge: {msg}"))
+        self.bridge.endpoint_added.connect(lambda name, port: self.update_bridge_status())
+        self.bridge.endpoint_removed.connect(lambda name: self.update_bridge_status())
+        self.bridge.client_connected.connect(self.on_bridge_client_connected)
+        self.bridge.client_disconnected.connect(self.on_bridge_client_disconnected)
+        self.bridge.start()
+        if self.serial_thread and self.serial_thread.isRunning():
+            self.attach_console_bridge()
+        if self.multi_thread:
+            self.multi_thread.bridge = self.bridge
+            for channel in list(self.multi_thread.channels.values()):
+                self.multi_thread.attach_bridge(channel, self.bridge)
+        self.bridge_btn.setText("⏹️ Stop Bridge")
+        self.update_bridge_status()
+
+    def attach_console_bridge(self):
+        thread = self.serial_thread
+        thread.bridge_endpoint = self.bridge.add_endpoint(thread.port, thread.write, lambda: thread.serial_port)
+
+    def on_bridge_client_connected(self, name, address):
+        self.parent.statusBar().showMessage(f"🌐 {address} connected to {name}")
+        self.update_bridge_status()
+
+    def on_bridge_client_disconnected(self, name, address, reason):
+        self.parent.statusBar().showMessage(f"🌐 {address} left {name}: {reason}")
+        self.update_bridge_status()
+
+    def update_bridge_status(self):
+        if not self.bridge:
+            return
+        with self.bridge.lock:
+            endpoints = sorted(self.bridge.endpoints.values(), key=lambda e: e.tcp_port)
+        if not endpoints:
+            self.bridge_status_label.setText(f"Listening once a port is opened (base port {self.bridge.base_port})")
+            return
+        host = "localhost" if self.bridge.host == "127.0.0.1" else socket.gethostname()
+        scheme = {"Raw": "socket", "RFC2217": "rfc2217"}
+        self.bridge_status_label.setText('\n'.join(
+            f"{e.name} → {scheme[e.mode]}://{host}:{e.tcp_port} | {len(e.clients)} clients | "
+            f"in {e.bytes_in:,} B | out {e.bytes_out:,} B | dropped {e.dropped}"
+            for e in endpoints))
+
+    def on_multi_lines(self, lines):
+        if not self.multi_thread:
+            return
+        offset = self.multi_thread.wall_offset_ns
+        rendered = []
+        for timestamp_ns, port, text in lines:
+            stamp = datetime.datetime.fromtimestamp((timestamp_ns + offset) / 1e9).strftime("%H:%M:%S.%f")[:-3]
+            rendered.append(f"[{stamp}] [{port}] {text}")
+            runner = self.macro_runners.get(port)
+            if runner:
+                runner.feed_line(text)
+        self.multi_view.appendPlainText('\n'.join(rendered))
+        self.update_multi_stats()
+
+    def on_multi_finished(self, thread):
+        # finished is queued behind the thread's last lines_received, so nothing is lost by letting go here
+        if self.multi_thread is thread:
+            self.update_multi_stats()
+            self.multi_thread = None
+        self.multi_start_btn.setText("▶️ Start Monitoring")
+
+    def update_multi_stats(self):
+        if not self.multi_thread:
+            return
+        channels = list(self.multi_thread.channels.values())
+        if not channels:
+            self.multi_stats_label.setText("No ports monitored")
+            return
+        self.multi_stats_label.setText('\n'.join(
+            f"{c.port}: {c.line_count:,} lines, {c.buffer.end_offset:,} bytes" for c in channels))
 
     def toggle_serial(self):
         if self.serial_thread and self.serial_thread.isRunning():
@@ -2492,12 +7623,33 @@ class SerialPage(QWidget):
         stopbits = float(self.stopbits_combo.currentText())
         parity = self.parity_combo.currentText()[0]
         
-        self.serial_thread = SerialMonitorThread(port, baudrate, databits, int(stopbits), parity)
+        self.start_monitor_thread(SerialMonitorThread(port, baudrate, databits, int(stopbits), parity,
+                                                      auto_reconnect=self.auto_reconnect_check.isChecked()))
+        self.show_connected("🟢 Connected", f"✅ Connected to {port} at {baudrate} baud")
+
+    def start_monitor_thread(self, thread):
+        self.line_timing.reset()
+        self.serial_thread = thread
         self.serial_thread.data_received.connect(self.on_data_received)
         self.serial_thread.error.connect(self.on_serial_error)
         self.serial_thread.data_sent.connect(self.on_data_sent)
+        self.serial_thread.tx_progress.connect(self.on_tx_progress)
+        self.serial_thread.tx_done.connect(self.on_tx_done)
+        self.serial_thread.transfer_progress.connect(self.on_transfer_progress)
+        self.serial_thread.transfer_done.connect(self.on_transfer_done)
+        self.serial_thread.connection_lost.connect(self.on_connection_lost)
+        self.serial_thread.reconnected.connect(self.on_reconnected)
+        self.serial_thread.frames_decoded.connect(self.on_frames_decoded)
+        self.serial_thread.samples_received.connect(self.plotter.add_samples)
+        self.frame_model.wall_offset_ns = self.serial_thread.wall_offset_ns
+        self.serial_thread.decoder = self.stream_decoder
+        self.serial_thread.sample_extractor = self.sample_extractor
+        self.serial_thread.recorder = self.recorder
+        if self.bridge:
+            self.attach_console_bridge()
         self.serial_thread.start()
-        
+
+    def show_connected(self, status, message):
         self.connect_btn.setText("🔌 Disconnect")
         self.connect_btn.setStyleSheet("""
             QPushButton {
@@ -2507,7 +7659,7 @@ class SerialPage(QWidget):
                                            stop: 0 #F44336, stop: 1 #E57373);
             }
         """)
-        self.status_label.setText("🟢 Connected")
+        self.status_label.setText(status)
         self.status_label.setStyleSheet("""
             color: #4CAF50; 
             font-weight: bold; 
@@ -2516,14 +7668,59 @@ class SerialPage(QWidget):
             background-color: rgba(76, 175, 80, 0.1);
             border-radius: 8px;
         """)
-        self.parent.statusBar().showMessage(f"✅ Connected to {port} at {baudrate} baud")
+        self.parent.statusBar().showMessage(message)
+
+    def select_replay_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select capture", "", "Timed captures (*.espcap);;All files (*.*)")
+        if file_path:
+            self.replay_edit.setText(file_path)
+
+    def toggle_replay(self):
+        if isinstance(self.serial_thread, SerialReplayThread):
+            self.disconnect_serial()
+            return
+        if self.serial_thread and self.serial_thread.isRunning():
+            QMessageBox.warning(self, "Busy", "Disconnect the serial port before replaying a capture.")
+            return
+        path = self.replay_edit.text().strip()
+        try:
+            thread = SerialReplayThread(path, REPLAY_SPEEDS[self.replay_speed_combo.currentText()],
+                                        int(self.baud_combo.currentText()), self.replay_pty_check.isChecked())
+        except Exception as e:
+            QMessageBox.critical(self, "Replay error", f"Cannot open capture:\n{str(e)}")
+            return
+        thread.progress.connect(self.on_replay_progress)
+        thread.pty_ready.connect(self.on_replay_pty_ready)
+        thread.finished.connect(self.on_replay_finished)
+        self.start_monitor_thread(thread)
+        self.replay_btn.setText("⏹️ Stop Replay")
+        self.show_connected("▶️ Replaying", f"▶️ Replaying {os.path.basename(path)} ({self.replay_speed_combo.currentText()})")
+
+    def on_replay_progress(self, replayed, total):
+        percent = replayed * 100 // total if total else 100
+        pty_name = f" | pty: {self.replay_pty_name}" if getattr(self, 'replay_pty_name', None) else ""
+        self.replay_status_label.setText(f"{percent}% | {replayed:,} bytes{pty_name}")
+
+    def on_replay_pty_ready(self, name):
+        self.replay_pty_name = name
+        self.replay_status_label.setText(f"Virtual port ready: {name}")
+        self.parent.statusBar().showMessage(f"▶️ Replaying to virtual port {name}")
+
+    def on_replay_finished(self, success, message):
+        self.replay_pty_name = None
+        self.replay_status_label.setText(message if success else f"❌ {message}")
+        if self.serial_thread is self.sender():
+            self.disconnect_serial()
 
     def disconnect_serial(self):
         if self.serial_thread:
             self.serial_thread.stop()
             self.serial_thread.wait()
+            if self.serial_thread.bridge_endpoint and self.bridge:
+                self.bridge.remove_endpoint(self.serial_thread.port)
             self.serial_thread = None
-        
+        self.replay_btn.setText("▶️ Replay")
+
         self.connect_btn.setText("🔌 Connect")
         self.connect_btn.setStyleSheet("""
             QPushButton {
@@ -2544,20 +7741,30 @@ class SerialPage(QWidget):
         """)
         self.parent.statusBar().showMessage("Disconnected")
 
-    def on_data_received(self, data: bytes):
+    def on_data_received(self, data: bytes, marks: list):
         self.rx_bytes += len(data)
-        self.data_buffer.append(data)
-        
-        try:
-            text = data.decode('utf-8', errors='replace')
-        except:
-            text = str(data)
-        
-        self.line_count += text.count('\n')
-        
-        if self.timestamp_check.isChecked():
-            timestamp = datetime.datetime.now().strftime("[%H:%M:%S.%f")[:-3] + "] "
-            text = timestamp + text
+        self.session_buffer.append(data)
+        self.line_count += data.count(b'\n')
+        for _, timestamp_ns in marks:
+            self.line_timing.add(timestamp_ns)
+        
+        # Decoded panic frames sort ahead of the next line's timestamp at the same offset
+        inserts = [(offset, 0, decoded) for offset, decoded in self.panic_decoder.feed(data)]
+        if self.timestamp_check.isChecked() and self.serial_thread:
+            wall_offset = self.serial_thread.wall_offset_ns
+            for offset, timestamp_ns in marks:
+                stamp = datetime.datetime.fromtimestamp((timestamp_ns + wall_offset) / 1e9)
+                inserts.append((offset, 1, stamp.strftime("[%H:%M:%S.%f")[:-3] + "] "))
+        inserts.sort()
+        
+        pieces = []
+        start = 0
+        for offset, _, insert in inserts:
+            pieces.append(data[start:offset].decode('utf-8', errors='replace'))
+            pieces.append(insert)
+            start = offset
+        pieces.append(data[start:].decode('utf-8', errors='replace'))
+        text = ''.join(pieces)
         
         self.console.insertPlainText(text)
         
@@ -2566,14 +7773,101 @@ class SerialPage(QWidget):
             cursor.movePosition(QTextCursor.MoveOperation.End)
             self.console.setTextCursor(cursor)
         
-        hex_str = ' '.join([f'{b:02X}' for b in data])
-        self.hex_view.appendPlainText(hex_str)
+        runner = self.macro_runners.get(None)
+        if runner:
+            lines = (self._macro_partial + data).split(b'\n')
+            self._macro_partial = lines.pop()[-4096:]
+            for line in lines:
+                runner.feed_line(line.rstrip(b'\r').decode('utf-8', errors='replace'))
         
-        self.update_stats()
+        self.hex_model.refresh()
+        if self.autoscroll_check.isChecked():
+            self.hex_view.scrollToBottom()
         
-        if self.capture_file:
-            self.capture_file.write(data)
-            self.capture_file.flush()
+        self.update_stats()
+
+    def apply_stream_decoder(self):
+        name = self.frame_decoder_combo.currentText()
+        crc_mode = self.frame_crc_combo.currentText()
+        if name == "Off":
+            decoder = None
+        elif name == "Length-prefixed":
+            try:
+                sync = bytes.fromhex(self.frame_sync_edit.text().replace(' ', ''))
+            except ValueError:
+                QMessageBox.warning(self, "HEX error", "Invalid sync marker.")
+                return
+            decoder = LengthPrefixedDecoder(crc_mode, sync=sync, length_bytes=int(self.frame_length_combo.currentText()))
+        else:
+            decoder = STREAM_DECODERS[name](crc_mode)
+
+        # The reader thread picks up the new decoder on its next read
+        self.stream_decoder = decoder
+        if self.serial_thread:
+            self.serial_thread.decoder = decoder
+        self.update_frame_stats()
+
+    def set_sample_extractor(self, extractor):
+        self.sample_extractor = extractor
+        if self.serial_thread:
+            self.serial_thread.sample_extractor = extractor
+
+    def on_frames_decoded(self, records):
+        self.frame_model.add_records(records)
+        if self.autoscroll_check.isChecked():
+            self.frame_table.scrollToBottom()
+        self.update_frame_stats()
+
+    def update_frame_stats(self):
+        decoder = self.stream_decoder
+        if not decoder:
+            self.frame_stats_label.setText("Decoder off")
+            return
+        self.frame_stats_label.setText(
+            f"{decoder.name}: {decoder.frames:,} frames | CRC errors: {decoder.crc_errors:,} | Shown: {self.frame_model.rowCount():,}")
+
+    def clear_frames(self):
+        self.frame_model.clear()
+        self.update_frame_stats()
+
+    def select_elf(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select firmware ELF", "", "ELF files (*.elf);;All files (*.*)")
+        if file_path:
+            self.load_elf(file_path)
+
+    def load_elf(self, path):
+        if not path:
+            self.elf_pending = None
+            self.panic_decoder.unload()
+            self.elf_edit.clear()
+            self.elf_status_label.setText("Decoder inactive")
+            self.parent.settings.data['serial_elf_path'] = path
+            self.parent.settings.save()
+            return
+        # The previous ELF keeps decoding until the new index is ready; only the latest request is applied,
+        # and each thread is kept referenced until it has actually finished
+        self.elf_pending = path
+        thread = ElfIndexThread(path)
+        thread.indexed.connect(self.on_elf_indexed)
+        thread.finished.connect(lambda thread=thread: self.elf_threads.discard(thread))
+        self.elf_threads.add(thread)
+        thread.start()
+        self.elf_status_label.setText(f"⏳ Indexing symbols in {os.path.basename(path)}...")
+
+    def on_elf_indexed(self, path, index, error):
+        if path != self.elf_pending:
+            return
+        self.elf_pending = None
+        if index is None:
+            self.elf_status_label.setText("Decoder inactive" if self.panic_decoder.index is None else
+                                          f"✅ {len(self.panic_decoder.index):,} function symbols indexed")
+            QMessageBox.critical(self, "ELF error", f"Failed to load symbols:\n{error}")
+            return
+        self.panic_decoder.use_index(path, index)
+        self.elf_edit.setText(path)
+        self.elf_status_label.setText(f"✅ {len(index):,} function symbols indexed")
+        self.parent.settings.data['serial_elf_path'] = path
+        self.parent.settings.save()
 
     def on_serial_error(self, error_msg):
         self.console.insertPlainText(f"\n⚠️ ERROR: {error_msg}\n")
@@ -2582,6 +7876,22 @@ class SerialPage(QWidget):
             cursor.movePosition(QTextCursor.MoveOperation.End)
             self.console.setTextCursor(cursor)
 
+    def set_auto_reconnect(self, enabled):
+        self.parent.settings.data['serial_auto_reconnect'] = enabled
+        self.parent.settings.save()
+        if self.serial_thread:
+            self.serial_thread.auto_reconnect = enabled
+
+    def on_connection_lost(self, message):
+        self.console.insertPlainText(f"\n⚠️ Device disconnected ({message}), waiting for it to come back...\n")
+        self.status_label.setText("🟡 Reconnecting...")
+        self.parent.statusBar().showMessage("Device disconnected, waiting to reconnect")
+
+    def on_reconnected(self, device):
+        self.console.insertPlainText(f"\n🔌 Reconnected on {device}\n")
+        self.status_label.setText("🟢 Connected")
+        self.parent.statusBar().showMessage(f"✅ Reconnected to {device}")
+
     def on_data_sent(self, message):
         self.parent.statusBar().showMessage(message, 2000)
 
@@ -2611,9 +7921,7 @@ class SerialPage(QWidget):
                 QMessageBox.warning(self, "HEX error", "Invalid HEX format.")
                 return
         
-        self.serial_thread.write(data)
-        self.tx_bytes += len(data)
-        self.update_stats()
+        self.queue_tx(self.serial_thread.write(data, **self.tx_options()))
         self.send_input.clear()
         
         if self.autoscroll_check.isChecked():
@@ -2621,6 +7929,236 @@ class SerialPage(QWidget):
             cursor.movePosition(QTextCursor.MoveOperation.End)
             self.console.setTextCursor(cursor)
 
+    def tx_options(self):
+        return {'rate': self.tx_rate_spin.value(), 'chunk_size': self.tx_chunk_spin.value(),
+                'chunk_delay_ms': self.tx_delay_spin.value()}
+
+    def queue_tx(self, job):
+        if job.ok is not False:
+            self.tx_jobs[job.id] = job
+            self.update_tx_status()
+        return job
+
+    def send_file(self):
+        if not self.serial_thread or not self.serial_thread.isRunning():
+            QMessageBox.warning(self, "Not connected", "Connect to a port first.")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "Send File", "", "All files (*.*)")
+        if not file_path:
+            return
+        job = self.queue_tx(self.serial_thread.send_file(file_path, **self.tx_options()))
+        self.console.insertPlainText(f"\n📁 Queued {job.label} ({job.total:,} bytes)\n")
+
+    def cancel_tx(self):
+        if self.serial_thread:
+            self.serial_thread.cancel_tx()
+
+    def on_tx_progress(self, job_id, sent, total):
+        job = self.tx_jobs.get(job_id)
+        if job:
+            self.update_tx_status(job)
+
+    def on_tx_done(self, job_id, success, message):
+        job = self.tx_jobs.pop(job_id, None)
+        if not job:
+            return
+        self.tx_bytes += job.sent
+        self.update_stats()
+        if job.path:
+            icon = "✅" if success else "❌"
+            self.console.insertPlainText(f"\n{icon} {job.label}: {message}\n")
+        elif not success:
+            self.console.insertPlainText(f"\n❌ TX failed: {message}\n")
+        self.update_tx_status()
+
+    def update_tx_status(self, job=None):
+        if not self.tx_jobs:
+            self.tx_status_label.setText("TX queue empty")
+            return
+        job = job or next(iter(self.tx_jobs.values()))
+        queued = len(self.tx_jobs) - 1
+        percent = job.sent * 100 // job.total if job.total else 100
+        elapsed = time.perf_counter() - job.started if job.started else 0
+        speed = f" @ {job.sent / elapsed / 1024:.1f} KB/s" if elapsed > 0 else ""
+        self.tx_status_label.setText(f"📤 {job.label}: {percent}% ({job.sent:,}/{job.total:,} B){speed} | {queued} queued")
+
+    def start_modem_send(self):
+        if not self.serial_thread or not self.serial_thread.isRunning():
+            QMessageBox.warning(self, "Not connected", "Connect to a port first.")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "Send File", "", "All files (*.*)")
+        if file_path:
+            self.start_modem_transfer(ModemTransfer(self.modem_protocol_combo.currentText(), "send", file_path))
+
+    def start_modem_receive(self):
+        if not self.serial_thread or not self.serial_thread.isRunning():
+            QMessageBox.warning(self, "Not connected", "Connect to a port first.")
+            return
+        protocol = self.modem_protocol_combo.currentText()
+        if protocol == "YMODEM":
+            target = QFileDialog.getExistingDirectory(self, "Receive into folder")
+        else:
+            target, _ = QFileDialog.getSaveFileName(self, "Save received file", "", "All files (*.*)")
+        if target:
+            self.start_modem_transfer(ModemTransfer(protocol, "receive", target))
+
+    def start_modem_transfer(self, transfer):
+        if not self.serial_thread.start_transfer(transfer):
+            QMessageBox.warning(self, "Transfer busy", "A file transfer is already running on this port.")
+            return
+        self.modem_transfer = transfer
+        self.transfer_bar.setRange(0, 100 if transfer.total else 0)
+        self.transfer_bar.setValue(0)
+        if transfer.sending:
+            self.console.insertPlainText(f"\n📤 {transfer.protocol}: waiting for the receiver to request {transfer.label} ({transfer.total:,} bytes)\n")
+        else:
+            self.console.insertPlainText(f"\n📥 {transfer.protocol}: waiting for the sender, saving to {transfer.path}\n")
+        self.transfer_status_label.setText(f"{transfer.protocol} {'send' if transfer.sending else 'receive'} waiting for peer")
+
+    def cancel_modem_transfer(self):
+        if self.serial_thread:
+            self.serial_thread.cancel_transfer()
+
+    def on_transfer_progress(self, done, total, retries):
+        transfer = self.modem_transfer
+        if not transfer:
+            return
+        if total:
+            self.transfer_bar.setRange(0, 100)
+            self.transfer_bar.setValue(min(100, done * 100 // total))
+        size = f"{done:,}/{total:,} B" if total else f"{done:,} B"
+        self.transfer_status_label.setText(f"{transfer.protocol}: {size} @ {transfer.throughput / 1024:.1f} KB/s | {retries} retries")
+
+    def on_transfer_done(self, success, message):
+        transfer, self.modem_transfer = self.modem_transfer, None
+        if transfer and transfer.sending and success:
+            self.tx_bytes += transfer.bytes_done
+            self.update_stats()
+        self.transfer_bar.setRange(0, 100)
+        self.transfer_bar.setValue(100 if success else self.transfer_bar.value())
+        icon = "✅" if success else "❌"
+        self.console.insertPlainText(f"\n{icon} {message}\n")
+        self.transfer_status_label.setText(f"{icon} {message}")
+
+    def load_macro(self, name):
+        if name:
+            self.macro_editor.setPlainText(self.macro_manager.macros.get(name, ''))
+
+    def new_macro(self):
+        name, ok = QInputDialog.getText(self, "New Macro", "Macro name:")
+        if ok and name:
+            self.macro_manager.set_macro(name, '')
+            if not self.macro_list.findItems(name, Qt.MatchFlag.MatchExactly):
+                self.macro_list.addItem(name)
+            self.macro_list.setCurrentItem(self.macro_list.findItems(name, Qt.MatchFlag.MatchExactly)[0])
+
+    def save_macro(self):
+        item = self.macro_list.currentItem()
+        if not item:
+            QMessageBox.warning(self, "No macro", "Create or select a macro first.")
+            return
+        script = self.macro_editor.toPlainText()
+        try:
+            parse_macro(script)
+        except ValueError as e:
+            QMessageBox.warning(self, "Macro error", str(e))
+            return
+        self.macro_manager.set_macro(item.text(), script)
+        self.parent.statusBar().showMessage(f"✅ Macro '{item.text()}' saved", 3000)
+
+    def delete_macro(self):
+        item = self.macro_list.currentItem()
+        if not item:
+            return
+        reply = QMessageBox.question(self, "Delete Macro", f"Delete macro '{item.text()}'?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            self.macro_manager.delete_macro(item.text())
+            self.macro_list.takeItem(self.macro_list.row(item))
+            self.macro_editor.clear()
+
+    def current_macro_steps(self):
+        item = self.macro_list.currentItem()
+        name = item.text() if item else "untitled"
+        try:
+            return name, parse_macro(self.macro_editor.toPlainText())
+        except ValueError as e:
+            QMessageBox.warning(self, "Macro error", str(e))
+            return name, None
+
+    def run_macro(self):
+        if not self.serial_thread or not self.serial_thread.isRunning():
+            QMessageBox.warning(self, "Not connected", "Connect to a port first.")
+            return
+        if None in self.macro_runners:
+            QMessageBox.warning(self, "Macro running", "A macro is already running on the console port.")
+            return
+        name, steps = self.current_macro_steps()
+        if steps is None:
+            return
+        self._macro_partial = b''
+        thread, options = self.serial_thread, self.tx_options()
+        self.start_macro_runner(None, name, steps, lambda data: self.write_macro_data(thread, data, options), thread.port)
+
+    def write_macro_data(self, thread, data, options) -> bool:
+        # Runs on the macro thread. Paced writes get as long as their pacing needs, and a write that
+        # still has not gone out is cancelled so the macro fails instead of hanging
+        timeout = TX_WRITE_TIMEOUT_S + len(data) / options['chunk_size'] * options['chunk_delay_ms'] / 1000
+        if options['rate']:
+            timeout += len(data) / options['rate']
+        job = thread.write(data, **options)
+        if job.wait(timeout):
+            return True
+        if job.ok is None:
+            job.cancelled = True
+            thread.tx_wakeup.set()
+        return False
+
+    def run_macro_multi(self):
+        if not self.multi_thread or not self.multi_thread.channels:
+            QMessageBox.warning(self, "Not monitoring", "Start the Multi-Port monitor first.")
+            return
+        name, steps = self.current_macro_steps()
+        if steps is None:
+            return
+        for port in list(self.multi_thread.channels):
+            if port in self.macro_runners:
+                continue
+            write = lambda data, p=port: self.multi_thread.write(p, data)
+            self.start_macro_runner(port, name, steps, write, port)
+
+    def start_macro_runner(self, key, name, steps, write, port):
+        line_ending = {0: '', 1: '\n', 2: '\r', 3: '\r\n'}[self.line_ending_combo.currentIndex()]
+        runner = MacroRunnerThread(name, steps, write, line_ending, {'port': port})
+        runner.log.connect(lambda msg: self.log_macro(key, msg))
+        runner.sent.connect(self.on_macro_sent)
+        runner.completed.connect(lambda ok, msg: self.log_macro(key, ("✅ " if ok else "❌ ") + msg))
+        # Only released once run() has returned, so a running QThread is never left without a reference
+        runner.finished.connect(lambda: self.on_macro_finished(key, runner))
+        self.macro_runners[key] = runner
+        runner.start()
+        self.log_macro(key, f"▶️ Running macro '{name}'")
+
+    def log_macro(self, key, message):
+        # key is None for the console port, otherwise the multi-port channel name
+        if key is None:
+            self.console.insertPlainText(f"\n🧰 {message}\n")
+        else:
+            self.multi_view.appendPlainText(f"🧰 [{key}] {message}")
+
+    def on_macro_sent(self, size):
+        self.tx_bytes += size
+        self.update_stats()
+
+    def on_macro_finished(self, key, runner):
+        if self.macro_runners.get(key) is runner:
+            del self.macro_runners[key]
+        runner.deleteLater()
+
+    def stop_macros(self):
+        for runner in list(self.macro_runners.values()):
+            runner.stop()
+
     def quick_send(self, command):
         if self.serial_thread and self.serial_thread.isRunning():
             self.send_input.setText(command)
@@ -2629,6 +8167,16 @@ class SerialPage(QWidget):
     def update_stats(self):
         self.stats_label.setText(f"📊 RX: {self.rx_bytes} | TX: {self.tx_bytes} | Lines: {self.line_count}")
         
+        # The timing tables sort the whole delta window, so cap the HTML refresh rate
+        now = time.monotonic()
+        if now - self._stats_refreshed < 0.25:
+            if not self._stats_pending:
+                self._stats_pending = True
+                QTimer.singleShot(250, self.update_stats)
+            return
+        self._stats_refreshed = now
+        self._stats_pending = False
+        
         stats_html = f"""
         <h2>Serial Monitor Statistics</h2>
         <table border="1" cellpadding="5">
@@ -2636,12 +8184,43 @@ class SerialPage(QWidget):
         <tr><td>Bytes Received</td><td>{self.rx_bytes:,}</td></tr>
         <tr><td>Bytes Transmitted</td><td>{self.tx_bytes:,}</td></tr>
         <tr><td>Lines Received</td><td>{self.line_count:,}</td></tr>
-        <tr><td>Buffer Size</td><td>{len(self.data_buffer)}</td></tr>
+        <tr><td>Buffer Size</td><td>{len(self.session_buffer):,} bytes</td></tr>
         <tr><td>Port</td><td>{self.port_combo.currentText()}</td></tr>
         <tr><td>Baudrate</td><td>{self.baud_combo.currentText()}</td></tr>
         </table>
         """
+        stats_html += self.line_timing_html()
         self.stats_text.setHtml(stats_html)
+        self.update_bridge_status()
+
+    def line_timing_html(self):
+        timing = self.line_timing
+        if timing.count < 2:
+            return "<h3>Line Timing</h3><p>Waiting for at least two lines...</p>"
+        
+        percentiles = timing.percentiles()
+        deltas = timing.deltas
+        rows = [
+            ("Lines timed", f"{timing.count:,}"),
+            ("Since first line", f"{(timing.last_ns - timing.first_ns) / 1e6:,.3f} ms"),
+            ("Min gap", f"{min(deltas) / 1e6:.3f} ms"),
+            ("Mean gap", f"{sum(deltas) / len(deltas) / 1e6:.3f} ms"),
+            ("p50 gap", f"{percentiles[50] / 1e6:.3f} ms"),
+            ("p90 gap", f"{percentiles[90] / 1e6:.3f} ms"),
+            ("p99 gap", f"{percentiles[99] / 1e6:.3f} ms"),
+            ("Max gap", f"{max(deltas) / 1e6:.3f} ms"),
+        ]
+        html = "<h3>Line Timing (reader-thread timestamps)</h3><table border=\"1\" cellpadding=\"5\">"
+        html += "<tr><th>Metric</th><th>Value</th></tr>"
+        html += ''.join(f"<tr><td>{name}</td><td>{value}</td></tr>" for name, value in rows)
+        html += "</table><h3>Inter-Arrival Distribution</h3><table border=\"1\" cellpadding=\"5\">"
+        html += "<tr><th>Gap</th><th>Lines</th><th></th></tr>"
+        histogram = timing.histogram()
+        peak = max(count for _, count in histogram) or 1
+        for label, count in histogram:
+            bar = '█' * round(30 * count / peak)
+            html += f"<tr><td>{label}</td><td>{count:,}</td><td style=\"color: #00B0FF;\">{bar}</td></tr>"
+        return html + "</table>"
 
     def update_font_size(self, size):
         font = QFont("Consolas", size)
@@ -2654,11 +8233,12 @@ class SerialPage(QWidget):
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
             self.console.clear()
-            self.hex_view.clear()
             self.rx_bytes = 0
             self.tx_bytes = 0
             self.line_count = 0
-            self.data_buffer.clear()
+            self.session_buffer.clear()
+            self.hex_model.refresh()
+            self.line_timing.reset()
             self.update_stats()
 
     def save_log(self):
@@ -2672,21 +8252,435 @@ class SerialPage(QWidget):
                 QMessageBox.critical(self, "Error", f"Failed to save log:\n{str(e)}")
 
     def toggle_capture(self):
-        if self.capture_file:
-            self.capture_file.close()
-            self.capture_file = None
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+            if self.serial_thread:
+                self.serial_thread.recorder = None
             self.capture_btn.setText("📹 Start Capture")
             self.capture_btn.setStyleSheet("")
             QMessageBox.information(self, "Capture Stopped", "Data capture stopped.")
         else:
-            file_path, _ = QFileDialog.getSaveFileName(self, "Capture to File", "", "Binary files (*.bin);;Text files (*.txt)")
+            file_path, _ = QFileDialog.getSaveFileName(self, "Capture to File", "", "Timed captures (*.espcap);;Binary files (*.bin);;Text files (*.txt)")
             if file_path:
-                self.capture_file = open(file_path, 'wb')
+                # Recording happens in the reader thread so timed captures keep the exact read timestamps
+                self.recorder = SessionRecorder(file_path, int(self.baud_combo.currentText()))
+                if self.serial_thread:
+                    self.serial_thread.recorder = self.recorder
                 self.capture_btn.setText("⏹️ Stop Capture")
                 self.capture_btn.setStyleSheet("background-color: #F44336;")
                 QMessageBox.information(self, "Capture Started", f"Capturing to:\n{file_path}")
 
 
+class JobsPage(QWidget):
+    COLUMNS = ["ID", "Type", "Port", "Priority", "Status", "Progress", "Message", "Source"]
+    STATUS_ICONS = {'queued': "⏳", 'running': "▶️", 'succeeded': "✅", 'failed': "❌", 'cancelled': "⛔"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.scheduler = parent.job_scheduler
+        self.rows = {}
+        self.init_ui()
+        self.scheduler.event_published.connect(self.on_job_event)
+        self.refresh_jobs()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        title = QLabel("📋 Job Queue")
+        title.setStyleSheet("font-size: 20pt; font-weight: bold; color: #00B0FF;")
+        layout.addWidget(title)
+
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        raise_btn = QPushButton("⏫ Raise Priority")
+        raise_btn.clicked.connect(lambda: self.change_priority(1))
+        btn_layout.addWidget(raise_btn)
+
+        lower_btn = QPushButton("⏬ Lower Priority")
+        lower_btn.clicked.connect(lambda: self.change_priority(-1))
+        btn_layout.addWidget(lower_btn)
+
+        cancel_btn = QPushButton("⛔ Cancel Job")
+        cancel_btn.clicked.connect(self.cancel_selected)
+        btn_layout.addWidget(cancel_btn)
+
+        clear_btn = QPushButton("🧹 Clear Finished")
+        clear_btn.clicked.connect(self.scheduler.clear_finished)
+        btn_layout.addWidget(clear_btn)
+        layout.addLayout(btn_layout)
+
+        erase_group = QGroupBox("🧨 Erase Flash")
+        erase_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        erase_layout = QHBoxLayout(erase_group)
+        self.erase_port_combo = QComboBox()
+        self.erase_port_combo.setMinimumWidth(250)
+        self.parent.device_registry.connect_combo(self.erase_port_combo)
+        erase_layout.addWidget(QLabel("Port:"))
+        erase_layout.addWidget(self.erase_port_combo)
+        self.erase_chip_combo = QComboBox()
+        self.erase_chip_combo.addItems(["auto", "esp8266", "esp32", "esp32s2", "esp32s3", "esp32c3", "esp32c6"])
+        erase_layout.addWidget(QLabel("Chip:"))
+        erase_layout.addWidget(self.erase_chip_combo)
+        erase_btn = QPushButton("🧨 Queue Erase")
+        erase_btn.clicked.connect(self.queue_erase)
+        erase_layout.addWidget(erase_btn)
+        erase_layout.addStretch()
+        layout.addWidget(erase_group)
+
+    def refresh_jobs(self):
+        self.table.setRowCount(0)
+        self.rows = {}
+        for job in self.scheduler.snapshot():
+            self.set_job(job)
+        self.update_summary()
+
+    def set_job(self, job):
+        row = self.rows.get(job['id'])
+        if row is None:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.rows[job['id']] = row
+        values = [job['id'], job['kind'].capitalize(), job['port'], str(job['priority']),
+                  f"{self.STATUS_ICONS.get(job['status'], '')} {job['status']}", f"{job['percent']}%",
+                  job['message'], job.get('source', '')]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if column == 0:
+                item.setData(Qt.ItemDataRole.UserRole, job['id'])
+                if job['kind'] == 'flash':
+                    item.setToolTip(job['firmware'])
+            self.table.setItem(row, column, item)
+
+    def update_summary(self):
+        counts = self.scheduler.counts()
+        self.summary_label.setText(" | ".join(f"{self.STATUS_ICONS[status]} {status.capitalize()}: {counts.get(status, 0)}"
+                                              for status in self.STATUS_ICONS))
+
+    def on_job_event(self, event):
+        if event['event'] == 'job':
+            self.set_job(event['job'])
+            self.update_summary()
+        elif event['event'] == 'progress':
+            row = self.rows.get(event['job_id'])
+            if row is not None:
+                self.table.item(row, 5).setText(f"{event['percent']}%")
+                self.table.item(row, 6).setText(event['message'])
+        elif event['event'] == 'cleared':
+            self.refresh_jobs()
+
+    def selected_job_ids(self):
+        return [self.table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole)
+                for index in self.table.selectionModel().selectedRows()]
+
+    def change_priority(self, delta):
+        for job_id in self.selected_job_ids():
+            job = self.scheduler.get(job_id)
+            if job:
+                self.scheduler.set_priority(job_id, job['priority'] + delta)
+
+    def cancel_selected(self):
+        job_ids = self.selected_job_ids()
+        if not job_ids:
+            QMessageBox.warning(self, "No selection", "Please select a job first.")
+            return
+        for job_id in job_ids:
+            self.scheduler.cancel(job_id)
+
+    def queue_erase(self):
+        port = self.erase_port_combo.currentData()
+        if not port:
+            QMessageBox.warning(self, "No port", "No COM port detected.")
+            return
+        reply = QMessageBox.question(self, "Erase Flash",
+                                     f"Erase the whole flash of the device on {port}?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            self.scheduler.submit({'kind': 'erase', 'port': port, 'chip': self.erase_chip_combo.currentText()},
+                                  source="Jobs page")
+
+
+class ProductionPage(QWidget):
+    COLUMNS = ["Unit", "Port", "MAC", "Step", "Progress", "Status", "Time", "Message"]
+    STATUS_ICONS = {'running': "▶️", 'passed': "✅", 'failed': "❌", 'skipped': "⏭️"}
+    STATS = [('passed', "✅ Passed"), ('failed', "❌ Failed"), ('yield', "📈 Yield"),
+             ('units_per_hour', "⏱️ Units/hour"), ('avg_cycle_s', "🔁 Avg cycle")]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.line = parent.production_line
+        self.rows = {}
+        self.init_ui()
+        self.line.station_changed.connect(self.set_station)
+        self.line.stats_changed.connect(self.update_stats)
+        self.clock = QTimer(self)
+        self.clock.timeout.connect(self.tick)
+        self.clock.start(1000)
+        self.refresh_templates()
+        self.update_stats(self.line.stats())
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        title = QLabel("🏭 Production Line")
+        title.setStyleSheet("font-size: 20pt; font-weight: bold; color: #00B0FF;")
+        layout.addWidget(title)
+
+        info = QLabel("While production runs, every board plugged in is detected, flashed, verified and tested automatically. "
+                      "Each port is a station; stations run in parallel.")
+        info.setWordWrap(True)
+        info.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        layout.addWidget(info)
+
+        template_group = QGroupBox("📄 Pipeline Template")
+        template_group.setStyleSheet("QGroupBox { font-size: 12pt; font-weight: bold; }")
+        template_layout = QGridLayout(template_group)
+        template_layout.addWidget(QLabel("Template:"), 0, 0)
+        self.template_combo = QComboBox()
+        self.template_combo.setMinimumWidth(250)
+        self.template_combo.currentTextChanged.connect(self.show_template)
+        template_layout.addWidget(self.template_combo, 0, 1)
+        refresh_btn = QPushButton("🔄 Refresh")
+        refresh_btn.clicked.connect(self.refresh_templates)
+        template_layout.addWidget(refresh_btn, 0, 2)
+
+        self.pipeline_label = QLabel()
+        self.pipeline_label.setWordWrap(True)
+        self.pipeline_label.setStyleSheet("font-size: 10pt; color: #AAAAAA;")
+        template_layout.addWidget(self.pipeline_label, 1, 0, 1, 3)
+
+        template_layout.addWidget(QLabel("Self-test pass regex:"), 2, 0)
+        self.pattern_edit = QLineEdit()
+        self.pattern_edit.setPlaceholderText("e.g. SELFTEST OK (leave empty to skip the self-test)")
+        template_layout.addWidget(self.pattern_edit, 2, 1, 1, 2)
+        template_layout.addWidget(QLabel("Self-test fail regex:"), 3, 0)
+        self.fail_pattern_edit = QLineEdit()
+        self.fail_pattern_edit.setPlaceholderText("e.g. FAIL|panic|Guru Meditation (optional)")
+        template_layout.addWidget(self.fail_pattern_edit, 3, 1, 1, 2)
+
+        test_layout = QHBoxLayout()
+        test_layout.addWidget(QLabel("Timeout:"))
+        self.timeout_spin = QSpinBox()
+        self.timeout_spin.setRange(1, 600)
+        self.timeout_spin.setSuffix(" s")
+        self.timeout_spin.setValue(SELF_TEST_DEFAULT_TIMEOUT_S)
+        test_layout.addWidget(self.timeout_spin)
+        test_layout.addWidget(QLabel("Console baud:"))
+        self.test_baud_combo = QComboBox()
+        self.test_baud_combo.setEditable(True)
+        self.test_baud_combo.addItems(["9600", "57600", "74880", "115200", "230400", "460800", "921600"])
+        self.test_baud_combo.setCurrentText(str(ESP_ROM_BAUDRATE))
+        test_layout.addWidget(self.test_baud_combo)
+        test_layout.addStretch()
+        save_btn = QPushButton("💾 Save to Template")
+        save_btn.clicked.connect(self.save_self_test)
+        test_layout.addWidget(save_btn)
+        template_layout.addLayout(test_layout, 4, 0, 1, 3)
+        layout.addWidget(template_group)
+
+        control_layout = QHBoxLayout()
+        self.start_btn = QPushButton("▶️ Start Production")
+        self.start_btn.setMinimumHeight(40)
+        self.start_btn.clicked.connect(self.toggle_line)
+        control_layout.addWidget(self.start_btn)
+        self.stat_labels = {}
+        for key, text in self.STATS:
+            label = QLabel()
+            label.setStyleSheet("font-size: 12pt; font-weight: bold;")
+            control_layout.addWidget(label)
+            self.stat_labels[key] = (text, label)
+        layout.addLayout(control_layout)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(7, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        clear_btn = QPushButton("🧹 Clear Finished")
+        clear_btn.clicked.connect(self.clear_finished)
+        btn_layout.addWidget(clear_btn)
+        ledger_btn = QPushButton("📒 Export Provisioning Ledger")
+        ledger_btn.clicked.connect(self.export_ledger)
+        btn_layout.addWidget(ledger_btn)
+        layout.addLayout(btn_layout)
+
+    def refresh_templates(self):
+        current = self.template_combo.currentText()
+        self.template_combo.blockSignals(True)
+        self.template_combo.clear()
+        self.template_combo.addItems(sorted(f[:-5] for f in os.listdir(TEMPLATES_DIR) if f.endswith('.json')))
+        if current:
+            self.template_combo.setCurrentText(current)
+        self.template_combo.blockSignals(False)
+        self.show_template()
+
+    def read_template(self) -> dict:
+        template_path = os.path.join(TEMPLATES_DIR, f"{self.template_combo.currentText()}.json")
+        if not self.template_combo.currentText() or not os.path.exists(template_path):
+            return {}
+        try:
+            with open(template_path, 'r') as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def show_template(self):
+        template = self.read_template()
+        if not template:
+            self.pipeline_label.setText("No template selected. Save one from the Flash page "
+                                        "(the Multi-Address tab stores bootloader, partition table and app together).")
+            return
+        images = template_images(template)
+        chip = template.get('chip', 'auto')
+        steps = ["Detect" + (f" {chip}" if chip != 'auto' else "")]
+        if template.get('erase'):
+            steps.append("Erase")
+        provisioning = template.get('provisioning') or {}
+        steps.append(f"Flash {len(images)} image(s)" + (" + NVS" if provisioning else "")
+                     + (" + verify" if template.get('verify', True) else ""))
+        self_test = template.get('self_test') or {}
+        if self_test.get('pattern'):
+            steps.append("Self-test")
+        lines = [" → ".join(steps)]
+        lines.extend(f"{address}: {os.path.basename(path)}" for address, path in images)
+        if provisioning.get('nvs_csv'):
+            nvs_csv = os.path.join(TEMPLATES_DIR, provisioning['nvs_csv'])
+            line = (f"{provisioning.get('address', NVS_DEFAULT_ADDRESS)}: NVS generated per board from "
+                    f"{os.path.basename(nvs_csv)}, {self.parent.provisioning_ledger.count(nvs_csv)} board(s) assigned")
+            if provisioning.get('data_csv'):
+                data_csv = os.path.join(TEMPLATES_DIR, provisioning['data_csv'])
+                try:
+                    line += f", {len(ProvisioningLedger.data_rows(data_csv))} row(s) in {os.path.basename(data_csv)}"
+                except OSError:
+                    line += f", {os.path.basename(data_csv)} missing"
+            lines.append(line)
+        self.pipeline_label.setText("\n".join(lines))
+        self.pattern_edit.setText(self_test.get('pattern', ''))
+        self.fail_pattern_edit.setText(self_test.get('fail_pattern', ''))
+        self.timeout_spin.setValue(int(self_test.get('timeout', SELF_TEST_DEFAULT_TIMEOUT_S)))
+        self.test_baud_combo.setCurrentText(str(self_test.get('baudrate', ESP_ROM_BAUDRATE)))
+
+    def save_self_test(self):
+        template = self.read_template()
+        if not template:
+            QMessageBox.warning(self, "No template", "Please select a template first.")
+            return
+        try:
+            re.compile(self.pattern_edit.text())
+            re.compile(self.fail_pattern_edit.text())
+            baudrate = int(self.test_baud_combo.currentText())
+        except (re.error, ValueError) as e:
+            QMessageBox.warning(self, "Invalid self-test", str(e))
+            return
+        template['self_test'] = {
+            'pattern': self.pattern_edit.text(),
+            'fail_pattern': self.fail_pattern_edit.text(),
+            'timeout': self.timeout_spin.value(),
+            'baudrate': baudrate
+        }
+        name = self.template_combo.currentText()
+        with open(os.path.join(TEMPLATES_DIR, f"{name}.json"), 'w') as f:
+            json.dump(template, f, indent=4)
+        self.show_template()
+        self.parent.statusBar().showMessage(f"✅ Self-test saved to template '{name}'", 3000)
+
+    def toggle_line(self):
+        if self.line.active:
+            self.line.stop()
+            return
+        try:
+            self.line.start(self.template_combo.currentText())
+        except ValueError as e:
+            QMessageBox.warning(self, "Production", str(e))
+
+    def set_station(self, station):
+        row = self.rows.get(station['unit'])
+        if row is None:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.rows[station['unit']] = row
+        elapsed = station['elapsed'] if station['status'] != 'running' else time.time() - station['started']
+        values = [str(station['unit']), station['port'], station['mac'], station['step'].capitalize(),
+                  f"{station['percent']}%", f"{self.STATUS_ICONS[station['status']]} {station['status']}",
+                  f"{elapsed:.1f}s", station['message']]
+        for column, value in enumerate(values):
+            item = QTableWidgetItem(value)
+            if column == 5 and station['status'] == 'passed':
+                item.setForeground(QColor(76, 175, 80))
+            elif column == 5 and station['status'] == 'failed':
+                item.setForeground(QColor(244, 67, 54))
+            self.table.setItem(row, column, item)
+        self.table.scrollToItem(self.table.item(row, 0))
+
+    def tick(self):
+        for station in self.line.stations.values():
+            row = self.rows.get(station['unit'])
+            if station['status'] == 'running' and row is not None:
+                self.table.item(row, 6).setText(f"{time.time() - station['started']:.1f}s")
+        if self.line.active:
+            self.update_stats(self.line.stats())
+
+    def update_stats(self, stats):
+        self.start_btn.setText("⏹️ Stop Production" if stats['active'] else "▶️ Start Production")
+        self.template_combo.setEnabled(not stats['active'])
+        values = {
+            'passed': str(stats['passed']),
+            'failed': str(stats['failed']),
+            'yield': f"{stats['yield']:.1f}%" if stats['yield'] is not None else "--",
+            'units_per_hour': f"{stats['units_per_hour']:.1f}",
+            'avg_cycle_s': f"{stats['avg_cycle_s']:.1f}s" if stats['avg_cycle_s'] is not None else "--",
+        }
+        for key, (text, label) in self.stat_labels.items():
+            label.setText(f"{text}: {values[key]}")
+
+    def export_ledger(self):
+        ledger = self.parent.provisioning_ledger
+        with ledger.lock:
+            assignments = [dict(assignment) for assignment in ledger.assignments.values()]
+        if not assignments:
+            QMessageBox.information(self, "Provisioning Ledger", "No board has been provisioned yet.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Provisioning Ledger", "provisioning_ledger.csv",
+                                                   "CSV files (*.csv)")
+        if not file_path:
+            return
+        columns = sorted({column for assignment in assignments for column in assignment['values']})
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['mac', 'seq', 'profile', 'row', 'assigned', 'flashed', 'nvs_md5'] + columns)
+            for assignment in sorted(assignments, key=lambda assignment: assignment['assigned']):
+                writer.writerow([assignment['mac'], assignment['seq'], os.path.basename(assignment['profile']),
+                                 assignment['row'], assignment['assigned'], assignment['flashed'] or '',
+                                 assignment['nvs_md5'] or ''] + [assignment['values'].get(column, '') for column in columns])
+        self.parent.statusBar().showMessage(f"✅ {len(assignments)} assignment(s) exported", 3000)
+
+    def clear_finished(self):
+        self.line.clear_finished()
+        self.table.setRowCount(0)
+        self.rows = {}
+        for station in self.line.stations.values():
+            self.set_station(station)
+
+
 class ProjectsPage(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -2909,6 +8903,12 @@ class SettingsPage(QWidget):
         self.verify_check.setChecked(self.parent.settings.data.get('verify_after_flash', True))
         form.addRow("Verify After Flash:", self.verify_check)
 
+        self.compression_spin = QSpinBox()
+        self.compression_spin.setRange(1, 9)
+        self.compression_spin.setValue(self.parent.settings.data.get('compression_level', 9))
+        self.compression_spin.setToolTip("zlib level for write_flash -z; each firmware is compressed once per level and cached")
+        form.addRow("Compression Level:", self.compression_spin)
+
         form.addRow(QLabel(""))
 
         form.addRow(QLabel("<b>Backup Settings</b>"))
@@ -2967,6 +8967,39 @@ class SettingsPage(QWidget):
         self.auto_detect_check.setChecked(self.parent.settings.data.get('auto_detect_on_start', True))
         form.addRow("Auto-Detect on Start:", self.auto_detect_check)
 
+        self.max_jobs_spin = QSpinBox()
+        self.max_jobs_spin.setRange(0, 64)
+        self.max_jobs_spin.setSpecialValueText("One per port")
+        self.max_jobs_spin.setValue(self.parent.settings.data.get('max_parallel_jobs', 0))
+        form.addRow("Max Parallel Jobs:", self.max_jobs_spin)
+
+        form.addRow(QLabel(""))
+
+        form.addRow(QLabel("<b>Control API</b>"))
+
+        self.api_enabled_check = QCheckBox()
+        self.api_enabled_check.setChecked(self.parent.settings.data.get('api_enabled', False))
+        form.addRow("Enable HTTP/WebSocket API:", self.api_enabled_check)
+
+        self.api_host_edit = QLineEdit(self.parent.settings.data.get('api_host', '127.0.0.1'))
+        self.api_host_edit.setToolTip("127.0.0.1 keeps the API local; 0.0.0.0 exposes it to the network")
+        form.addRow("Listen Address:", self.api_host_edit)
+
+        self.api_port_spin = QSpinBox()
+        self.api_port_spin.setRange(1, 65535)
+        self.api_port_spin.setValue(self.parent.settings.data.get('api_port', API_DEFAULT_PORT))
+        form.addRow("Listen Port:", self.api_port_spin)
+
+        self.api_token_edit = QLineEdit(self.parent.settings.data.get('api_token', ''))
+        self.api_token_edit.setEchoMode(QLineEdit.EchoMode.Password)
+        self.api_token_edit.setPlaceholderText("Generated when the API starts, sent as 'Authorization: Bearer <token>'")
+        form.addRow("API Token:", self.api_token_edit)
+
+        self.api_origin_edit = QLineEdit(self.parent.settings.data.get('api_allowed_origin', ''))
+        self.api_origin_edit.setPlaceholderText("None, e.g. http://dashboard.local:8080")
+        self.api_origin_edit.setToolTip("The only web page origin allowed to call the API from a browser")
+        form.addRow("Allowed Origin:", self.api_origin_edit)
+
         scroll.setWidget(scroll_content)
         layout.addWidget(scroll)
 
@@ -3006,6 +9039,7 @@ class SettingsPage(QWidget):
         self.parent.settings.data['chip_type'] = self.chip_combo.currentText()
         self.parent.settings.data['erase_before_flash'] = self.erase_check.isChecked()
         self.parent.settings.data['verify_after_flash'] = self.verify_check.isChecked()
+        self.parent.settings.data['compression_level'] = self.compression_spin.value()
         self.parent.settings.data['backup_before_flash'] = self.backup_check.isChecked()
         self.parent.settings.data['backup_size'] = self.backup_size_spin.value()
         self.parent.settings.data['serial_baudrate'] = int(self.serial_baud_combo.currentText())
@@ -3014,9 +9048,17 @@ class SettingsPage(QWidget):
         self.parent.settings.data['firmware_dir'] = self.firmware_dir_edit.text()
         self.parent.settings.data['backup_dir'] = self.backup_dir_edit.text()
         self.parent.settings.data['auto_detect_on_start'] = self.auto_detect_check.isChecked()
+        self.parent.settings.data['max_parallel_jobs'] = self.max_jobs_spin.value()
         self.parent.settings.data['theme'] = self.theme_combo.currentText()
+        self.parent.settings.data['api_enabled'] = self.api_enabled_check.isChecked()
+        self.parent.settings.data['api_host'] = self.api_host_edit.text().strip() or '127.0.0.1'
+        self.parent.settings.data['api_port'] = self.api_port_spin.value()
+        self.parent.settings.data['api_token'] = self.api_token_edit.text().strip()
+        self.parent.settings.data['api_allowed_origin'] = self.api_origin_edit.text().strip()
         self.parent.settings.save()
-        
+        self.parent.restart_api_server()
+        self.api_token_edit.setText(self.parent.settings.data.get('api_token', ''))
+                
         QMessageBox.information(self, "Settings Saved", "Settings saved successfully!")
 
     def reset_defaults(self):
@@ -3061,6 +9103,14 @@ class MainWindow(QMainWindow):
 
         self.settings = SettingsManager()
         self.history_manager = HistoryManager()
+        self.device_registry = DeviceRegistry(self)
+        self.device_store = DeviceIdentityStore()
+        self.provisioning_ledger = ProvisioningLedger()
+        self.device_registry.port_added.connect(lambda info: self.device_store.forget_failures(info.device))
+        self.device_registry.port_removed.connect(self.device_store.forget_failures)
+        self.job_scheduler = JobScheduler(self)
+        self.production_line = ProductionLine(self.job_scheduler, self.device_registry, self)
+        self.api_server = None
 
         theme = self.settings.data.get('theme', 'Purple Dream')
         self.setStyleSheet(get_stylesheet(theme))
@@ -3068,6 +9118,7 @@ class MainWindow(QMainWindow):
         self.create_menus()
         self.create_toolbar()
         self.create_status_bar()
+        self.restart_api_server()
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -3114,6 +9165,8 @@ class MainWindow(QMainWindow):
             ("⚡", "Flash", "Flash firmware to devices"),
             ("💾", "Backup", "Backup and restore"),
             ("📡", "Serial", "Serial monitor"),
+            ("📋", "Jobs", "Queued and running jobs"),
+            ("🏭", "Production", "Automatic flashing on plug-in"),
             ("📁", "Projects", "Manage projects"),
             ("⚙️", "Settings", "Application settings")
         ]
@@ -3124,6 +9177,8 @@ class MainWindow(QMainWindow):
         self.flash_page = FlashPage(self)
         self.backup_page = BackupPage(self)
         self.serial_page = SerialPage(self)
+        self.jobs_page = JobsPage(self)
+        self.production_page = ProductionPage(self)
         self.projects_page = ProjectsPage(self)
         self.settings_page = SettingsPage(self)
 
@@ -3131,6 +9186,8 @@ class MainWindow(QMainWindow):
         self.sidebar_stack.addWidget(self.flash_page)
         self.sidebar_stack.addWidget(self.backup_page)
         self.sidebar_stack.addWidget(self.serial_page)
+        self.sidebar_stack.addWidget(self.jobs_page)
+        self.sidebar_stack.addWidget(self.production_page)
         self.sidebar_stack.addWidget(self.projects_page)
         self.sidebar_stack.addWidget(self.settings_page)
 
@@ -3328,6 +9385,21 @@ class MainWindow(QMainWindow):
         self.connection_indicator.setStyleSheet("color: #F44336; padding: 5px;")
         toolbar.addWidget(self.connection_indicator)
 
+    def restart_api_server(self):
+        if self.api_server:
+            self.api_server.stop()
+            self.api_server.wait(2000)
+            self.api_server = None
+        if not self.settings.data.get('api_enabled', False):
+            return
+        self.api_server = ControlApiServer(self.job_scheduler, self.settings.data.get('api_host', '127.0.0.1'),
+                                           self.settings.data.get('api_port', API_DEFAULT_PORT),
+                                           self.settings.api_token(), self.settings.data.get('api_allowed_origin', ''))
+        self.api_server.listening.connect(
+            lambda host, port: self.statusBar().showMessage(f"🌐 Control API listening on {host}:{port}", 5000))
+        self.api_server.error.connect(lambda message: self.statusBar().showMessage(f"❌ {message}", 10000))
+        self.api_server.start()
+
     def create_status_bar(self):
         status = self.statusBar()
         status.setStyleSheet("""
@@ -3360,6 +9432,8 @@ class MainWindow(QMainWindow):
         QShortcut("Ctrl+F", self, lambda: self.switch_page(1))
         QShortcut("Ctrl+B", self, lambda: self.switch_page(2))
         QShortcut("Ctrl+M", self, lambda: self.switch_page(3))
+        QShortcut("Ctrl+J", self, lambda: self.switch_page(4))
+        QShortcut("Ctrl+P", self, lambda: self.switch_page(5))
 
     def switch_page(self, index):
         self.sidebar_stack.setCurrentIndex(index)
@@ -3382,6 +9456,7 @@ class MainWindow(QMainWindow):
         if file_path:
             dest = os.path.join(FIRMWARE_DIR, os.path.basename(file_path))
             shutil.copy2(file_path, dest)
+            CompressedFirmwareCache.prefetch([dest], self.settings.data.get('compression_level', 9))
             QMessageBox.information(self, "Import Complete", f"Firmware imported to:\n{dest}")
 
     def open_batch_flash(self):
@@ -3465,6 +9540,13 @@ class MainWindow(QMainWindow):
         """)
         msg.exec()
 
+    def nativeEvent(self, event_type, message):
+        # Windows broadcasts WM_DEVICECHANGE to top-level windows whenever a device node comes or goes
+        if os.name == 'nt' and bytes(event_type) == b"windows_generic_MSG" and hasattr(self, 'device_registry'):
+            if ctypes.wintypes.MSG.from_address(int(message)).message == WM_DEVICECHANGE:
+                self.device_registry.schedule_scan()
+        return super().nativeEvent(event_type, message)
+
     def closeEvent(self, event):
         print("\n" + "="*60)
         print("CLOSING APPLICATION - CLEANING UP ALL THREADS")
@@ -3488,6 +9570,14 @@ class MainWindow(QMainWindow):
                 print("   - Serial page cleanup")
                 self.serial_page.cleanup()
             
+            if self.api_server:
+                print("   - Control API shutdown")
+                self.api_server.stop()
+                self.api_server.wait(2000)
+            self.production_line.stop()
+            self.job_scheduler.shutdown()
+            CompressedFirmwareCache.shutdown()
+
             print("\n2. Stopping main window timers...")
             if hasattr(self, 'memory_timer'):
                 self.memory_timer.stop()
@@ -3505,6 +9595,452 @@ class MainWindow(QMainWindow):
         event.accept()
 
 
+class CliError(Exception):
+    def __init__(self, message, exit_code=EXIT_FAILED):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+class HeadlessRunner:
+    def __init__(self, args):
+        self.args = args
+        # esptool chatters on stdout, which is reserved for the JSON lines
+        self.out = sys.stdout
+        self.settings = SettingsManager()
+        self.history_manager = HistoryManager()
+        self.device_store = DeviceIdentityStore()
+        self.provisioning_ledger = ProvisioningLedger()
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(event=event, time=round(time.time(), 3), **fields), default=str)
+        with self.lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def watch(self, thread, **slots):
+        # No event loop here: slots run directly on the worker thread, so emit() has to stay thread-safe
+        outcome = []
+        for name, slot in slots.items():
+            getattr(thread, name).connect(slot, Qt.ConnectionType.DirectConnection)
+        thread.finished.connect(lambda *result: outcome.extend(result), Qt.ConnectionType.DirectConnection)
+        return outcome
+
+    def run_jobs(self, jobs, limit=1):
+        # A job is a generator yielding worker threads; they are all created, started and joined from
+        # the main thread, which Qt needs and which keeps Ctrl+C working
+        waiting = deque(jobs)
+        running = {}
+        results = {}
+        try:
+            while waiting or running:
+                while waiting and len(running) < limit:
+                    self.advance(waiting.popleft(), running, results)
+                for job, thread in list(running.items()):
+                    if thread.isFinished():
+                        del running[job]
+                        self.advance(job, running, results)
+                if running:
+                    next(iter(running.values())).wait(50)
+        finally:
+            for thread in running.values():
+                thread.stop()
+            for thread in running.values():
+                thread.wait(5000)
+        return [results.get(job) for job in jobs]
+
+    def advance(self, job, running, results):
+        try:
+            thread = next(job)
+        except StopIteration as e:
+            results[job] = e.value
+            return
+        running[job] = thread
+        thread.start()
+
+    def run_thread(self, thread, **slots):
+        outcome = self.watch(thread, **slots)
+        self.run_jobs([iter([thread])])
+        return outcome or None
+
+    def flash_options(self):
+        args = self.args
+        options = {
+            'chip': self.settings.data.get('chip_type', 'auto'),
+            'baudrate': self.settings.data.get('baudrate', DEFAULT_BAUDRATE),
+            'address': self.settings.data.get('flash_address', DEFAULT_FLASH_ADDRESS),
+            'erase': False,
+            'ota': False,
+            'verify': self.settings.data.get('verify_after_flash', True),
+            'backup': False,
+            'firmware': None,
+            'images': None,
+        }
+        if args.template:
+            template_path = os.path.join(TEMPLATES_DIR, f"{args.template}.json")
+            if not os.path.exists(template_path):
+                raise CliError(f"Template not found: {args.template}", EXIT_USAGE)
+            with open(template_path, 'r') as f:
+                template = json.load(f)
+            options.update({key: template[key] for key in ('chip', 'address', 'erase', 'ota', 'verify', 'backup', 'firmware')
+                            if key in template})
+            if 'baudrate' in template:
+                options['baudrate'] = int(template['baudrate'])
+            if template.get('images') and args.firmware is None:
+                options['images'] = template_images(template)
+                options['address'], options['firmware'] = max(options['images'], key=lambda image: os.path.getsize(image[1])
+                                                              if os.path.exists(image[1]) else 0)
+        for key in ('chip', 'baudrate', 'address', 'firmware'):
+            if getattr(args, key) is not None:
+                options[key] = getattr(args, key)
+        options['erase'] = options['erase'] or args.erase
+        options['ota'] = options['ota'] or args.ota
+        options['verify'] = options['verify'] and not args.no_verify
+        options['backup'] = options['backup'] or args.backup
+        if not options['firmware']:
+            raise CliError("No firmware given (use --firmware or a template that names one)", EXIT_USAGE)
+        for _, path in options['images'] or [(options['address'], options['firmware'])]:
+            if not os.path.exists(path):
+                raise CliError(f"Firmware file not found: {path}", EXIT_USAGE)
+        return options
+
+    def known_port(self, port):
+        # Network ports (rfc2217://, socket://) cannot be listed, so they are taken on trust
+        return '://' in port or os.path.exists(port) or any(p.device == port for p in serial.tools.list_ports.comports())
+
+    def detect_boards(self):
+        thread = DetectBoardsThread(self.device_store)
+        errors = []
+        outcome = self.run_thread(thread,
+                                  progress=lambda message: self.emit('progress', stage='detect', message=message),
+                                  error=errors.append)
+        if errors:
+            self.emit('error', message=errors[0])
+        return outcome[0] if outcome else []
+
+    def resolve_ports(self):
+        args = self.args
+        ports = getattr(args, 'ports', None) or ([args.port] if getattr(args, 'port', None) else [])
+        if ports:
+            missing = [port for port in ports if not self.known_port(port)]
+            if missing:
+                raise CliError(f"Port not found: {', '.join(missing)}", EXIT_NO_DEVICE)
+            return ports
+        boards = [board for board in self.detect_boards() if board['status'] == 'detected']
+        if not boards:
+            raise CliError("No ESP board detected", EXIT_NO_DEVICE)
+        if len(boards) > 1 and not getattr(args, 'all', False):
+            raise CliError(f"{len(boards)} boards detected, choose one with --port: "
+                           + ", ".join(board['port'] for board in boards), EXIT_USAGE)
+        return [board['port'] for board in boards]
+
+    def flash_job(self, port, options, md5):
+        started = time.time()
+        speeds = []
+        progress = lambda stage: lambda percent, message: self.emit('progress', stage=stage, port=port,
+                                                                   percent=percent, message=message)
+        backup_path = None
+        if options['backup']:
+            size = self.settings.data.get('backup_size', 4194304)
+            thread = BackupThread(options['chip'], port, options['baudrate'], size, self.settings.data['backup_dir'])
+            outcome = self.watch(thread, progress=progress('backup'))
+            yield thread
+            if not outcome or not outcome[0]:
+                message = outcome[1] if outcome else "Backup cancelled"
+                self.emit('result', command='flash', port=port, ok=False, stage='backup', message=message)
+                return False
+            backup_path = outcome[2]
+
+        thread = FlashThread(options['chip'], port, options['baudrate'], options['firmware'], options['address'],
+                             options['erase'], options['ota'], options['verify'], options['images'],
+                             self.settings.data.get('compression_level', 9))
+        outcome = self.watch(thread, progress=progress('flash'), speed=speeds.append)
+        yield thread
+        success = bool(outcome and outcome[0])
+        message = outcome[1] if outcome else "Flash cancelled"
+        if success:
+            self.history_manager.add_entry({
+                'timestamp': datetime.datetime.now().isoformat(),
+                'port': port,
+                'chip': options['chip'],
+                'firmware': options['firmware'],
+                'address': options['address'],
+                'status': 'success'
+            })
+            self.device_store.record_flash(thread.mac, md5, options['baudrate'])
+        self.emit('result', command='flash', port=port, ok=success, message=message, backup=backup_path,
+                  firmware_md5=md5, bytes_per_s=round(speeds[-1]) if speeds else None,
+                  elapsed=round(time.time() - started, 3))
+        return success
+
+    def cmd_detect(self):
+        boards = self.detect_boards()
+        for board in boards:
+            self.emit('board', **{key: value for key, value in board.items() if key != 'record'})
+        found = sum(1 for board in boards if board['status'] == 'detected')
+        self.emit('result', command='detect', ok=found > 0, boards=found)
+        return EXIT_OK if found else EXIT_NO_DEVICE
+
+    def cmd_flash(self):
+        options = self.flash_options()
+        port = self.resolve_ports()[0]
+        md5 = FirmwareInfo(options['firmware']).md5
+        success, = self.run_jobs([self.flash_job(port, options, md5)])
+        return EXIT_OK if success else EXIT_FAILED
+
+    def cmd_batch(self):
+        options = self.flash_options()
+        ports = self.resolve_ports()
+        md5 = FirmwareInfo(options['firmware']).md5
+        results = self.run_jobs([self.flash_job(port, options, md5) for port in ports], max(1, self.args.jobs))
+        failed = [port for port, ok in zip(ports, results) if not ok]
+        self.emit('summary', command='batch', total=len(ports), succeeded=len(ports) - len(failed), failed=failed)
+        return EXIT_OK if not failed else EXIT_FAILED
+
+    def cmd_backup(self):
+        args = self.args
+        port = self.resolve_ports()[0]
+        chip = args.chip or self.settings.data.get('chip_type', 'auto')
+        baudrate = args.baudrate or self.settings.data.get('baudrate', DEFAULT_BAUDRATE)
+        size = args.size or self.settings.data.get('backup_size', 4194304)
+        backup_dir = args.output or self.settings.data['backup_dir']
+        os.makedirs(backup_dir, exist_ok=True)
+        thread = BackupThread(chip, port, baudrate, size, backup_dir)
+        outcome = self.run_thread(thread, progress=lambda percent, message: self.emit(
+            'progress', stage='backup', port=port, percent=percent, message=message))
+        success = bool(outcome and outcome[0])
+        self.emit('result', command='backup', port=port, ok=success,
+                  message=outcome[1] if outcome else "Backup cancelled", path=outcome[2] if success else None)
+        return EXIT_OK if success else EXIT_FAILED
+
+    def cmd_monitor(self):
+        args = self.args
+        port = self.resolve_ports()[0]
+        baudrate = args.baudrate or self.settings.data.get('serial_baudrate', 115200)
+        until = re.compile(args.until) if args.until else None
+        thread = SerialMonitorThread(port, baudrate, auto_reconnect=args.reconnect)
+        assembler = LineAssembler()
+        matched = []
+        errors = []
+
+        def on_data(data, marks):
+            for timestamp_ns, raw in assembler.feed(data, marks):
+                text = raw.rstrip(b'\r').decode('utf-8', errors='replace')
+                self.emit('line', port=port, text=text,
+                          timestamp=round((timestamp_ns + thread.wall_offset_ns) / 1e9, 6))
+                if until and not matched and until.search(text):
+                    matched.append(text)
+                    thread.stop()
+
+        thread.data_received.connect(on_data, Qt.ConnectionType.DirectConnection)
+        thread.error.connect(errors.append, Qt.ConnectionType.DirectConnection)
+        thread.connection_lost.connect(lambda message: self.emit('disconnected', port=port, message=message),
+                                       Qt.ConnectionType.DirectConnection)
+        thread.reconnected.connect(lambda device: self.emit('reconnected', port=device),
+                                   Qt.ConnectionType.DirectConnection)
+        if args.capture:
+            thread.recorder = SessionRecorder(args.capture, baudrate)
+        deadline = time.monotonic() + args.duration if args.duration else None
+        thread.start()
+        if args.send:
+            thread.write(args.send.encode('utf-8').decode('unicode_escape').encode('latin-1'))
+        try:
+            while not thread.wait(100):
+                if deadline and time.monotonic() >= deadline:
+                    thread.stop()
+        finally:
+            if not thread.isFinished():
+                thread.stop()
+                thread.wait(5000)
+            if thread.recorder:
+                thread.recorder.close()
+
+        if errors and not matched:
+            self.emit('result', command='monitor', port=port, ok=False, message=errors[-1])
+            return EXIT_FAILED
+        if until:
+            self.emit('result', command='monitor', port=port, ok=bool(matched), match=matched[0] if matched else None,
+                      message="Pattern matched" if matched else "Timed out waiting for pattern")
+            return EXIT_OK if matched else EXIT_FAILED
+        self.emit('result', command='monitor', port=port, ok=True, message="Monitor stopped")
+        return EXIT_OK
+
+    def log_api_event(self, event):
+        if event['event'] != 'progress' or self.args.verbose:
+            self.emit(event['event'], **{key: value for key, value in event.items() if key != 'event'})
+
+    def cmd_serve(self):
+        args = self.args
+        app = QCoreApplication.instance()
+        jobs = JobScheduler(self)
+        jobs.listeners.append(self.log_api_event)
+        if not args.token and not self.settings.data.get('api_token'):
+            self.emit('api_token', token=self.settings.api_token(), message="Generated an API token and saved it to the settings")
+        server = ControlApiServer(jobs, args.host or self.settings.data.get('api_host', '127.0.0.1'),
+                                  self.settings.data.get('api_port', API_DEFAULT_PORT) if args.port is None else args.port,
+                                  args.token or self.settings.api_token(),
+                                  self.settings.data.get('api_allowed_origin', '') if args.origin is None else args.origin)
+        errors = []
+        server.listening.connect(lambda host, port: self.emit('listening', host=host, port=port))
+        server.error.connect(lambda message: (errors.append(message), app.quit()))
+        server.start()
+        if args.scan:
+            jobs.scan()
+
+        # Python only sees Ctrl+C when it gets control back, so the event loop is woken regularly
+        previous = signal.signal(signal.SIGINT, lambda *_: app.quit())
+        ticker = QTimer()
+        ticker.timeout.connect(lambda: None)
+        ticker.start(200)
+        try:
+            app.exec()
+        finally:
+            ticker.stop()
+            signal.signal(signal.SIGINT, previous)
+            server.stop()
+            server.wait(2000)
+            jobs.shutdown()
+        if errors:
+            self.emit('result', command='serve', ok=False, message=errors[0])
+            return EXIT_FAILED
+        self.emit('result', command='serve', ok=True, message="Server stopped")
+        return EXIT_OK
+
+    def log_station(self, station):
+        # Every step change and the outcome; per-line progress only with --verbose
+        key = (station['unit'], station['step'], station['status'])
+        if self.args.verbose or key not in self.station_keys:
+            self.station_keys.add(key)
+            self.emit('station', **{key: value for key, value in station.items() if key != 'gone'})
+
+    def cmd_production(self):
+        args = self.args
+        try:
+            ProductionLine.load_template(args.template)
+        except ValueError as e:
+            raise CliError(str(e), EXIT_USAGE)
+        app = QCoreApplication.instance()
+        registry = DeviceRegistry()
+        jobs = JobScheduler(self)
+        line = ProductionLine(jobs, registry)
+        self.station_keys = set()
+        line.station_changed.connect(self.log_station)
+
+        def on_stats(stats):
+            self.emit('stats', **stats)
+            if args.units and stats['passed'] + stats['failed'] >= args.units and not stats['running']:
+                app.quit()
+
+        line.stats_changed.connect(on_stats)
+        line.start(args.template)
+        self.emit('ready', template=args.template, pipeline=[step['kind'] for step in line.pipeline()],
+                  ports=sorted(registry.ports))
+
+        previous = signal.signal(signal.SIGINT, lambda *_: app.quit())
+        ticker = QTimer()
+        ticker.timeout.connect(lambda: None)
+        ticker.start(200)
+        try:
+            app.exec()
+        finally:
+            ticker.stop()
+            signal.signal(signal.SIGINT, previous)
+            line.stop()
+            jobs.shutdown()
+        stats = line.stats()
+        self.emit('result', command='production', ok=stats['failed'] == 0, passed=stats['passed'], failed=stats['failed'],
+                  units_per_hour=round(stats['units_per_hour'], 1))
+        return EXIT_OK if stats['failed'] == 0 else EXIT_FAILED
+
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(prog="ESP_Flasher_Pro.py",
+                                     description=f"{APP_NAME} v{VERSION} headless mode (JSON lines on stdout)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('detect', help="Detect connected ESP boards")
+
+    def flash_arguments(command):
+        command.add_argument('--firmware', help="Firmware .bin file")
+        command.add_argument('--template', help="Saved flash template to start from")
+        command.add_argument('--chip', help="Chip type (default: settings, usually auto)")
+        command.add_argument('--baud', dest='baudrate', type=int, help="Flash baud rate")
+        command.add_argument('--address', help="Flash address (default: settings)")
+        command.add_argument('--erase', action='store_true', help="Erase the whole flash first")
+        command.add_argument('--ota', action='store_true', help="OTA mode (dio, detected flash size)")
+        command.add_argument('--no-verify', action='store_true', help="Skip verification after writing")
+        command.add_argument('--backup', action='store_true', help="Back up the flash before writing")
+
+    flash = commands.add_parser('flash', help="Flash one board")
+    flash.add_argument('--port', help="Serial port (default: the only detected board)")
+    flash_arguments(flash)
+
+    batch = commands.add_parser('batch', help="Flash several boards in parallel")
+    targets = batch.add_mutually_exclusive_group(required=True)
+    targets.add_argument('--ports', nargs='+', help="Serial ports to flash")
+    targets.add_argument('--all', action='store_true', help="Flash every detected board")
+    batch.add_argument('--jobs', type=int, default=4, help="Boards flashed at the same time (default: 4)")
+    flash_arguments(batch)
+
+    backup = commands.add_parser('backup', help="Read the flash of one board to a file")
+    backup.add_argument('--port', help="Serial port (default: the only detected board)")
+    backup.add_argument('--chip', help="Chip type (default: settings, usually auto)")
+    backup.add_argument('--baud', dest='baudrate', type=int, help="Baud rate")
+    backup.add_argument('--size', type=lambda value: int(value, 0), help="Bytes to read (default: settings)")
+    backup.add_argument('--output', help="Backup directory (default: settings)")
+
+    monitor = commands.add_parser('monitor', help="Print serial output as JSON lines")
+    monitor.add_argument('--port', help="Serial port (default: the only detected board)")
+    monitor.add_argument('--baud', dest='baudrate', type=int, help="Baud rate (default: settings)")
+    monitor.add_argument('--duration', type=float, help="Stop after this many seconds")
+    monitor.add_argument('--until', help="Stop with success once a line matches this regex")
+    monitor.add_argument('--send', help="Text to send once the port is open (escapes like \\r\\n allowed)")
+    monitor.add_argument('--capture', help="Also record the raw session (.espcap keeps timing)")
+    monitor.add_argument('--reconnect', action='store_true', help="Wait for the board to come back if it drops")
+
+    serve = commands.add_parser('serve', help="Run the HTTP/WebSocket control API until interrupted")
+    serve.add_argument('--host', help="Listen address (default: settings, usually 127.0.0.1)")
+    serve.add_argument('--port', type=int, help=f"Listen port (default: settings, usually {API_DEFAULT_PORT})")
+    serve.add_argument('--token', help="Require this bearer token (default: settings, generated if unset)")
+    serve.add_argument('--origin', help="Browser origin allowed to call the API (default: settings, none)")
+    serve.add_argument('--scan', action='store_true', help="Detect boards once at startup")
+    serve.add_argument('--verbose', action='store_true', help="Also print per-line job progress")
+
+    production = commands.add_parser('production', help="Flash and test every board plugged in, until interrupted")
+    production.add_argument('--template', required=True, help="Saved template that defines the pipeline")
+    production.add_argument('--units', type=int, help="Stop after this many boards are done")
+    production.add_argument('--verbose', action='store_true', help="Also print per-line station progress")
+    return parser
+
+
+def run_cli(argv):
+    parser = build_cli_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+
+    # The worker threads are QThreads, which only need a core application, never a display
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    app.setApplicationName(APP_NAME)
+    app.setOrganizationName(COMPANY)
+    app.setApplicationVersion(VERSION)
+
+    runner = HeadlessRunner(args)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return getattr(runner, f"cmd_{args.command}")()
+    except KeyboardInterrupt:
+        runner.emit('result', command=args.command, ok=False, message="Interrupted")
+        return EXIT_INTERRUPTED
+    except CliError as e:
+        runner.emit('result', command=args.command, ok=False, message=str(e))
+        return e.exit_code
+    except Exception as e:
+        runner.emit('result', command=args.command, ok=False, message=f"Fatal error: {e}")
+        return EXIT_FAILED
+
+
 def main():
     app = QApplication(sys.argv)
     app.setApplicationName(APP_NAME)
@@ -3548,6 +10084,11 @@ def main():
 
 
 if __name__ == "__main__":
+    # Frozen builds re-launch this executable for the firmware compression workers
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        sys.exit(run_cli(sys.argv[1:]))
+
     print(f"""
     ╔═══════════════════════════════════════════════════════════╗
     ║                                                           ║
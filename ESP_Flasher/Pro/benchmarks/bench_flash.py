@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Flash, backup and detect timings of ESP Flasher Pro's own worker threads (FlashThread, BackupThread,
+# ChipCheckThread) against emulated ESP32 bootloaders, see esp_emulator.py. Every combination of image
+# size, baud rate and concurrency is run --repeat times and written to a JSON file that --compare
+# lines up against a run from another version.
+#
+#   python bench_flash.py --output after.json --compare before.json
+#   python bench_flash.py --load after.json --compare before.json
+#
+# The app runs headless with a throwaway data folder, so settings and caches are left alone. POSIX only.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+BENCHMARKS = ("flash", "flash_cold", "backup", "detect")
+FLASH_ADDRESS = 0x10000
+
+
+def image_bytes(size, seed) -> bytes:
+    # Roughly what an application image looks like to zlib: code and data that compress about 2:1
+    rng = random.Random(seed)
+    chunks = []
+    while sum(map(len, chunks)) < size:
+        length = rng.randrange(256, 4096)
+        chunks.append(rng.getrandbits(length * 8).to_bytes(length, 'little'))
+        chunks.append(bytes(rng.randrange(0, 4096)))
+    return b''.join(chunks)[:size]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class EmulatorPool:
+    # One emulator process per board, so the emulators never compete with the workers for the GIL
+    def __init__(self, count, throttle):
+        self.processes = []
+        self.devices = []
+        for index in range(count):
+            cmd = [sys.executable, os.path.join(BENCH_DIR, 'esp_emulator.py'), '--mac', f'24:0a:c4:00:00:{index + 1:02x}']
+            if not throttle:
+                cmd.append('--no-throttle')
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            self.processes.append(process)
+            self.devices.append(process.stdout.readline().strip())
+
+    def close(self):
+        for process in self.processes:
+            process.stdin.close()
+            process.wait(5)
+
+
+class Bench:
+    def __init__(self, app, args, work_dir):
+        self.app = app
+        self.args = args
+        self.work_dir = work_dir
+        self.emulators = EmulatorPool(max(args.concurrency), not args.no_throttle)
+        self.results = []
+        self.seed = 0
+
+    def run_threads(self, threads):
+        # Worker slots run on the worker threads themselves; there is no event loop to deliver them
+        outcomes = [[] for _ in threads]
+        for thread, outcome in zip(threads, outcomes):
+            thread.finished.connect(lambda *result, outcome=outcome: outcome.extend(result),
+                                    self.app.Qt.ConnectionType.DirectConnection)
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.wait()
+        elapsed = time.perf_counter() - start
+        failures = [outcome[1] if outcome else "no result" for outcome in outcomes if not outcome or not outcome[0]]
+        return elapsed, failures
+
+    def new_image(self, size):
+        self.seed += 1
+        path = os.path.join(self.work_dir, f"image_{size}_{self.seed}.bin")
+        with open(path, 'wb') as f:
+            f.write(image_bytes(size, self.seed))
+        return path
+
+    def measure(self, benchmark, size, baudrate, concurrency, make_threads, prepare=None):
+        runs, failures = [], []
+        for _ in range(self.args.repeat):
+            if prepare:
+                prepare()
+            elapsed, failed = self.run_threads(make_threads())
+            runs.append(elapsed)
+            failures.extend(failed)
+        median = statistics.median(runs)
+        result = {
+            'benchmark': benchmark,
+            'size_kb': size // 1024 if size else None,
+            'baudrate': baudrate,
+            'concurrency': concurrency,
+            'runs_s': [round(run, 4) for run in runs],
+            'median_s': round(median, 4),
+            'min_s': round(min(runs), 4),
+            'max_s': round(max(runs), 4),
+            'kbytes_per_s': round(size * concurrency / 1024 / median, 1) if size else None,
+            'ok': not failures,
+            'errors': sorted(set(failures))[:5],
+        }
+        self.results.append(result)
+        print(f"{benchmark:<11} {result['size_kb'] or '-':>6} KB {baudrate:>8} bd  x{concurrency:<3} "
+              f"median {median:8.3f}s  {result['kbytes_per_s'] or '':>8} KB/s  {'ok' if result['ok'] else 'FAILED'}",
+              flush=True)
+
+    def flash(self, size, baudrate, concurrency):
+        app = self.app
+        path = self.new_image(size)
+        level = app.SettingsManager().data.get('compression_level', 9)
+
+        def warm():
+            app.CompressedFirmwareCache.release(app.CompressedFirmwareCache.load(path, level))
+
+        if 'flash' in self.args.benchmarks:
+            self.measure('flash', size, baudrate, concurrency, lambda: [
+                app.FlashThread('auto', device, baudrate, path, hex(FLASH_ADDRESS), compression_level=level)
+                for device in self.emulators.devices[:concurrency]], prepare=warm)
+        if 'flash_cold' not in self.args.benchmarks:
+            return
+
+        # A never-seen image every run: compression happens on the flash workers, as for a first flash
+        cold = []
+        self.measure('flash_cold', size, baudrate, concurrency, lambda: [
+            app.FlashThread('auto', device, baudrate, cold[-1], hex(FLASH_ADDRESS), compression_level=level)
+            for device in self.emulators.devices[:concurrency]], prepare=lambda: cold.append(self.new_image(size)))
+
+    def backup(self, size, baudrate, concurrency):
+        backup_dir = os.path.join(self.work_dir, 'backups')
+        os.makedirs(backup_dir, exist_ok=True)
+        self.measure('backup', size, baudrate, concurrency, lambda: [
+            self.app.BackupThread('auto', device, baudrate, size, backup_dir)
+            for device in self.emulators.devices[:concurrency]])
+
+    def detect(self, concurrency):
+        self.measure('detect', 0, self.app.ESP_ROM_BAUDRATE, concurrency, lambda: [
+            self.app.ChipCheckThread('auto', device, attempts=1) for device in self.emulators.devices[:concurrency]])
+
+    def run(self):
+        args = self.args
+        try:
+            for concurrency in args.concurrency:
+                if 'detect' in args.benchmarks:
+                    self.detect(concurrency)
+                for size in args.sizes:
+                    for baudrate in args.bauds:
+                        if 'flash' in args.benchmarks or 'flash_cold' in args.benchmarks:
+                            self.flash(size * 1024, baudrate, concurrency)
+                        if 'backup' in args.benchmarks:
+                            self.backup(size * 1024, baudrate, concurrency)
+        finally:
+            self.emulators.close()
+        return self.results
+
+
+def result_key(result):
+    return result['benchmark'], result['size_kb'], result['baudrate'], result['concurrency']
+
+
+def compare(baseline, current):
+    before = {result_key(result): result for result in baseline['results']}
+    print(f"\nBaseline {baseline.get('app_version')} {baseline.get('git_commit') or ''}, "
+          f"current {current.get('app_version')} {current.get('git_commit') or ''} (median times)")
+    print(f"{'benchmark':<11} {'size':>7} {'baud':>8} {'jobs':>4} {'before':>9} {'after':>9} {'change':>8}")
+    for result in current['results']:
+        old = before.get(result_key(result))
+        if not old:
+            continue
+        change = (result['median_s'] - old['median_s']) / old['median_s'] * 100 if old['median_s'] else 0.0
+        print(f"{result['benchmark']:<11} {result['size_kb'] or '-':>4} KB {result['baudrate']:>8} {result['concurrency']:>4} "
+              f"{old['median_s']:>8.3f}s {result['median_s']:>8.3f}s {change:>+7.1f}%")
+
+
+def number_list(text):
+    return [int(value) for value in text.split(',') if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flash/backup/detect benchmark against emulated ESP32 bootloaders")
+    parser.add_argument('--sizes', type=number_list, default=[256, 1024], help="Image sizes in KB (default: 256,1024)")
+    parser.add_argument('--bauds', type=number_list, default=[460800, 921600], help="Baud rates (default: 460800,921600)")
+    parser.add_argument('--concurrency', type=number_list, default=[1, 4], help="Boards flashed at once (default: 1,4)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per combination; the median is reported")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help=f"Subset of {','.join(BENCHMARKS)}")
+    parser.add_argument('--no-throttle', action='store_true', help="Do not limit the emulated UART to the baud rate")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--load', help="Compare a saved results file instead of running")
+    parser.add_argument('--compare', help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+    args.benchmarks = [name for name in args.benchmarks.split(',') if name]
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    if args.load:
+        with open(args.load, 'r') as f:
+            report = json.load(f)
+    else:
+        report = run_benchmarks(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=4)
+            print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), report)
+    return 0 if all(result['ok'] for result in report['results']) else 1
+
+
+def run_benchmarks(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix='esp_flasher_bench_')
+    # The app module reads these at import time
+    os.environ['APPDATA'] = os.path.join(work_dir, 'appdata')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, APP_DIR)
+    import ESP_Flasher_Pro as app
+    import esptool
+    from esptool.logger import log
+    # FlashThread and ChipCheckThread drive esptool in-process; keep its console output out of the report
+    log.set_verbosity('silent')
+    # QThread signals need a core application, never a display
+    app.QCoreApplication.instance() or app.QCoreApplication(sys.argv[:1])
+
+    started = datetime.datetime.now().isoformat()
+    try:
+        results = Bench(app, args, work_dir).run()
+    finally:
+        app.CompressedFirmwareCache.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'app_version': app.VERSION,
+        'git_commit': git_commit(),
+        'esptool_version': esptool.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': started,
+        'throttled': not args.no_throttle,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    sys.exit(main())
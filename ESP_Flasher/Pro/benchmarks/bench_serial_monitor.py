@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Throughput and GUI latency of the Serial Monitor page (SerialPage) at high data rates. A synthetic
+# log stream (log_stream.py) feeds the page's own SerialMonitorThread through a pty, for each
+# combination of wire rate and line length, and the run records:
+#
+#   dropped bytes       written by the "device" but never shown, split into overrun (the pty was
+#                       full because the reader fell behind) and lost (read but never reached the page)
+#   latency             reader-to-screen (read by the thread until the console holds the text) and
+#                       stream-to-screen (line written until it is on screen), as percentiles
+#   event loop stalls   gaps in a fast GUI-thread timer; time beyond STALL_MS counts as stalled
+#   memory              resident set size sampled over the run
+#
+#   python bench_serial_monitor.py --output after.json --compare before.json
+#   python bench_serial_monitor.py --load after.json --compare before.json
+#
+# The window runs on the offscreen Qt platform with a throwaway data folder. POSIX only.
+
+import argparse
+import collections
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_flash import APP_DIR, BENCH_DIR, git_commit, number_list
+
+PROBE_INTERVAL_MS = 5
+STALL_MS = 50
+MEMORY_SAMPLE_MS = 500
+SETTLE_S = 0.5
+DRAIN_S = 3.0
+SERIAL_PAGE = 3
+
+
+def rss_mb():
+    # Current resident set size on Linux; elsewhere the peak is the best getrusage offers
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def percentiles(values, points=(50, 90, 99)) -> dict:
+    # Nearest rank, like LineTimingStats in the app
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    summary = {f"p{p}": round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)], 3) for p in points}
+    summary['max'] = round(ordered[-1], 3)
+    return summary
+
+
+def line_stamp(data: bytes):
+    # Send time of the last complete line in a read, or None if no intact stamp is in it
+    end = data.rfind(b'\n')
+    marker = data.rfind(b' t=', 0, end) if end >= 0 else -1
+    digits = data[marker + 3:marker + 22] if marker >= 0 else b''
+    return int(digits) if len(digits) == 19 and digits.isdigit() else None
+
+
+class LogStreamProcess:
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, 'log_stream.py')],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.device = self.process.stdout.readline().strip()
+        self.result = None
+
+    def start(self, rate, line_length, duration):
+        # The answer only comes once the stream ends; it is collected off the GUI thread
+        self.result = None
+        self.process.stdin.write(f"{rate} {line_length} {duration}\n")
+        self.process.stdin.flush()
+        threading.Thread(target=self.collect, daemon=True).start()
+
+    def collect(self):
+        self.result = json.loads(self.process.stdout.readline())
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(5)
+
+
+class LoopProbe:
+    # A timer that should fire every PROBE_INTERVAL_MS; any longer gap is time the GUI thread was busy
+    def __init__(self, app):
+        self.timer = app.QTimer()
+        self.timer.setTimerType(app.Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.gaps = []
+        self.last = None
+
+    def start(self):
+        self.gaps = []
+        self.last = time.perf_counter()
+        self.timer.start(PROBE_INTERVAL_MS)
+
+    def tick(self):
+        now = time.perf_counter()
+        self.gaps.append((now - self.last) * 1000)
+        self.last = now
+
+    def stop(self, elapsed):
+        self.timer.stop()
+        stalled = sum(gap - PROBE_INTERVAL_MS for gap in self.gaps if gap >= STALL_MS) / 1000
+        return {
+            'loop_gap_ms': percentiles(self.gaps, (50, 99)),
+            'stall_s': round(stalled, 3),
+            'stall_pct': round(stalled / elapsed * 100, 1) if elapsed else 0.0,
+        }
+
+
+class MemoryProbe:
+    def __init__(self, app):
+        self.timer = app.QTimer()
+        self.timer.timeout.connect(self.sample)
+        self.samples = []
+        self.started = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.samples = []
+        self.sample()
+        self.timer.start(MEMORY_SAMPLE_MS)
+
+    def sample(self):
+        self.samples.append([round(time.perf_counter() - self.started, 2), round(rss_mb(), 1)])
+
+    def stop(self):
+        self.timer.stop()
+        self.sample()
+        values = [mb for _, mb in self.samples]
+        return {
+            'rss_start_mb': values[0],
+            'rss_peak_mb': max(values),
+            'rss_end_mb': values[-1],
+            'rss_growth_mb': round(values[-1] - values[0], 1),
+            'memory_mb': self.samples,
+        }
+
+
+class Bench:
+    def __init__(self, app, qt_app, args):
+        self.app = app
+        self.qt_app = qt_app
+        self.args = args
+        self.results = []
+        self.stream = LogStreamProcess()
+        with contextlib.redirect_stdout(sys.stderr):
+            self.window = app.MainWindow()
+        self.window.show()
+        self.window.switch_page(SERIAL_PAGE)
+        self.page = self.window.serial_page
+        self.loop_probe = LoopProbe(app)
+        self.memory_probe = MemoryProbe(app)
+        self.thread_class = self.monitor_thread_class()
+        self.thread = None
+        self.reader_latency = []
+        self.line_latency = []
+        self.last_delivery = 0.0
+
+        # Wraps the page's slot; start_monitor_thread looks it up when it connects the thread
+        show = self.page.on_data_received
+
+        def on_data_received(data, marks):
+            show(data, marks)
+            self.delivered(time.monotonic_ns())
+
+        self.page.on_data_received = on_data_received
+
+    def monitor_thread_class(self):
+        class BenchMonitorThread(self.app.SerialMonitorThread):
+            # Notes when each read happened; the page handles reads in order, so a FIFO pairs them up
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.reads = collections.deque()
+
+            def process(self, data: bytes, read_ns: int):
+                self.reads.append((read_ns, line_stamp(data)))
+                super().process(data, read_ns)
+
+        return BenchMonitorThread
+
+    def delivered(self, shown_ns):
+        read_ns, sent_ns = self.thread.reads.popleft()
+        self.reader_latency.append((shown_ns - read_ns) / 1e6)
+        if sent_ns:
+            self.line_latency.append((shown_ns - sent_ns) / 1e6)
+        self.last_delivery = time.perf_counter()
+
+    def run_until(self, condition):
+        loop = self.app.QEventLoop()
+        check = self.app.QTimer()
+        check.timeout.connect(lambda: condition() and loop.quit())
+        check.start(20)
+        loop.exec()
+        check.stop()
+
+    def reset_page(self, timestamps):
+        page = self.page
+        question = self.app.QMessageBox.question
+        self.app.QMessageBox.question = lambda *args, **kwargs: self.app.QMessageBox.StandardButton.Yes
+        try:
+            page.clear_console()
+        finally:
+            self.app.QMessageBox.question = question
+        page.timestamp_check.setChecked(timestamps)
+        page.autoscroll_check.setChecked(True)
+
+    def measure(self, baudrate, line_length, timestamps):
+        args = self.args
+        page = self.page
+        self.reset_page(timestamps)
+        self.reader_latency = []
+        self.line_latency = []
+        errors = []
+        self.thread = self.thread_class(self.stream.device, baudrate)
+        self.thread.error.connect(errors.append)
+        page.start_monitor_thread(self.thread)
+        settle_until = time.perf_counter() + SETTLE_S
+        self.run_until(lambda: time.perf_counter() >= settle_until)
+
+        self.memory_probe.start()
+        self.loop_probe.start()
+        start = self.last_delivery = time.perf_counter()
+        self.stream.start(baudrate // 10, line_length, args.duration)
+
+        def drained():
+            result = self.stream.result
+            if result is None:
+                return False
+            return page.rx_bytes >= result['written'] or time.perf_counter() - self.last_delivery >= DRAIN_S
+
+        self.run_until(drained)
+        elapsed = time.perf_counter() - start
+        loop = self.loop_probe.stop(elapsed)
+        memory = self.memory_probe.stop()
+        page.disconnect_serial()
+
+        stream = self.stream.result
+        shown = page.rx_bytes
+        lost = max(stream['written'] - shown, 0)
+        busy = self.last_delivery - start
+        result = {
+            'baudrate': baudrate,
+            'line_length': line_length,
+            'timestamps': timestamps,
+            'duration_s': args.duration,
+            'offered_kbytes_per_s': round(baudrate / 10 / 1024, 1),
+            'shown_kbytes_per_s': round(shown / 1024 / busy, 1) if busy > 0 else 0.0,
+            'lines': stream['lines'],
+            'generated_bytes': stream['generated'],
+            'shown_bytes': shown,
+            'dropped_bytes': stream['generated'] - shown,
+            'overrun_bytes': stream['dropped'],
+            'lost_bytes': lost,
+            'reader_to_screen_ms': percentiles(self.reader_latency),
+            'stream_to_screen_ms': percentiles(self.line_latency),
+            **loop,
+            **memory,
+            'ok': not errors and not lost,
+            'errors': sorted(set(errors))[:5],
+        }
+        self.results.append(result)
+        latency = result['reader_to_screen_ms'].get('p99', 0.0)
+        print(f"{baudrate:>8} bd {line_length:>5} B {'ts' if timestamps else '':<2}  "
+              f"{result['shown_kbytes_per_s']:>7} KB/s  dropped {result['dropped_bytes']:>9,}  "
+              f"p99 {latency:>8.1f} ms  stalled {result['stall_s']:>6.2f}s  "
+              f"rss {result['rss_growth_mb']:>+6.1f} MB  {'ok' if result['ok'] else 'FAILED'}", flush=True)
+
+    def run(self):
+        args = self.args
+        try:
+            for timestamps in ([False, True] if args.timestamps else [False]):
+                for baudrate in args.bauds:
+                    for line_length in args.line_lengths:
+                        self.measure(baudrate, line_length, timestamps)
+        finally:
+            self.stream.close()
+            with contextlib.redirect_stdout(sys.stderr):
+                self.window.close()
+        return self.results
+
+
+def result_key(result):
+    return result['baudrate'], result['line_length'], result['timestamps']
+
+
+def compare(baseline, current):
+    before = {result_key(result): result for result in baseline['results']}
+    print(f"\nBaseline {baseline.get('app_version')} {baseline.get('git_commit') or ''}, "
+          f"current {current.get('app_version')} {current.get('git_commit') or ''}")
+    print(f"{'baud':>8} {'line':>5} {'ts':>2}  {'p99 before':>10} {'p99 after':>10}  {'stall before':>12} "
+          f"{'stall after':>11}  {'dropped before':>14} {'dropped after':>13}")
+    for result in current['results']:
+        old = before.get(result_key(result))
+        if not old:
+            continue
+        print(f"{result['baudrate']:>8} {result['line_length']:>5} {'ts' if result['timestamps'] else '':>2}  "
+              f"{old['reader_to_screen_ms'].get('p99', 0.0):>8.1f}ms {result['reader_to_screen_ms'].get('p99', 0.0):>8.1f}ms  "
+              f"{old['stall_s']:>11.2f}s {result['stall_s']:>10.2f}s  "
+              f"{old['dropped_bytes']:>14,} {result['dropped_bytes']:>13,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial Monitor throughput and GUI latency benchmark")
+    parser.add_argument('--bauds', type=number_list, default=[115200, 921600, 2000000],
+                        help="Wire rates to stream at, 10 bits per byte (default: 115200,921600,2000000)")
+    parser.add_argument('--line-lengths', type=number_list, default=[80, 400],
+                        help="Log line lengths in bytes (default: 80,400)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to stream per combination")
+    parser.add_argument('--timestamps', action='store_true', help="Also run every combination with line timestamps on")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--load', help="Compare a saved results file instead of running")
+    parser.add_argument('--compare', help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    if args.load:
+        with open(args.load, 'r') as f:
+            report = json.load(f)
+    else:
+        report = run_benchmarks(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=4)
+            print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), report)
+    return 0 if all(result['ok'] for result in report['results']) else 1
+
+
+def run_benchmarks(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix='esp_flasher_bench_')
+    # The app module reads these at import time
+    os.environ['APPDATA'] = os.path.join(work_dir, 'appdata')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, APP_DIR)
+    import ESP_Flasher_Pro as app
+    qt_app = app.QApplication.instance() or app.QApplication(sys.argv[:1])
+
+    started = datetime.datetime.now().isoformat()
+    try:
+        results = Bench(app, qt_app, args).run()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'app_version': app.VERSION,
+        'git_commit': git_commit(),
+        'qt_platform': qt_app.platformName(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': started,
+        'duration_s': args.duration,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Software ESP32 serial bootloader (ROM loader plus flasher stub) on a pty pair, for benchmarks.
+# Speaks the esptool SLIP protocol: sync, register access, RAM download (stub upload), flash
+# begin/data/end, compressed (deflate) flash, SPI flash MD5, read_flash and erase. The wire is
+# throttled to the current baud rate so timings follow a real UART.
+#
+#   python esp_emulator.py [--mac 24:0a:c4:00:00:01] [--flash-size 4194304] [--no-throttle]
+#
+# prints the pty device to connect to on the first line and runs until stdin is closed.
+# POSIX only (pty).
+
+import argparse
+import hashlib
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import tty
+import zlib
+
+ROM_BAUDRATE = 115200
+# What the ESP32 ROM answers to SYNC; the stub answers 0, which esptool takes as "stub already running"
+ROM_SYNC_VALUE = 0x20120707
+ESP32_MAGIC = 0x00F01D83
+EFUSE_MAC_REGS = (0x3FF5A004, 0x3FF5A008)
+SPI_CMD_REG = 0x3FF42000
+SPI_W0_REG = 0x3FF42080
+FLASH_JEDEC_IDS = {1024 * 1024: 0x1440EF, 2 * 1024 * 1024: 0x1540EF, 4 * 1024 * 1024: 0x1640EF,
+                   8 * 1024 * 1024: 0x1740EF, 16 * 1024 * 1024: 0x1840EF}
+SECTOR_SIZE = 0x1000
+
+FLASH_BEGIN = 0x02
+FLASH_DATA = 0x03
+FLASH_END = 0x04
+MEM_BEGIN = 0x05
+MEM_END = 0x06
+MEM_DATA = 0x07
+SYNC = 0x08
+WRITE_REG = 0x09
+READ_REG = 0x0A
+SPI_SET_PARAMS = 0x0B
+SPI_ATTACH = 0x0D
+READ_FLASH_SLOW = 0x0E
+CHANGE_BAUDRATE = 0x0F
+FLASH_DEFL_BEGIN = 0x10
+FLASH_DEFL_DATA = 0x11
+FLASH_DEFL_END = 0x12
+SPI_FLASH_MD5 = 0x13
+ERASE_FLASH = 0xD0
+ERASE_REGION = 0xD1
+READ_FLASH = 0xD2
+RUN_USER_CODE = 0xD3
+
+STATUS_INVALID_COMMAND = 0x05
+
+
+def slip_encode(packet: bytes) -> bytes:
+    return b'\xc0' + packet.replace(b'\xdb', b'\xdb\xdd').replace(b'\xc0', b'\xdb\xdc') + b'\xc0'
+
+
+def slip_decode(frame: bytes) -> bytes:
+    return frame.replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb')
+
+
+class UartClock:
+    # Serialises one direction of the link at 10 bits per byte (8N1)
+    def __init__(self):
+        self.free_at = 0.0
+
+    def wait(self, size, baudrate):
+        now = time.perf_counter()
+        self.free_at = max(self.free_at, now) + size * 10 / baudrate
+        if self.free_at > now:
+            time.sleep(self.free_at - now)
+
+
+class EspEmulator(threading.Thread):
+    def __init__(self, mac=b'\x24\x0a\xc4\x00\x00\x01', flash_size=4 * 1024 * 1024, throttle=True):
+        super().__init__(daemon=True)
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self.flash = bytearray(b'\xff') * flash_size
+        self.jedec_id = FLASH_JEDEC_IDS.get(flash_size, 0x1640EF)
+        self.regs = {0x40001000: ESP32_MAGIC,
+                     EFUSE_MAC_REGS[0]: int.from_bytes(mac[2:], 'big'),
+                     EFUSE_MAC_REGS[1]: int.from_bytes(mac[:2], 'big')}
+        self.throttle = throttle
+        self.rx_clock = UartClock()
+        self.tx_clock = UartClock()
+        self.running = True
+        self.commands = {}
+        self.reset()
+
+    def reset(self):
+        # What a hard reset into download mode leaves behind
+        self.stub = False
+        self.baudrate = ROM_BAUDRATE
+        self.write = None
+        self.read = None
+
+    def stop(self):
+        self.running = False
+
+    def send(self, packet: bytes):
+        data = slip_encode(packet)
+        if self.throttle:
+            self.tx_clock.wait(len(data), self.baudrate)
+        os.write(self.master, data)
+
+    def reply(self, op, value=0, data=b'', status=0):
+        # ROM replies carry 4 status bytes and the stub 2; esptool only looks at the first two
+        body = data + bytes([status, STATUS_INVALID_COMMAND if status else 0]) + (b'' if self.stub else b'\0\0')
+        self.send(struct.pack('<BBHI', 1, op, len(body), value) + body)
+
+    def handle(self, frame: bytes):
+        if self.read is not None and len(frame) == 4:
+            self.read_acknowledged(struct.unpack('<I', frame)[0])
+            return
+        if len(frame) < 8 or frame[0] != 0:
+            return
+        op, _, _ = struct.unpack('<BHI', frame[1:8])
+        data = frame[8:]
+        self.commands[op] = self.commands.get(op, 0) + 1
+        handler = self.HANDLERS.get(op)
+        if handler is None:
+            self.reply(op, status=1)
+        else:
+            handler(self, op, data)
+
+    def on_sync(self, op, data):
+        # esptool only syncs right after resetting the chip, which always lands in the ROM loader
+        self.reset()
+        for _ in range(8):
+            self.reply(op, ROM_SYNC_VALUE)
+
+    def on_read_reg(self, op, data):
+        address, = struct.unpack('<I', data[:4])
+        if address == SPI_CMD_REG:
+            value = 0  # the SPI user command has always finished
+        elif address == SPI_W0_REG:
+            value = self.jedec_id
+        else:
+            value = self.regs.get(address, 0)
+        self.reply(op, value)
+
+    def on_write_reg(self, op, data):
+        address, value = struct.unpack('<II', data[:8])
+        self.regs[address] = value
+        self.reply(op)
+
+    def on_mem_end(self, op, data):
+        self.reply(op)
+        # The uploaded stub starts and greets the host
+        self.stub = True
+        self.send(b'OHAI')
+
+    def on_change_baudrate(self, op, data):
+        baudrate, _ = struct.unpack('<II', data[:8])
+        self.reply(op)
+        self.baudrate = baudrate
+
+    def on_flash_begin(self, op, data):
+        size, _, _, offset = struct.unpack('<IIII', data[:16])
+        self.write = [None, offset, offset + size]
+        self.erase(offset, size)
+        self.reply(op)
+
+    def on_flash_data(self, op, data):
+        size, = struct.unpack('<I', data[:4])
+        block = data[16:16 + size]
+        end = min(self.write[1] + len(block), self.write[2])
+        self.program(self.write[1], block[:end - self.write[1]])
+        self.write[1] += len(block)
+        self.reply(op)
+
+    def on_flash_defl_begin(self, op, data):
+        size, _, _, offset = struct.unpack('<IIII', data[:16])
+        self.write = [zlib.decompressobj(), offset, offset + size]
+        # The ROM erases the whole region up front and the stub as it goes; the end result is the same
+        self.erase(offset, size)
+        self.reply(op)
+
+    def on_flash_defl_data(self, op, data):
+        size, = struct.unpack('<I', data[:4])
+        output = self.write[0].decompress(data[16:16 + size])
+        self.program(self.write[1], output)
+        self.write[1] += len(output)
+        self.reply(op)
+
+    def on_flash_end(self, op, data):
+        self.write = None
+        self.reply(op)
+
+    def on_flash_md5(self, op, data):
+        address, size = struct.unpack('<II', data[:8])
+        digest = hashlib.md5(self.flash[address:address + size])
+        self.reply(op, data=digest.digest() if self.stub else digest.hexdigest().encode())
+
+    def on_erase_flash(self, op, data):
+        self.erase(0, len(self.flash))
+        self.reply(op)
+
+    def on_erase_region(self, op, data):
+        offset, size = struct.unpack('<II', data[:8])
+        self.erase(offset, size)
+        self.reply(op)
+
+    def on_read_flash_slow(self, op, data):
+        offset, size = struct.unpack('<II', data[:8])
+        self.reply(op, data=bytes(self.flash[offset:offset + size]).ljust(64, b'\xff'))
+
+    def on_read_flash(self, op, data):
+        # The stub streams packet_size frames, keeping at most max_inflight of them unacknowledged,
+        # then sends the MD5 of everything it read
+        offset, size, packet_size, max_inflight = struct.unpack('<IIII', data[:16])
+        self.reply(op)
+        self.read = {'offset': offset, 'size': size, 'packet': packet_size, 'sent': 0}
+        for _ in range(max(1, max_inflight)):
+            if not self.send_read_packet():
+                break
+
+    def send_read_packet(self) -> bool:
+        read = self.read
+        if read['sent'] >= read['size']:
+            return False
+        start = read['offset'] + read['sent']
+        length = min(read['packet'], read['size'] - read['sent'])
+        self.send(bytes(self.flash[start:start + length]))
+        read['sent'] += length
+        return True
+
+    def read_acknowledged(self, acknowledged):
+        read = self.read
+        if acknowledged >= read['size']:
+            self.send(hashlib.md5(self.flash[read['offset']:read['offset'] + read['size']]).digest())
+            self.read = None
+        else:
+            self.send_read_packet()
+
+    def on_ok(self, op, data):
+        self.reply(op)
+
+    def erase(self, offset, size):
+        start = offset - offset % SECTOR_SIZE
+        end = min(len(self.flash), -(-(offset + size) // SECTOR_SIZE) * SECTOR_SIZE)
+        self.flash[start:end] = b'\xff' * (end - start)
+
+    def program(self, offset, data):
+        self.flash[offset:offset + len(data)] = data
+
+    HANDLERS = {
+        SYNC: on_sync, READ_REG: on_read_reg, WRITE_REG: on_write_reg,
+        MEM_BEGIN: on_ok, MEM_DATA: on_ok, MEM_END: on_mem_end,
+        SPI_SET_PARAMS: on_ok, SPI_ATTACH: on_ok, CHANGE_BAUDRATE: on_change_baudrate,
+        FLASH_BEGIN: on_flash_begin, FLASH_DATA: on_flash_data, FLASH_END: on_flash_end,
+        FLASH_DEFL_BEGIN: on_flash_defl_begin, FLASH_DEFL_DATA: on_flash_defl_data, FLASH_DEFL_END: on_flash_end,
+        SPI_FLASH_MD5: on_flash_md5, READ_FLASH_SLOW: on_read_flash_slow, READ_FLASH: on_read_flash,
+        ERASE_FLASH: on_erase_flash, ERASE_REGION: on_erase_region, RUN_USER_CODE: on_ok,
+    }
+
+    def run(self):
+        pending = b''
+        while self.running:
+            readable, _, _ = select.select([self.master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                chunk = os.read(self.master, 65536)
+            except OSError:
+                return
+            if self.throttle:
+                self.rx_clock.wait(len(chunk), self.baudrate)
+            # Frames are delimited by 0xC0 on both ends, so complete ones are the non-empty pieces between them
+            *frames, pending = (pending + chunk).split(b'\xc0')
+            for frame in frames:
+                if frame:
+                    self.handle(slip_decode(frame))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulated ESP32 serial bootloader on a pty")
+    parser.add_argument('--mac', default='24:0a:c4:00:00:01')
+    parser.add_argument('--flash-size', type=int, default=4 * 1024 * 1024)
+    parser.add_argument('--no-throttle', action='store_true', help="Do not limit the link to the baud rate")
+    args = parser.parse_args()
+
+    emulator = EspEmulator(bytes.fromhex(args.mac.replace(':', '')), args.flash_size, not args.no_throttle)
+    emulator.start()
+    print(emulator.device, flush=True)
+    # Runs until the parent closes our stdin (or exits)
+    sys.stdin.read()
+    emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
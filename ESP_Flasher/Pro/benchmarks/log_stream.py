@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Synthetic ESP-IDF style log stream on a pty pair, for the serial monitor benchmark. Each line carries
+# a sequence number and the CLOCK_MONOTONIC time it was written, so the reader can tell how long it
+# took to reach the screen. Like a real UART the device side never waits: whatever the pty cannot take
+# because the reader has fallen behind is dropped and counted.
+#
+#   python log_stream.py
+#
+# prints the pty device on the first line, then reads one command per line from stdin:
+#
+#   <bytes per second> <line length> <seconds>
+#
+# streams for that long and answers with a JSON line {"lines", "generated", "written", "dropped"}.
+# Runs until stdin is closed. POSIX only (pty).
+
+import json
+import os
+import sys
+import time
+import tty
+
+TICK_S = 0.001
+LEVELS = (b'I', b'I', b'I', b'I', b'W', b'D')
+PAYLOAD = b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 '
+
+
+class LogStream:
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        # The slave end stays open here too, so writes never fail while the monitor is disconnected
+        self.device = os.ttyname(self.slave)
+        os.set_blocking(self.master, False)
+        self.seq = 0
+        self.started_ns = time.monotonic_ns()
+
+    def line(self, length) -> bytes:
+        self.seq += 1
+        now_ns = time.monotonic_ns()
+        head = b'%s (%d) bench: seq=%08d t=%019d ' % (LEVELS[self.seq % len(LEVELS)], (now_ns - self.started_ns) // 1_000_000,
+                                                     self.seq, now_ns)
+        fill = max(length - len(head) - 2, 0)
+        body = PAYLOAD * (fill // len(PAYLOAD) + 1)
+        return head + body[:fill] + b'\r\n'
+
+    def stream(self, rate, line_length, duration) -> dict:
+        lines = generated = written = 0
+        start = time.perf_counter()
+        end = start + duration
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            # Everything owed up to now goes out in one write, the way a UART FIFO drains in bursts
+            due = rate * (now - start)
+            chunk = []
+            while generated < due:
+                line = self.line(line_length)
+                chunk.append(line)
+                generated += len(line)
+                lines += 1
+            if chunk:
+                data = b''.join(chunk)
+                try:
+                    written += os.write(self.master, data)
+                except BlockingIOError:
+                    pass
+            time.sleep(TICK_S)
+        return {'lines': lines, 'generated': generated, 'written': written, 'dropped': generated - written}
+
+
+def main():
+    stream = LogStream()
+    print(stream.device, flush=True)
+    for command in sys.stdin:
+        if not command.strip():
+            continue
+        rate, line_length, duration = command.split()
+        result = stream.stream(int(rate), int(line_length), float(duration))
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()